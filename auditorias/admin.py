@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Empresa, ProyectoAuditoria, DocumentoProyecto,
-    Electricidad, GasNatural, CarbonMineral, FuelOil, Biomasa, GasPropano
+    Electricidad, GasNatural, CarbonMineral, FuelOil, Biomasa, GasPropano,
+    RegistroEnergetico, ResumenEnergetico, FactorReferencia, ConsumoMensual
 )
 
 @admin.register(Empresa)
@@ -24,15 +25,45 @@ class ElectricidadAdmin(admin.ModelAdmin):
     # Electricidad usa 'consumo_anual'
     list_display = ('proyecto', 'consumo_anual', 'costo_total_anual', 'emisiones_totales')
     list_filter = ('proyecto__centro',)
+    readonly_fields = ('emisiones_totales',)  # kWh * FE, se calcula al guardar
 
 class CombustibleAdmin(admin.ModelAdmin):
     # Los combustibles usan 'consumo_anual_orig' (Unidad Original)
     list_display = ('proyecto', 'consumo_anual_orig', 'costo_total_anual', 'emisiones_totales')
     list_filter = ('proyecto__centro',)
+    readonly_fields = ('emisiones_totales',)
 
 # Registramos los combustibles usando la clase CombustibleAdmin
 admin.site.register(GasNatural, CombustibleAdmin)
 admin.site.register(CarbonMineral, CombustibleAdmin)
 admin.site.register(FuelOil, CombustibleAdmin)
 admin.site.register(Biomasa, CombustibleAdmin)
-admin.site.register(GasPropano, CombustibleAdmin)
\ No newline at end of file
+admin.site.register(GasPropano, CombustibleAdmin)
+
+@admin.register(ResumenEnergetico)
+class ResumenEnergeticoAdmin(admin.ModelAdmin):
+    # Tabla derivada: se mantiene sola al guardar la bitácora
+    list_display = ('proyecto', 'kwh_total', 'costo_total', 'emisiones_totales', 'ides', 'actualizado')
+    list_filter = ('proyecto__centro',)
+    readonly_fields = ('kwh_electrico', 'kwh_termico', 'kwh_total', 'costo_total', 'emisiones_totales', 'ides', 'actualizado')
+
+@admin.register(RegistroEnergetico)
+class RegistroEnergeticoAdmin(admin.ModelAdmin):
+    # Libro derivado: se sincroniza al guardar cada registro de la bitácora
+    list_display = ('proyecto', 'fuente', 'kwh', 'costo', 'emisiones')
+    list_filter = ('fuente', 'proyecto__centro')
+    readonly_fields = ('proyecto', 'fuente', 'registro_id', 'kwh', 'costo', 'emisiones')
+
+@admin.register(ConsumoMensual)
+class ConsumoMensualAdmin(admin.ModelAdmin):
+    # Carga en bloque: formulario de serie mensual del proyecto o manage.py importar_series_mensuales
+    list_display = ('proyecto', 'fuente', 'periodo', 'cantidad', 'costo', 'kwh')
+    list_filter = ('fuente', 'proyecto__centro')
+    date_hierarchy = 'periodo'
+    readonly_fields = ('kwh',)
+
+@admin.register(FactorReferencia)
+class FactorReferenciaAdmin(admin.ModelAdmin):
+    # Catálogo UPME: tras publicar factores nuevos, python manage.py recalcular_emisiones
+    list_display = ('fuente', 'anio', 'factor_emision', 'poder_calorifico', 'referencia', 'actualizado')
+    list_filter = ('fuente',)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AuditoriasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'auditorias'
+
+    def ready(self):
+        # Catálogo de factores en memoria y limpieza al eliminar registros de energía
+        from . import signals  # noqa: F401
@@ -0,0 +1,56 @@
+"""
+Búsqueda de proyectos por nombre, empresa, NIT y ciudad.
+
+Cada proyecto guarda en 'texto_busqueda' esos campos en minúsculas y sin tildes
+(lo mantienen ProyectoAuditoria.save y Empresa.save), así "carbon" encuentra
+"Carbón" en cualquier motor y el filtro no necesita JOIN con la empresa.
+
+En PostgreSQL la columna tiene un índice GIN de trigramas (pg_trgm): los
+LIKE '%término%' se resuelven con el índice y los resultados se ordenan por
+similitud de palabra. En SQLite el filtro es el mismo y la relevancia es simple
+(frase al inicio > frase completa > términos sueltos).
+"""
+import unicodedata
+
+from django.db import connections
+from django.db.models import Case, FloatField, Value, When
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes ni diéresis y con espacios simples: 'Carbón  Andino' -> 'carbon andino'."""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_tildes.casefold().split())
+
+
+def texto_busqueda(proyecto, empresa=None):
+    """Texto indexado de un proyecto: nombre + razón social, NIT y ciudad de la empresa."""
+    empresa = empresa or proyecto.empresa
+    return normalizar(' '.join([
+        proyecto.nombre_proyecto or '', empresa.razon_social or '', empresa.nit or '', empresa.ciudad or '',
+    ]))
+
+
+def buscar_proyectos(qs, consulta):
+    """
+    Filtra 'qs' por todos los términos de 'consulta' (en cualquier orden) y anota
+    'relevancia' para ordenar: qs.order_by('-relevancia', ...).
+    """
+    frase = normalizar(consulta)
+    if not frase:
+        return qs.annotate(relevancia=Value(0.0, output_field=FloatField()))
+
+    for termino in frase.split():
+        qs = qs.filter(texto_busqueda__contains=termino)
+
+    if connections[qs.db].vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        relevancia = TrigramWordSimilarity(frase, 'texto_busqueda')
+    else:
+        relevancia = Case(
+            When(texto_busqueda__startswith=frase, then=Value(2.0)),
+            When(texto_busqueda__contains=frase, then=Value(1.0)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    return qs.annotate(relevancia=relevancia)
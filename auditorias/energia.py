@@ -0,0 +1,279 @@
+"""
+Agregación energética de proyectos: único lugar donde se recorren las seis fuentes.
+
+Dos entradas que producen el mismo "desglose" ({nombre_fuente: {kwh, costo, emisiones, color, ...}}):
+- desglose_por_fuente(proyectos): en base de datos, para un queryset o un lote de ids
+  (una sola consulta agrupada sobre el libro RegistroEnergetico).
+- desglose_de_registros(registros): en memoria, para los registros ya cargados de un proyecto.
+anotar_totales(qs) lee los totales por proyecto del resumen materializado (tablas y listados).
+serie_mensual(proyectos) agrega las curvas mensuales de ConsumoMensual (estacionalidad).
+
+indicadores(desglose) deriva de ahí energía eléctrica/térmica, costo, huella, MBTU, IDES
+y las series de Chart.js. Dashboards, detalle del proyecto, informe PDF y
+ResumenEnergetico pasan por estas funciones.
+"""
+from collections import namedtuple
+from datetime import date
+
+from django.db.models import Min, Q, QuerySet, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Electricidad, GasNatural, CarbonMineral, FuelOil, Biomasa, GasPropano, RegistroEnergetico, ConsumoMensual
+)
+
+# Conversión de kWh a Millones de BTU
+FACTOR_MBTU = 0.00341214
+
+# clave: nombre de contexto/template; campo_kwh: energía normalizada; destino: acumulador del resumen
+Fuente = namedtuple('Fuente', 'clave nombre modelo campo_kwh destino color unidad')
+
+# La electricidad ya viene en kWh ('consumo_anual'); los combustibles usan
+# el campo normalizado que calcula CombustibleBase.save() ('consumo_anual_kwh').
+FUENTES = [
+    Fuente('electricidad',   'Electricidad',   Electricidad,  'consumo_anual',     'kwh_electrico', '#ffc107', 'kWh'), # Amarillo
+    Fuente('gas_natural',    'Gas Natural',    GasNatural,    'consumo_anual_kwh', 'kwh_termico',   '#0d6efd', 'm³'),  # Azul
+    Fuente('carbon_mineral', 'Carbón Mineral', CarbonMineral, 'consumo_anual_kwh', 'kwh_termico',   '#212529', 'Ton'), # Negro
+    Fuente('fuel_oil',       'Fuel Oil',       FuelOil,       'consumo_anual_kwh', 'kwh_termico',   '#dc3545', 'Gal'), # Rojo
+    Fuente('biomasa',        'Biomasa',        Biomasa,       'consumo_anual_kwh', 'kwh_termico',   '#198754', 'Ton'), # Verde
+    Fuente('gas_propano',    'GLP',            GasPropano,    'consumo_anual_kwh', 'kwh_termico',   '#0dcaf0', 'kg'),  # Cyan
+]
+
+FUENTE_POR_CLAVE = {fuente.clave: fuente for fuente in FUENTES}
+FUENTE_POR_MODELO = {fuente.modelo: fuente for fuente in FUENTES}
+
+
+def _filtro_proyectos(proyectos):
+    """Filtro del libro energético para un queryset (subconsulta) o una lista de ids."""
+    if isinstance(proyectos, QuerySet):
+        return {'proyecto__in': proyectos.order_by().values('pk')}
+    return {'proyecto_id__in': list(proyectos)}
+
+
+# ==========================================
+#  AGREGACIÓN EN BASE DE DATOS (LIBRO ENERGÉTICO)
+# ==========================================
+
+def desglose_por_fuente(proyectos):
+    """Totales por fuente de todo el conjunto: una consulta agrupada por fuente sobre el libro."""
+    filas = {
+        fila['fuente']: fila
+        for fila in RegistroEnergetico.objects.filter(**_filtro_proyectos(proyectos))
+        .order_by()
+        .values('fuente')
+        .annotate(kwh=Sum('kwh'), costo=Sum('costo'), emisiones=Sum('emisiones'))
+    }
+
+    desglose = {}
+    for fuente in FUENTES:
+        fila = filas.get(fuente.clave, {})
+        desglose[fuente.nombre] = {
+            'kwh': fila.get('kwh') or 0.0,
+            'costo': fila.get('costo') or 0.0,
+            'emisiones': fila.get('emisiones') or 0.0,
+            'color': fuente.color,
+            'destino': fuente.destino,
+        }
+
+    return desglose
+
+
+def totales_por_proyecto(proyectos):
+    """
+    Totales de cada proyecto del conjunto: una consulta agrupada por proyecto sobre el libro.
+    Devuelve {pk: {kwh_electrico, kwh_termico, costo_total, emisiones_totales}}.
+    Los proyectos sin registros no aparecen (sus totales son cero).
+    """
+    claves_por_destino = {}
+    for fuente in FUENTES:
+        claves_por_destino.setdefault(fuente.destino, []).append(fuente.clave)
+
+    filas = (
+        RegistroEnergetico.objects.filter(**_filtro_proyectos(proyectos))
+        .order_by()
+        .values('proyecto_id')
+        .annotate(
+            costo_total=Sum('costo'),
+            emisiones_totales=Sum('emisiones'),
+            **{
+                destino: Sum('kwh', filter=Q(fuente__in=claves))
+                for destino, claves in claves_por_destino.items()
+            },
+        )
+    )
+
+    acumulado = {}
+    for fila in filas:
+        totales = totales_vacios()
+        for campo in totales:
+            totales[campo] = fila[campo] or 0.0
+        acumulado[fila['proyecto_id']] = totales
+
+    return acumulado
+
+
+def anotar_totales(qs):
+    """
+    Anota en cada proyecto de 'qs' sus totales leídos del resumen materializado
+    (ResumenEnergetico) con un solo JOIN: para listados y tablas paginadas.
+    """
+    return qs.annotate(
+        total_kwh_elec=Coalesce('resumen__kwh_electrico', Value(0.0)),
+        total_kwh_term=Coalesce('resumen__kwh_termico', Value(0.0)),
+        total_costo=Coalesce('resumen__costo_total', Value(0.0)),
+        total_emisiones=Coalesce('resumen__emisiones_totales', Value(0.0)),
+        total_kwh=Coalesce('resumen__kwh_total', Value(0.0)),
+        total_ides=Coalesce('resumen__ides', Value(0.0)),
+    )
+
+
+def totales_vacios():
+    return {'kwh_electrico': 0.0, 'kwh_termico': 0.0, 'costo_total': 0.0, 'emisiones_totales': 0.0}
+
+
+# ==========================================
+#  SERIES MENSUALES (ConsumoMensual)
+# ==========================================
+
+def _meses(desde, hasta):
+    """Primer día de cada mes entre 'desde' y 'hasta', ambos incluidos."""
+    anio, mes = desde.year, desde.month
+    while (anio, mes) <= (hasta.year, hasta.month):
+        yield date(anio, mes, 1)
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def serie_mensual(proyectos, anio=None):
+    """
+    Curvas mensuales de un conjunto de proyectos para Chart.js: kWh por fuente, y kWh y
+    costo totales. Una consulta agrupada por mes y fuente sobre ConsumoMensual.
+    Con 'anio' son sus 12 meses; sin él, todos los meses entre el primero y el último con datos.
+    Un mes sin datos queda en None (hueco en la curva, no un cero).
+    """
+    consumos = ConsumoMensual.objects.filter(**_filtro_proyectos(proyectos))
+    if anio:
+        consumos = consumos.filter(periodo__year=anio)
+    filas = list(
+        consumos.order_by().values('periodo', 'fuente').annotate(kwh=Sum('kwh'), costo=Sum('costo'))
+    )
+
+    if anio:
+        meses = list(_meses(date(anio, 1, 1), date(anio, 12, 1)))
+    elif filas:
+        periodos = [fila['periodo'] for fila in filas]
+        meses = list(_meses(min(periodos), max(periodos)))
+    else:
+        meses = []
+    posicion = {(mes.year, mes.month): i for i, mes in enumerate(meses)}
+
+    kwh_fuente = {}
+    kwh_total = [None] * len(meses)
+    costo_total = [None] * len(meses)
+    for fila in filas:
+        i = posicion[fila['periodo'].year, fila['periodo'].month]
+        kwh_fuente.setdefault(fila['fuente'], [None] * len(meses))[i] = round(fila['kwh'] or 0.0)
+        kwh_total[i] = (kwh_total[i] or 0) + (fila['kwh'] or 0.0)
+        costo_total[i] = (costo_total[i] or 0) + (fila['costo'] or 0.0)
+
+    return {
+        'labels': [f"{mes:%Y-%m}" for mes in meses],
+        'fuentes': [
+            {'label': fuente.nombre, 'color': fuente.color, 'kwh': kwh_fuente[fuente.clave]}
+            for fuente in FUENTES if fuente.clave in kwh_fuente
+        ],
+        'kwh': [None if v is None else round(v) for v in kwh_total],
+        'costo': [None if v is None else round(v) for v in costo_total],
+    }
+
+
+# ==========================================
+#  AGREGACIÓN DE UN PROYECTO (REGISTROS EN MEMORIA)
+# ==========================================
+
+def registros_proyecto(proyecto):
+    """
+    Registro de cada fuente del proyecto (o None), indexado por la clave de la fuente.
+    El libro dice qué fuentes tienen datos: solo se consultan esas tablas.
+    """
+    primeros = dict(
+        RegistroEnergetico.objects.filter(proyecto=proyecto)
+        .order_by()
+        .values('fuente')
+        .annotate(primero=Min('registro_id'))
+        .values_list('fuente', 'primero')
+    )
+
+    registros = {}
+    for fuente in FUENTES:
+        registro_id = primeros.get(fuente.clave)
+        if registro_id is None:
+            registros[fuente.clave] = None
+            continue
+        # Por el manager inverso: el registro queda enlazado al proyecto ya cargado
+        relacionados = getattr(proyecto, f"{fuente.modelo._meta.model_name}_related")
+        registros[fuente.clave] = relacionados.filter(pk=registro_id).first()
+    return registros
+
+
+def desglose_de_registros(registros):
+    """Mismo formato que desglose_por_fuente(), solo con las fuentes registradas."""
+    desglose = {}
+
+    for fuente in FUENTES:
+        registro = registros.get(fuente.clave)
+        if not registro:
+            continue
+        desglose[fuente.nombre] = {
+            'kwh': getattr(registro, fuente.campo_kwh) or 0.0,
+            'costo': registro.costo_total_anual,
+            'emisiones': registro.emisiones_totales,
+            'color': fuente.color,
+            'destino': fuente.destino,
+            # Extras para tablas de detalle (consumo en la unidad original de la fuente)
+            'unidad': fuente.unidad,
+            'consumo_original': getattr(registro, 'consumo_anual' if fuente.destino == 'kwh_electrico' else 'consumo_anual_orig'),
+        }
+
+    return desglose
+
+
+# ==========================================
+#  INDICADORES DERIVADOS
+# ==========================================
+
+def indicadores(desglose, produccion=None):
+    """
+    Totales, balance MBTU, IDES y series para Chart.js a partir de un desglose.
+    'produccion' solo se usa para el IDES (0 si no hay producción o energía).
+    """
+    kwh_electrico = sum(v['kwh'] for v in desglose.values() if v['destino'] == 'kwh_electrico')
+    kwh_termico = sum(v['kwh'] for v in desglose.values() if v['destino'] == 'kwh_termico')
+    kwh_total = kwh_electrico + kwh_termico
+
+    ides = 0.0
+    if produccion and produccion > 0 and kwh_total > 0:
+        ides = kwh_total / produccion
+
+    mbtu_electrico = kwh_electrico * FACTOR_MBTU
+    mbtu_termico = kwh_termico * FACTOR_MBTU
+
+    # Series de gráficas: solo fuentes con consumo
+    activas = [(nombre, v) for nombre, v in desglose.items() if v['kwh'] > 0]
+
+    return {
+        'kwh_electrico': kwh_electrico,
+        'kwh_termico': kwh_termico,
+        'kwh_total': kwh_total,
+        'costo_total': sum(v['costo'] for v in desglose.values()),
+        'emisiones_totales': sum(v['emisiones'] for v in desglose.values()),
+        'mbtu_electrico': mbtu_electrico,
+        'mbtu_termico': mbtu_termico,
+        'ides': ides,
+        'series': {
+            'labels': [nombre for nombre, v in activas],
+            'energia': [round(v['kwh']) for nombre, v in activas],
+            'costos': [round(v['costo']) for nombre, v in activas],
+            'colors': [v['color'] for nombre, v in activas],
+            'mbtu': [round(mbtu_electrico, 2), round(mbtu_termico, 2)],
+        },
+    }
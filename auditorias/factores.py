@@ -0,0 +1,79 @@
+"""
+Catálogo de factores de referencia (FactorReferencia) en memoria del proceso.
+
+La tabla es pequeña (un factor por fuente y año), así que se carga completa una vez y se
+consulta sin ir a la base de datos. Se invalida al guardar o borrar un factor (auditorias.signals)
+y, para los demás procesos del servidor, caduca a los VIGENCIA segundos.
+"""
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+from django.db import transaction
+
+VIGENCIA = 300
+
+Factor = namedtuple('Factor', 'anio factor_emision poder_calorifico referencia')
+
+_catalogo = None
+_cargado_en = 0.0
+
+
+def catalogo():
+    """{fuente: (años ascendentes, factores en el mismo orden)}."""
+    global _catalogo, _cargado_en
+    if _catalogo is None or time.monotonic() - _cargado_en > VIGENCIA:
+        from .models import FactorReferencia
+
+        nuevo = {}
+        for fila in FactorReferencia.objects.order_by('fuente', 'anio').values_list(
+            'fuente', 'anio', 'factor_emision', 'poder_calorifico', 'referencia'
+        ):
+            anios, factores = nuevo.setdefault(fila[0], ([], []))
+            anios.append(fila[1])
+            factores.append(Factor(*fila[1:]))
+        _catalogo, _cargado_en = nuevo, time.monotonic()
+    return _catalogo
+
+
+def invalidar():
+    """Descarta el catálogo cargado tras el COMMIT (la siguiente consulta lo relee)."""
+    def descartar():
+        global _catalogo
+        _catalogo = None
+
+    transaction.on_commit(descartar)
+
+
+def factor_vigente(fuente, anio):
+    """Factor de 'fuente' vigente en 'anio' (el del último año <= anio), o None."""
+    if anio is None:
+        return None
+    anios, factores = catalogo().get(fuente, ((), ()))
+    posicion = bisect_right(anios, anio)
+    return factores[posicion - 1] if posicion else None
+
+
+def vigencias(fuente):
+    """(factor, desde, hasta) de cada factor de 'fuente'; hasta es None para el último."""
+    anios, factores = catalogo().get(fuente, ((), ()))
+    return [
+        (factor, factor.anio, anios[i + 1] if i + 1 < len(anios) else None)
+        for i, factor in enumerate(factores)
+    ]
+
+
+def valores_iniciales(fuente, anio):
+    """Valores por defecto de los formularios de registro para un proyecto de 'anio'."""
+    factor = factor_vigente(fuente, anio)
+    if factor is None:
+        return {}
+    iniciales = {'factor_emision': factor.factor_emision}
+    if factor.poder_calorifico:
+        iniciales['poder_calorifico'] = factor.poder_calorifico
+    return iniciales
+
+
+def emisiones(kwh, factor_emision):
+    """TonCO2/año de 'kwh' kWh/año con un factor en kgCO2/kWh (misma fórmula que FuenteEnergiaBase.save)."""
+    return (kwh or 0.0) * (factor_emision or 0.0) / 1000
@@ -36,7 +36,7 @@ class ProyectoForm(EstiloBootstrapMixin, forms.ModelForm):
         model = ProyectoAuditoria
         fields = [
             'nombre_proyecto', 'empresa', 'fecha_inicio', 'fecha_cierre_estimada', 
-            'lider_proyecto', 'equipo'
+            'anio', 'fase', 'lider_proyecto', 'equipo'
         ]
         widgets = {
             'fecha_inicio': forms.DateInput(attrs={'type': 'date'}),
@@ -124,6 +124,11 @@ class RegistroEnergiaForm(EstiloBootstrapMixin, forms.ModelForm):
             if isinstance(field.widget, forms.NumberInput):
                 field.widget = forms.TextInput(attrs={'class': 'form-control', 'autocomplete': 'off'})
 
+        # Emisiones = kWh * FE: las calcula el modelo al guardar (el script solo las previsualiza)
+        if 'emisiones_totales' in self.fields:
+            self.fields['emisiones_totales'].required = False
+            self.fields['emisiones_totales'].widget.attrs['readonly'] = True
+
 class ElectricidadForm(RegistroEnergiaForm):
     class Meta:
         model = Electricidad
@@ -209,4 +214,22 @@ class GasPropanoForm(RegistroEnergiaForm):
             'consumo_mensual_kwh': 'Consumo Eq. Mensual (kWh)',
             'consumo_anual_kwh': 'Consumo Eq. Anual (kWh)',
             'costo_kwh_equivalente': 'Costo Equivalente ($/kWh)',
-        }
\ No newline at end of file
+        }
+# --- SERIE MENSUAL DE CONSUMOS (CARGA DE LOS 12 MESES EN BLOQUE) ---
+
+class CampoNumero(forms.FloatField):
+    """FloatField en texto que acepta separador de miles ("1,200.50"), igual que RegistroEnergiaForm."""
+    widget = forms.TextInput
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            value = value.replace(',', '')
+        return super().to_python(value)
+
+class ConsumoMensualForm(EstiloBootstrapMixin, forms.Form):
+    """Un mes de la serie. Un mes sin consumo se elimina de la serie."""
+    periodo = forms.DateField(widget=forms.HiddenInput)
+    cantidad = CampoNumero(required=False, min_value=0, label="Consumo")
+    costo = CampoNumero(required=False, min_value=0, label="Costo (COP)")
+
+SerieMensualFormSet = forms.formset_factory(ConsumoMensualForm, extra=0)
@@ -0,0 +1,736 @@
+"""
+Importación masiva de la matriz histórica PEVI (empresas.csv y archivos con el mismo formato).
+
+Formato: CSV separado por ';' (Latin-1) o XLSX, dos filas de encabezado (grupos de fuente
+en la primera, columnas de cada fuente en la segunda) y números con formato colombiano
+("1.442.736", "0,2445", "$ 880.068.960", "$ -").
+
+Tres etapas:
+1. Lectura (filas_csv / filas_xlsx): filas crudas del archivo.
+2. Análisis (leer_matriz): convierte y valida cada fila contra las fórmulas de los modelos.
+   No toca la base de datos, así que los lotes de filas se analizan en paralelo (importar_archivos).
+3. Escritura (ImportadorMatriz): un único escritor, por lotes, cada uno en su transacción, con
+   bulk_create (inserciones y upserts): la memoria depende del tamaño del lote, no del archivo.
+
+Re-importar es idempotente:
+- Empresa: por NIT; sin columna NIT, por un NIT provisional derivado del nombre
+  ('SN-' + hash del nombre normalizado) o por la razón social sin distinguir mayúsculas.
+- Proyecto: por (empresa, año).
+- Registros de energía: el primero de cada fuente en el proyecto se actualiza; si no hay, se crea.
+"""
+import csv
+import hashlib
+import multiprocessing
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice, zip_longest
+
+import django
+from django.db import transaction
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
+
+from gestion.models import CentroPevi, Usuario
+from .busqueda import normalizar, texto_busqueda
+from .energia import FUENTE_POR_CLAVE
+from .factores import emisiones
+from .models import ConsumoMensual, Electricidad, Empresa, ProyectoAuditoria, RegistroEnergetico, ResumenEnergetico
+
+
+class ErrorFormato(Exception):
+    """El archivo no tiene la estructura de la matriz PEVI (encabezados)."""
+
+
+class FilaInvalida(Exception):
+    """Una fila de datos que no se puede importar. Cada argumento es un motivo de rechazo."""
+
+    def __str__(self):
+        return '; '.join(self.args)
+
+
+# ==========================================
+#  NÚMEROS Y ENCABEZADOS
+# ==========================================
+
+def numero(texto):
+    """
+    Número en formato colombiano: punto de miles, coma decimal, '$' y '-' como cero.
+    '1.442.736' -> 1442736.0, '0,2445' -> 0.2445, ' $ 880.068.960 ' -> 880068960.0, ' $ -  ' -> 0.0
+    """
+    limpio = (texto or '').replace('$', '').replace(' ', '').replace('\xa0', '')
+    if limpio in ('', '-'):
+        return 0.0
+    try:
+        return float(limpio.replace('.', '').replace(',', '.'))
+    except ValueError:
+        raise FilaInvalida(f"Número inválido: '{texto.strip()}'")
+
+
+# Columnas de identificación (encabezado normalizado -> campo)
+COLUMNAS = {
+    'fase': 'fase',
+    'ano': 'anio',
+    'centro pevi': 'centro',
+    'nombre de empresa': 'empresa',
+    'nit': 'nit',
+    'ciudad': 'ciudad',
+    'sector': 'sector',
+    'profesor lider': 'lider',
+    'informe final': 'informe',
+    'produccion /mensual': 'produccion_mensual',
+    'unidades de produccion': 'unidad',
+}
+OBLIGATORIAS = ('anio', 'centro', 'empresa')
+
+# Grupos de la primera fila de encabezado -> clave de auditorias.energia.FUENTES
+GRUPOS = {
+    'electricidad': 'electricidad',
+    'gas natural': 'gas_natural',
+    'carbon mineral': 'carbon_mineral',
+    'fuel oil': 'fuel_oil',
+    'biomasa': 'biomasa',
+    'gas propano': 'gas_propano',
+}
+
+# Columnas de cada grupo en orden (sin las de 'IC' ni el total de la empresa)
+CAMPOS_ELECTRICIDAD = [
+    'consumo_mensual', 'consumo_anual', 'costo_unitario', 'costo_mensual_promedio',
+    'costo_total_anual', 'factor_emision', 'emisiones_totales',
+]
+CAMPOS_COMBUSTIBLE = [
+    'consumo_mensual_orig', 'consumo_anual_orig', 'costo_unitario', 'costo_mensual_promedio',
+    'costo_total_anual', 'poder_calorifico', 'consumo_mensual_kwh', 'consumo_anual_kwh',
+    'costo_kwh_equivalente', 'factor_emision', 'emisiones_totales',
+]
+
+# Unidad declarada del PC en el encabezado -> kJ
+FACTOR_PC = {'mj': 1000.0, 'kwh': 3600.0, 'kj': 1.0}
+
+# Diferencia relativa admitida entre un valor declarado y el calculado a partir de los demás
+TOLERANCIA = 0.05
+
+
+class Encabezado:
+    """Posición de cada campo a partir de las dos filas de encabezado."""
+
+    def __init__(self, superior, inferior, tolerancia=TOLERANCIA):
+        self.tolerancia = tolerancia
+        self.columnas = {}
+        self.fuentes = {}
+        self.factor_pc = {}
+        grupo = None
+
+        for indice, (sup, inf) in enumerate(zip_longest(superior, inferior, fillvalue='')):
+            sup, inf = normalizar(sup), normalizar(inf)
+            if sup in GRUPOS:
+                grupo = GRUPOS[sup]
+                self.fuentes[grupo] = []
+            elif sup:
+                grupo = None
+                if sup in COLUMNAS:
+                    self.columnas[COLUMNAS[sup]] = indice
+                continue
+
+            if grupo is None or inf == 'ic' or inf.startswith('consumo total'):
+                continue
+            self.fuentes[grupo].append(indice)
+            if inf.startswith('pc'):
+                unidad = inf.partition('(')[2].partition('/')[0]
+                self.factor_pc[grupo] = FACTOR_PC.get(unidad, 1.0)
+
+        faltantes = [campo for campo in OBLIGATORIAS if campo not in self.columnas]
+        if faltantes:
+            raise ErrorFormato(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+        for clave, indices in self.fuentes.items():
+            esperadas = len(self._campos(clave))
+            if len(indices) != esperadas:
+                raise ErrorFormato(
+                    f"El grupo '{clave}' tiene {len(indices)} columnas de datos; se esperaban {esperadas}."
+                )
+        self.fuentes = {clave: list(zip(self._campos(clave), indices)) for clave, indices in self.fuentes.items()}
+
+    @staticmethod
+    def _campos(clave):
+        return CAMPOS_ELECTRICIDAD if clave == 'electricidad' else CAMPOS_COMBUSTIBLE
+
+    def valor(self, valores, campo):
+        indice = self.columnas.get(campo)
+        if indice is None or indice >= len(valores):
+            return ''
+        return valores[indice].strip()
+
+    def fila(self, valores):
+        """
+        Diccionario normalizado de una fila de datos; None si no es una fila de datos
+        (p. ej. la fila de totales) y FilaInvalida si no es importable.
+        """
+        empresa = ' '.join(self.valor(valores, 'empresa').split())
+        anio_texto = self.valor(valores, 'anio')
+        if not empresa and not anio_texto:
+            return None
+        if not empresa:
+            raise FilaInvalida("Falta el nombre de la empresa")
+        try:
+            anio = int(anio_texto)
+        except ValueError:
+            raise FilaInvalida(f"Año inválido: '{anio_texto}'")
+        if not 1990 <= anio <= 2100:
+            raise FilaInvalida(f"Año fuera de rango: {anio}")
+
+        fase_texto = self.valor(valores, 'fase')
+        lider = self.valor(valores, 'lider')
+        informe = normalizar(self.valor(valores, 'informe'))
+
+        return {
+            'anio': anio,
+            'fase': int(fase_texto) if fase_texto.isdigit() else None,
+            'centro': self.valor(valores, 'centro'),
+            'empresa': empresa,
+            'nit': self.valor(valores, 'nit'),
+            'ciudad': self.valor(valores, 'ciudad'),
+            'sector': self.valor(valores, 'sector'),
+            'lider': '' if lider == '-' else lider,
+            # 'Completo' = informe final entregado; cualquier observación = en revisión
+            'estado': 'FINALIZADO' if informe == 'completo' else ('REVISION' if informe else 'BORRADOR'),
+            # La matriz reporta producción mensual; la energía es anual (IDES = kWh/año ÷ producción/año)
+            'produccion_total': numero(self.valor(valores, 'produccion_mensual')) * 12,
+            'unidad': self.valor(valores, 'unidad'),
+            'fuentes': self._fuentes(valores),
+        }
+
+    def _fuentes(self, valores):
+        """
+        {clave: {campo: valor}} solo de las fuentes con consumo, costo o emisiones.
+        FilaInvalida con todos los motivos si alguna fuente no es consistente.
+        """
+        fuentes, motivos = {}, []
+        for clave, columnas in self.fuentes.items():
+            datos = {campo: numero(valores[i]) if i < len(valores) else 0.0 for campo, i in columnas}
+            if clave == 'electricidad':
+                if not (datos['consumo_anual'] or datos['costo_total_anual'] or datos['emisiones_totales']):
+                    continue
+            else:
+                if not (datos['consumo_anual_orig'] or datos['consumo_anual_kwh'] or datos['costo_total_anual']):
+                    continue
+                datos['poder_calorifico'] *= self.factor_pc.get(clave, 1.0)
+            motivos += validar_fuente(clave, datos, self.tolerancia)
+            if clave != 'electricidad':
+                datos['poder_calorifico'] = self._poder_calorifico(clave, datos)
+                self._derivar_combustible(clave, datos)
+            # Lo mismo que guardaría FuenteEnergiaBase.save()
+            datos['emisiones_totales'] = emisiones(datos[FUENTE_POR_CLAVE[clave].campo_kwh], datos['factor_emision'])
+            fuentes[clave] = datos
+
+        if motivos:
+            raise FilaInvalida(*motivos)
+        return fuentes
+
+    @staticmethod
+    def _derivar_combustible(clave, datos):
+        """
+        kWh y $/kWh con las mismas operaciones que CombustibleBase.save(). El $/kWh de la matriz
+        viene redondeado: solo sirve para validar la fila (validar_fuente), no se guarda.
+        """
+        if datos['consumo_anual_orig'] and datos['poder_calorifico']:
+            modelo = FUENTE_POR_CLAVE[clave].modelo
+            datos['consumo_anual_kwh'] = (datos['consumo_anual_orig'] * modelo.FACTOR_UNIDAD) * datos['poder_calorifico'] / 3600
+            if datos['costo_total_anual'] and datos['consumo_anual_kwh'] > 0:
+                datos['costo_kwh_equivalente'] = datos['costo_total_anual'] / datos['consumo_anual_kwh']
+
+    @staticmethod
+    def _poder_calorifico(clave, datos):
+        """
+        PC en las unidades del modelo (kJ por unidad convertida con FACTOR_UNIDAD).
+        Se deduce de los propios kWh de la matriz cuando hay consumo (ya validados contra el
+        PC declarado): así CombustibleBase.save() reproduce exactamente los mismos kWh.
+        """
+        cantidad = datos['consumo_anual_orig'] * FUENTE_POR_CLAVE[clave].modelo.FACTOR_UNIDAD
+        if cantidad > 0 and datos['consumo_anual_kwh'] > 0:
+            return datos['consumo_anual_kwh'] * 3600 / cantidad
+        return datos['poder_calorifico']
+
+
+# ==========================================
+#  VALIDACIÓN
+# ==========================================
+
+def _difieren(declarado, calculado, tolerancia, redondeo=0.0, cero_difiere=False):
+    """
+    True si ambos valores existen y se separan más de la tolerancia relativa
+    (y más de 'redondeo', para valores que la matriz redondea).
+    Con cero_difiere, que uno sea 0 y el otro no (más allá de 'redondeo') también es diferencia.
+    """
+    if not declarado or not calculado:
+        return cero_difiere and abs(declarado - calculado) > redondeo
+    diferencia = abs(declarado - calculado)
+    return diferencia > redondeo and diferencia > tolerancia * max(abs(declarado), abs(calculado))
+
+
+def validar_fuente(clave, datos, tolerancia=TOLERANCIA):
+    """
+    Motivos por los que los valores de una fuente no son consistentes entre sí
+    (lista vacía si lo son). Un valor en cero no se contrasta, salvo las emisiones: la
+    matriz deja en blanco lo que no se midió. 'poder_calorifico' debe venir ya en kJ.
+    """
+    fuente = FUENTE_POR_CLAVE[clave]
+    motivos = [
+        f"{fuente.nombre}: valor negativo en {campo}"
+        for campo, valor in datos.items() if valor < 0
+    ]
+
+    if clave == 'electricidad':
+        comprobaciones = [
+            ('consumo anual', datos['consumo_anual'], datos['consumo_mensual'] * 12, 0.0, False),
+            ('costo anual', datos['costo_total_anual'], datos['costo_unitario'] * datos['consumo_anual'], 0.0, False),
+        ]
+        kwh = datos['consumo_anual']
+    else:
+        # Misma fórmula que CombustibleBase.save(): kWh = cantidad * FACTOR_UNIDAD * PC / 3600
+        kwh_formula = datos['consumo_anual_orig'] * fuente.modelo.FACTOR_UNIDAD * datos['poder_calorifico'] / 3600
+        comprobaciones = [
+            ('consumo anual', datos['consumo_anual_orig'], datos['consumo_mensual_orig'] * 12, 0.0, False),
+            # Sin PC declarado se deduce de estos kWh (Encabezado._poder_calorifico)
+            ('kWh anual (cantidad x PC)', datos['consumo_anual_kwh'], kwh_formula, 0.0, False),
+            ('$/kWh equivalente', datos['costo_kwh_equivalente'],
+             datos['costo_total_anual'] / datos['consumo_anual_kwh'] if datos['consumo_anual_kwh'] else 0, 0.0, False),
+        ]
+        kwh = datos['consumo_anual_kwh']
+    # Misma fórmula que FuenteEnergiaBase.save(); la matriz muestra las toneladas sin decimales.
+    # Las emisiones guardadas son siempre las calculadas: unas declaradas sin FE (o sin kWh) no
+    # se pueden reproducir y se guardarían como 0, así que un lado en cero también se rechaza.
+    comprobaciones.append(
+        ('emisiones (kWh x FE)', datos['emisiones_totales'], emisiones(kwh, datos['factor_emision']), 0.5, True)
+    )
+
+    for nombre, declarado, calculado, redondeo, cero_difiere in comprobaciones:
+        if _difieren(declarado, calculado, tolerancia, redondeo, cero_difiere):
+            motivos.append(
+                f"{fuente.nombre}: {nombre} declarado {declarado:.2f} y calculado {calculado:.2f}"
+            )
+    return motivos
+
+
+# ==========================================
+#  LECTURA
+# ==========================================
+
+def filas_csv(ruta, encoding='latin-1', delimitador=';'):
+    """(número de línea, valores) de un CSV, en streaming."""
+    with open(ruta, encoding=encoding, newline='') as archivo:
+        lector = csv.reader(archivo, delimiter=delimitador)
+        for valores in lector:
+            yield lector.line_num, valores
+
+
+def _celda(valor):
+    """Celda de Excel como el texto que tendría en el CSV (coma decimal)."""
+    if valor is None:
+        return ''
+    if isinstance(valor, float):
+        return str(int(valor)) if valor.is_integer() else repr(valor).replace('.', ',')
+    return str(valor)
+
+
+def filas_xlsx(ruta):
+    """(número de fila, valores) de la primera hoja de un XLSX (requiere openpyxl)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErrorFormato("Para leer archivos .xlsx instale openpyxl.")
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        for fila, celdas in enumerate(hoja.iter_rows(values_only=True), start=1):
+            yield fila, [_celda(c) for c in celdas]
+    finally:
+        libro.close()
+
+
+EXTENSIONES = ('.csv', '.xlsx')
+
+
+def filas_archivo(ruta, encoding='latin-1', delimitador=';'):
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == '.csv':
+        return filas_csv(ruta, encoding, delimitador)
+    if extension == '.xlsx':
+        return filas_xlsx(ruta)
+    raise ErrorFormato(f"Extensión no soportada: '{extension}'")
+
+
+def archivos_matriz(rutas):
+    """Archivos a importar: los indicados y los .csv/.xlsx de los directorios, en orden alfabético."""
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            archivos += sorted(
+                os.path.join(ruta, nombre) for nombre in os.listdir(ruta)
+                if nombre.lower().endswith(EXTENSIONES) and not nombre.startswith(('.', '~$'))
+            )
+        else:
+            archivos.append(ruta)
+    return archivos
+
+
+def _encabezados(filas):
+    """Las dos filas de encabezado (superior, inferior) del iterador 'filas'."""
+    try:
+        (_, superior), (_, inferior) = next(filas), next(filas)
+    except StopIteration:
+        raise ErrorFormato("El archivo no tiene las dos filas de encabezado.")
+    return superior, inferior
+
+
+def _analizar_filas(encabezado, filas):
+    for linea, valores in filas:
+        if not any(v.strip() for v in valores):
+            continue
+        try:
+            fila = encabezado.fila(valores)
+        except FilaInvalida as error:
+            yield linea, error
+            continue
+        if fila is not None:
+            yield linea, fila
+
+
+def leer_matriz(filas, tolerancia=TOLERANCIA):
+    """
+    Itera (número de línea, fila o FilaInvalida) sobre las filas crudas de filas_archivo().
+    Lectura en streaming: nunca carga el archivo completo.
+    """
+    filas = iter(filas)
+    superior, inferior = _encabezados(filas)
+    yield from _analizar_filas(Encabezado(superior, inferior, tolerancia), filas)
+
+
+def analizar_archivo(ruta, encoding='latin-1', delimitador=';', tolerancia=TOLERANCIA):
+    """
+    leer_matriz() de un archivo completo. Un archivo ilegible no detiene la importación:
+    queda como un único rechazo en la línea 0.
+    """
+    try:
+        yield from leer_matriz(filas_archivo(ruta, encoding, delimitador), tolerancia)
+    except (ErrorFormato, OSError, UnicodeDecodeError) as error:
+        yield 0, FilaInvalida(f"Archivo no importable: {error}")
+
+
+def _analizar_lote(superior, inferior, filas, tolerancia):
+    """Lo que corre en cada proceso del pool: análisis de un lote de filas crudas (sin base de datos)."""
+    return list(_analizar_filas(Encabezado(superior, inferior, tolerancia), filas))
+
+
+def _analizar_en_pool(pool, ruta, en_vuelo, tamano_lote, encoding='latin-1', delimitador=';', tolerancia=TOLERANCIA):
+    """
+    analizar_archivo() repartido en el pool: este proceso lee las filas crudas (barato) y envía
+    lotes de 'tamano_lote' a analizar (la conversión y validación, lo costoso). Los resultados
+    salen en el orden del archivo y nunca hay más de 'en_vuelo' lotes pendientes: la memoria
+    depende del tamaño del lote, no del archivo.
+    """
+    pendientes = deque()
+    error = None
+    try:
+        filas = filas_archivo(ruta, encoding, delimitador)
+        superior, inferior = _encabezados(filas)
+        Encabezado(superior, inferior, tolerancia)  # Encabezados inválidos: se rechaza el archivo aquí
+        for lote in iter(lambda: list(islice(filas, tamano_lote)), []):
+            pendientes.append(pool.submit(_analizar_lote, superior, inferior, lote, tolerancia))
+            if len(pendientes) >= en_vuelo:
+                yield from pendientes.popleft().result()
+    except (ErrorFormato, OSError, UnicodeDecodeError) as excepcion:
+        error = excepcion
+
+    while pendientes:
+        yield from pendientes.popleft().result()
+    if error is not None:
+        yield 0, FilaInvalida(f"Archivo no importable: {error}")
+
+
+def importar_archivos(rutas, importador, procesos=None, **opciones):
+    """
+    Analiza 'rutas' en un pool de procesos y las escribe con 'importador', un único escritor
+    que recibe los archivos en el orden de 'rutas' y las filas en el orden de cada archivo
+    (si una empresa-año aparece dos veces, gana la última). Cada archivo se reparte en lotes
+    del tamaño de los de escritura, con a lo sumo 2 * procesos lotes en vuelo.
+    Con procesos=1 todo ocurre aquí y en streaming.
+    """
+    if procesos == 1:
+        for ruta in rutas:
+            importador.importar(analizar_archivo(ruta, **opciones), archivo=ruta)
+        return importador.conteo
+
+    # 'spawn': los hijos no heredan las conexiones a la base de datos del escritor
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto, initializer=django.setup) as pool:
+        for ruta in rutas:
+            filas = _analizar_en_pool(pool, ruta, 2 * (procesos or os.cpu_count() or 1), importador.tamano_lote, **opciones)
+            importador.importar(filas, archivo=ruta)
+    return importador.conteo
+
+
+def nit_provisional(razon_social):
+    """NIT estable para empresas sin NIT en la matriz (el mismo nombre da siempre el mismo NIT)."""
+    return 'SN-' + hashlib.sha1(normalizar(razon_social).encode()).hexdigest()[:12].upper()
+
+
+def actualizar_lote(modelo, objetos, campos):
+    """
+    Guarda 'campos' de objetos ya existentes con un upsert por pk (INSERT ... ON CONFLICT DO UPDATE).
+    Mismo resultado que bulk_update, pero sin el CASE WHEN por fila que arma Django:
+    con lotes de miles de filas bulk_update pasa casi todo el tiempo construyendo esa expresión.
+    """
+    return modelo.objects.bulk_create(objetos, update_conflicts=True, unique_fields=['pk'], update_fields=campos)
+
+
+# ==========================================
+#  ESCRITURA POR LOTES
+# ==========================================
+
+class ImportadorMatriz:
+    """
+    Escribe filas de leer_matriz() por lotes. Cada lote es una transacción:
+    empresas, proyectos, los seis registros de energía, el libro energético y los resúmenes.
+    Rollups y benchmarks se reconstruyen aparte, una vez al final (bulk_* no dispara señales).
+    """
+
+    def __init__(self, tamano_lote=1000, crear_centros=False):
+        self.tamano_lote = tamano_lote
+        self.crear_centros = crear_centros
+        self.conteo = Counter()
+        self.por_archivo = {}
+        self.rechazos = []
+        self.centros_afectados = set()
+        self._archivo = ''
+        self._centros = None
+        self._lideres = None
+
+    def importar(self, filas, archivo=''):
+        """Escribe las filas válidas de 'filas' y registra las FilaInvalida como rechazos de 'archivo'."""
+        self._archivo = archivo
+        self.por_archivo.setdefault(archivo, Counter())
+        lote = []
+        for linea, fila in filas:
+            self.conteo['filas'] += 1
+            self.por_archivo[archivo]['filas'] += 1
+            if isinstance(fila, FilaInvalida):
+                self._rechazar(linea, *fila.args)
+                continue
+            lote.append((linea, fila))
+            if len(lote) >= self.tamano_lote:
+                self._procesar(lote)
+                lote = []
+        if lote:
+            self._procesar(lote)
+        return self.conteo
+
+    def _rechazar(self, linea, *motivos):
+        self.conteo['rechazadas'] += 1
+        self.por_archivo[self._archivo]['rechazadas'] += 1
+        self.rechazos.append({'archivo': self._archivo, 'linea': linea, 'motivos': list(motivos)})
+
+    # ---------------------------------------------
+    #  CATÁLOGOS (pocos registros: se cargan una vez)
+    # ---------------------------------------------
+    def _centro(self, nombre):
+        if self._centros is None:
+            self._centros = {}
+            for pk, codigo, nombre_centro in CentroPevi.objects.values_list('pk', 'codigo_interno', 'nombre'):
+                self._centros.setdefault(normalizar(codigo), pk)
+                self._centros.setdefault(normalizar(nombre_centro), pk)
+
+        clave = normalizar(nombre)
+        if clave not in self._centros and nombre and self.crear_centros:
+            centro = CentroPevi.objects.create(nombre=nombre[:200], codigo_interno=nombre[:50], region='Sin asignar')
+            self._centros[clave] = centro.pk
+            self.conteo['centros_creados'] += 1
+        return self._centros.get(clave)
+
+    def _lider(self, nombre, centro_id):
+        """Usuario por nombre completo, preferiendo el del mismo centro. None si no existe."""
+        if not nombre:
+            return None
+        if self._lideres is None:
+            self._lideres = {}
+            for pk, nombres, apellidos, centro in Usuario.objects.values_list('pk', 'first_name', 'last_name', 'centro_pevi_id'):
+                completo = normalizar(f"{nombres} {apellidos}")
+                if completo:
+                    self._lideres.setdefault(completo, []).append((centro, pk))
+
+        candidatos = self._lideres.get(normalizar(nombre), [])
+        for centro, pk in candidatos:
+            if centro == centro_id:
+                return pk
+        if candidatos:
+            return candidatos[0][1]
+        self.conteo['lideres_sin_usuario'] += 1
+        return None
+
+    # ---------------------------------------------
+    #  LOTE
+    # ---------------------------------------------
+    @transaction.atomic
+    def _procesar(self, lote):
+        # 1. Centro y clave de cada fila (la última aparición de una empresa-año gana)
+        filas = {}
+        for linea, fila in lote:
+            fila['centro_id'] = self._centro(fila['centro'])
+            if fila['centro_id'] is None:
+                self._rechazar(linea, f"Centro PEVI desconocido: '{fila['centro']}'")
+                continue
+            fila['clave_empresa'] = fila['nit'] or nit_provisional(fila['empresa'])
+            clave = (fila['clave_empresa'], fila['anio'])
+            if clave in filas:
+                self.conteo['duplicadas'] += 1
+            filas[clave] = fila
+        if not filas:
+            return
+
+        empresas = self._empresas(filas.values())
+        proyectos = self._proyectos(filas, empresas)
+        registros = self._registros(filas, proyectos)
+
+        # 2. Derivados: libro energético, kWh de las series mensuales y resúmenes del lote
+        RegistroEnergetico.guardar_lote([RegistroEnergetico.desde_registro(r) for r in registros])
+        ConsumoMensual.actualizar_kwh_lote(registros)
+        ResumenEnergetico.guardar_lote(ResumenEnergetico.calcular_lote(list(proyectos.values())))
+
+    def _empresas(self, filas):
+        """{clave_empresa: Empresa} del lote, creando o actualizando."""
+        por_clave = {}
+        for fila in filas:
+            por_clave[fila['clave_empresa']] = fila
+
+        empresas = {e.nit: e for e in Empresa.objects.filter(nit__in=por_clave)}
+
+        # Sin NIT en el archivo: también vale la razón social (empresas creadas a mano)
+        por_nombre = {
+            fila['empresa'].lower(): clave
+            for clave, fila in por_clave.items()
+            if clave not in empresas and not fila['nit']
+        }
+        if por_nombre:
+            coincidencias = (
+                Empresa.objects.annotate(nombre_importacion=Lower(Trim('razon_social')))
+                .filter(nombre_importacion__in=por_nombre)
+                .order_by('pk')
+            )
+            for empresa in coincidencias:
+                empresas.setdefault(por_nombre[empresa.nombre_importacion], empresa)
+
+        nuevas, actualizadas = [], []
+        for clave, fila in por_clave.items():
+            empresa = empresas.get(clave)
+            if empresa is None:
+                empresa = Empresa(
+                    razon_social=fila['empresa'][:200], nit=clave[:20], sector_productivo=fila['sector'][:100],
+                    direccion='', ciudad=fila['ciudad'][:100],
+                    contacto_nombre='', contacto_email='', contacto_telefono='',
+                )
+                empresas[clave] = empresa
+                nuevas.append(empresa)
+                continue
+            if fila['sector']:
+                empresa.sector_productivo = fila['sector'][:100]
+            if fila['ciudad']:
+                empresa.ciudad = fila['ciudad'][:100]
+            actualizadas.append(empresa)
+
+        Empresa.objects.bulk_create(nuevas)
+        actualizar_lote(Empresa, actualizadas, ['sector_productivo', 'ciudad'])
+        self.conteo['empresas_creadas'] += len(nuevas)
+        self.conteo['empresas_actualizadas'] += len(actualizadas)
+        return empresas
+
+    def _proyectos(self, filas, empresas):
+        """{(clave_empresa, año): ProyectoAuditoria} del lote, creando o actualizando."""
+        ids_empresa = {empresa.pk: clave for clave, empresa in empresas.items()}
+        existentes = {}
+        consulta = ProyectoAuditoria.objects.filter(
+            empresa_id__in=ids_empresa, anio__in={anio for _, anio in filas}
+        ).order_by('pk')
+        for proyecto in consulta:
+            existentes.setdefault((ids_empresa[proyecto.empresa_id], proyecto.anio), proyecto)
+
+        ahora = timezone.now()
+        proyectos, nuevos, actualizados = {}, [], []
+        for clave, fila in filas.items():
+            empresa = empresas[fila['clave_empresa']]
+            proyecto = existentes.get(clave)
+            if proyecto is None:
+                proyecto = ProyectoAuditoria(
+                    empresa=empresa, anio=fila['anio'], fecha_inicio=date(fila['anio'], 1, 1),
+                    nombre_proyecto=f"Auditoría Energética {empresa.razon_social} {fila['anio']}"[:200],
+                )
+                nuevos.append(proyecto)
+            else:
+                self.centros_afectados.add(proyecto.centro_id)
+                actualizados.append(proyecto)
+
+            proyecto.centro_id = fila['centro_id']
+            proyecto.lider_proyecto_id = self._lider(fila['lider'], fila['centro_id']) or proyecto.lider_proyecto_id
+            proyecto.fase = fila['fase']
+            proyecto.estado = fila['estado']
+            proyecto.produccion_total = fila['produccion_total']
+            proyecto.unidad_produccion = fila['unidad'][:50]
+            proyecto.texto_busqueda = texto_busqueda(proyecto, empresa=empresa)
+            proyecto.updated_at = ahora
+            proyectos[clave] = proyecto
+            self.centros_afectados.add(fila['centro_id'])
+
+        ProyectoAuditoria.objects.bulk_create(nuevos)
+        actualizar_lote(ProyectoAuditoria, actualizados, [
+            'centro', 'lider_proyecto', 'fase', 'estado', 'produccion_total',
+            'unidad_produccion', 'texto_busqueda', 'updated_at',
+        ])
+        self.conteo['proyectos_creados'] += len(nuevos)
+        self.conteo['proyectos_actualizados'] += len(actualizados)
+        return proyectos
+
+    def _registros(self, filas, proyectos):
+        """
+        Crea o actualiza los registros de energía de cada fuente y elimina los de las fuentes
+        que la fila ya no trae (la matriz manda). Devuelve todos los creados o actualizados.
+        """
+        tocados = []
+        ids = [p.pk for p in proyectos.values()]
+
+        for clave_fuente, fuente in FUENTE_POR_CLAVE.items():
+            con_datos = [
+                (proyectos[clave], fila['fuentes'][clave_fuente])
+                for clave, fila in filas.items()
+                if clave_fuente in fila['fuentes']
+            ]
+            # Borrado por queryset: la señal post_delete (auditorias.signals) limpia el libro y la
+            # serie mensual y recalcula el resumen
+            sin_datos = [proyectos[clave].pk for clave, fila in filas.items() if clave_fuente not in fila['fuentes']]
+            if sin_datos:
+                _total, por_modelo = fuente.modelo.objects.filter(proyecto_id__in=sin_datos).delete()
+                self.conteo['registros_eliminados'] += por_modelo.get(fuente.modelo._meta.label, 0)
+            if not con_datos:
+                continue
+
+            existentes = {}
+            for registro in fuente.modelo.objects.filter(proyecto_id__in=ids).order_by('pk'):
+                existentes.setdefault(registro.proyecto_id, registro)
+
+            campos = CAMPOS_ELECTRICIDAD if fuente.modelo is Electricidad else CAMPOS_COMBUSTIBLE
+            nuevos, actualizados = [], []
+            for proyecto, datos in con_datos:
+                registro = existentes.get(proyecto.pk)
+                if registro is None:
+                    nuevos.append(fuente.modelo(proyecto=proyecto, **datos))
+                    continue
+                for campo in campos:
+                    setattr(registro, campo, datos[campo])
+                actualizados.append(registro)
+
+            fuente.modelo.objects.bulk_create(nuevos)
+            actualizar_lote(fuente.modelo, actualizados, campos)
+            self.conteo['registros_creados'] += len(nuevos)
+            self.conteo['registros_actualizados'] += len(actualizados)
+            tocados += nuevos + actualizados
+
+        return tocados
@@ -0,0 +1,132 @@
+"""
+Verificación con EXPLAIN de que las consultas calientes de ProyectoAuditoria (listados,
+dashboard y tableros de métricas) usan índices y no recorren la tabla completa.
+
+La usan el test auditorias.tests.IndicesProyectoTests (PostgreSQL) y el comando
+verificar_indices (para revisar una base real o sembrada a mano).
+"""
+import random
+import re
+from datetime import date, timedelta
+
+from django.db import connection
+
+from auditorias.models import Empresa, ProyectoAuditoria
+from gestion.models import CentroPevi, Usuario
+from gestion.paginacion import TAMANO_PAGINA, condicion_cursor
+
+
+def _seq_scan_postgresql(linea, tabla):
+    """PostgreSQL: 'Seq Scan on auditorias_proyectoauditoria'."""
+    return re.search(rf'Seq Scan on {tabla}\b', linea)
+
+
+def _seq_scan_sqlite(linea, tabla):
+    """SQLite: 'SCAN auditorias_proyectoauditoria' sin 'USING ... INDEX'."""
+    return re.search(rf'\bSCAN {tabla}\b(?! USING)', linea)
+
+
+# Línea del plan que indica un recorrido completo de la tabla
+DETECTORES = {
+    'postgresql': _seq_scan_postgresql,
+    'sqlite': _seq_scan_sqlite,
+}
+
+
+# ---------------------------------------------
+#  CONSULTAS CALIENTES
+# ---------------------------------------------
+def consultas_calientes():
+    """(nombre, queryset) con las formas de filtro/orden que usan las vistas; [] sin proyectos con líder."""
+    muestra = ProyectoAuditoria.objects.exclude(lider_proyecto=None).order_by('-pk').first()
+    if muestra is None:
+        return []
+    centro, lider, anio = muestra.centro_id, muestra.lider_proyecto_id, muestra.anio
+    miembro = Usuario.objects.filter(proyectos_asignados__isnull=False).values_list('pk', flat=True).first()
+
+    proyectos = ProyectoAuditoria.objects
+    consultas = [
+        # gestion.dashboard: KPIs y "Top 10 recientes"
+        ('dashboard / activos del centro', proyectos.filter(centro=centro, estado='EJECUCION')),
+        ('dashboard / activos nacional', proyectos.filter(estado='EJECUCION')),
+        ('dashboard / recientes del centro', proyectos.filter(centro=centro).order_by('-updated_at')[:10]),
+        ('dashboard / recientes del líder', proyectos.filter(lider_proyecto=lider).order_by('-updated_at')[:10]),
+        ('dashboard / recientes nacional', proyectos.order_by('-updated_at')[:10]),
+        # gestion.lista_proyectos
+        ('lista / centro', proyectos.filter(centro=centro).order_by('-updated_at')),
+        ('lista / centro y estado', proyectos.filter(centro=centro, estado='FINALIZADO').order_by('-updated_at')),
+        ('lista / líder', proyectos.filter(lider_proyecto=lider).order_by('-updated_at')),
+        # Página intermedia de la paginación por cursor (gestion.paginacion)
+        ('lista / página por cursor', proyectos.filter(
+            condicion_cursor(['-updated_at', '-id'], [muestra.updated_at, muestra.pk])
+        ).order_by('-updated_at', '-id')[:TAMANO_PAGINA + 1]),
+        ('lista / página por cursor del centro', proyectos.filter(centro=centro).filter(
+            condicion_cursor(['-updated_at', '-id'], [muestra.updated_at, muestra.pk])
+        ).order_by('-updated_at', '-id')[:TAMANO_PAGINA + 1]),
+        # metricas: tableros estratégico y nacional
+        ('métricas / centro y año', proyectos.filter(centro=centro, anio=anio)),
+        ('métricas / centro y líder', proyectos.filter(centro=centro, lider_proyecto=lider)),
+    ]
+    if miembro:
+        consultas.append(
+            ('lista / equipo', proyectos.filter(equipo=miembro).order_by('-updated_at'))
+        )
+    return consultas
+
+
+def planes():
+    """
+    (nombre, plan, recorridos completos) de cada consulta caliente, con estadísticas al día
+    en PostgreSQL. Requiere un motor de DETECTORES.
+    """
+    tablas = [ProyectoAuditoria._meta.db_table, ProyectoAuditoria.equipo.through._meta.db_table]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for tabla in tablas:
+                cursor.execute(f"ANALYZE {tabla}")
+
+    detector = DETECTORES[connection.vendor]
+    for nombre, qs in consultas_calientes():
+        plan = qs.explain()
+        recorridos = [linea.strip() for linea in plan.splitlines() if any(detector(linea, t) for t in tablas)]
+        yield nombre, plan, recorridos
+
+
+# ---------------------------------------------
+#  DATOS SINTÉTICOS
+# ---------------------------------------------
+def sembrar(tamano, n_centros=30, semilla=42):
+    """Siembra 'tamano' proyectos con líder y equipo en 'n_centros' centros (sin transacción propia)."""
+    azar = random.Random(semilla)
+    centros = CentroPevi.objects.bulk_create([
+        CentroPevi(nombre=f'Índices {i}', codigo_interno=f'IDX-{i}', region=f'Región {i % 6}')
+        for i in range(n_centros)
+    ])
+    lideres = Usuario.objects.bulk_create([
+        Usuario(username=f'indices-{i}', rol='PROFESOR', centro_pevi=centros[i % n_centros], password='!')
+        for i in range(n_centros * 10)
+    ])
+    empresa = Empresa.objects.create(
+        razon_social='Empresa Índices', nit='IDX-EMP', sector_productivo='Benchmark',
+        direccion='-', ciudad='-', contacto_nombre='-', contacto_email='idx@pevi.co', contacto_telefono='-',
+    )
+
+    # Casi todo el histórico finalizado: "en ejecución" es la minoría, como en producción
+    estados = ['FINALIZADO'] * 16 + ['EJECUCION', 'BORRADOR', 'REVISION', 'REVISION']
+    hoy = date.today()
+    proyectos = []
+    for i in range(tamano):
+        lider = azar.choice(lideres)
+        inicio = hoy - timedelta(days=azar.randint(0, 3650))
+        proyectos.append(ProyectoAuditoria(
+            centro_id=lider.centro_pevi_id, empresa=empresa, lider_proyecto=lider,
+            nombre_proyecto=f'Índices {i}', fecha_inicio=inicio, anio=inicio.year,
+            estado=azar.choice(estados),
+        ))
+    proyectos = ProyectoAuditoria.objects.bulk_create(proyectos, batch_size=5000)
+
+    Equipo = ProyectoAuditoria.equipo.through
+    Equipo.objects.bulk_create(
+        [Equipo(proyectoauditoria_id=p.pk, usuario_id=azar.choice(lideres).pk) for p in proyectos],
+        batch_size=5000,
+    )
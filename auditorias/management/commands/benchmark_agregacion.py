@@ -0,0 +1,124 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from auditorias.energia import FUENTES, desglose_por_fuente, indicadores, totales_por_proyecto
+from auditorias.models import Electricidad, Empresa, ProyectoAuditoria, RegistroEnergetico
+from gestion.models import CentroPevi
+
+
+class Command(BaseCommand):
+    """
+    Mide el servicio de agregación energética (auditorias.energia) con portafolios sintéticos.
+    Los datos se crean dentro de una transacción que se revierte al final: la base queda intacta.
+    Uso: python manage.py benchmark_agregacion [--tamanos 1000 10000 100000] [--lote 2000]
+    """
+    help = "Mide desglose_por_fuente, totales_por_proyecto e indicadores a distintos tamaños de portafolio."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanos', type=int, nargs='+', default=[1000, 10000, 100000],
+            help="Número de proyectos sintéticos de cada corrida (default: 1000 10000 100000)."
+        )
+        parser.add_argument('--lote', type=int, default=2000, help="Proyectos por lote en totales_por_proyecto.")
+        parser.add_argument('--semilla', type=int, default=42, help="Semilla aleatoria de los datos sintéticos.")
+
+    def handle(self, *args, **options):
+        random.seed(options['semilla'])
+        self.stdout.write(f"{'Proyectos':>10} {'Registros':>10} {'Desglose':>10} {'Por proyecto':>13} {'Indicadores':>12} {'Consultas':>10}")
+
+        for tamano in options['tamanos']:
+            with transaction.atomic():
+                registros = self._poblar(tamano)
+                self._medir(tamano, registros, options['lote'])
+                transaction.set_rollback(True)
+
+    # ---------------------------------------------
+    #  DATOS SINTÉTICOS
+    # ---------------------------------------------
+    def _poblar(self, tamano):
+        """Crea 'tamano' proyectos con electricidad y, al azar, combustibles. Devuelve los registros creados."""
+        centro = CentroPevi.objects.create(nombre='Benchmark agregación', codigo_interno='BENCH-AGR', region='Benchmark')
+        empresa = Empresa.objects.create(
+            razon_social='Empresa Benchmark', nit='BENCH-AGR', sector_productivo='Benchmark',
+            direccion='-', ciudad='-', contacto_nombre='-', contacto_email='bench@pevi.co', contacto_telefono='-',
+        )
+
+        # bulk_create no dispara save() ni señales: ni resúmenes ni rollups se tocan
+        proyectos = ProyectoAuditoria.objects.bulk_create(
+            [
+                ProyectoAuditoria(
+                    centro=centro, empresa=empresa, nombre_proyecto=f'Benchmark {i}',
+                    fecha_inicio='2024-01-01', anio=2024, produccion_total=random.choice([0, 1000, 5000]),
+                )
+                for i in range(tamano)
+            ],
+            batch_size=5000,
+        )
+
+        total = 0
+        for fuente in FUENTES:
+            if fuente.modelo is Electricidad:
+                objetos = [
+                    Electricidad(proyecto=p, consumo_mensual=1, consumo_anual=random.random() * 1e5, **_comunes())
+                    for p in proyectos
+                ]
+            else:
+                objetos = [
+                    fuente.modelo(
+                        proyecto=p, consumo_mensual_orig=1, consumo_anual_orig=1, poder_calorifico=1,
+                        consumo_mensual_kwh=1, consumo_anual_kwh=random.random() * 1e5, costo_kwh_equivalente=1,
+                        **_comunes(),
+                    )
+                    for p in proyectos if random.random() < 0.5
+                ]
+            fuente.modelo.objects.bulk_create(objetos, batch_size=5000)
+            # bulk_create no pasa por save(): el libro energético se llena aparte
+            RegistroEnergetico.objects.bulk_create(
+                [RegistroEnergetico.desde_registro(o) for o in objetos], batch_size=5000
+            )
+            total += len(objetos)
+        return total
+
+    # ---------------------------------------------
+    #  MEDICIÓN
+    # ---------------------------------------------
+    def _medir(self, tamano, registros, tamano_lote):
+        qs = ProyectoAuditoria.objects.filter(centro__codigo_interno='BENCH-AGR')
+        ids = list(qs.values_list('pk', flat=True))
+
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            desglose = desglose_por_fuente(qs)
+            t_desglose = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            por_proyecto = {}
+            for i in range(0, len(ids), tamano_lote):
+                por_proyecto.update(totales_por_proyecto(ids[i:i + tamano_lote]))
+            t_proyectos = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            totales = indicadores(desglose)
+            t_indicadores = time.perf_counter() - inicio
+
+        # Ambas rutas deben coincidir con el total del portafolio
+        suma = sum(t['kwh_electrico'] + t['kwh_termico'] for t in por_proyecto.values())
+        if abs(suma - totales['kwh_total']) > 1e-6 * max(1.0, totales['kwh_total']):
+            self.stderr.write(f"Descuadre en {tamano}: {suma} vs {totales['kwh_total']}")
+
+        self.stdout.write(
+            f"{tamano:>10} {registros:>10} {t_desglose * 1000:>8.1f}ms {t_proyectos * 1000:>11.1f}ms "
+            f"{t_indicadores * 1000:>10.3f}ms {len(consultas):>10}"
+        )
+
+
+def _comunes():
+    """Datos económicos y ambientales aleatorios de un registro."""
+    return {
+        'costo_unitario': 1, 'costo_mensual_promedio': 1, 'costo_total_anual': random.random() * 1e6,
+        'factor_emision': 0.1, 'emisiones_totales': random.random() * 10,
+    }
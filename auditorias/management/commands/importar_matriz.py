@@ -0,0 +1,111 @@
+import json
+import os
+import time
+from contextlib import nullcontext
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from auditorias.importacion import TOLERANCIA, ImportadorMatriz, archivos_matriz, importar_archivos
+from metricas import cache as cache_metricas
+
+
+class Command(BaseCommand):
+    """
+    Importa la matriz histórica PEVI (formato de empresas.csv, en CSV o XLSX): empresas,
+    proyectos y los registros de las seis fuentes de energía, por lotes con bulk_create.
+    Acepta archivos y directorios: las filas se analizan y validan en paralelo (lotes repartidos
+    en un pool de procesos) y se escriben con un único escritor, una transacción por lote.
+    Re-importar actualiza en lugar de duplicar.
+    Las filas inconsistentes con las fórmulas de los modelos se rechazan y se listan en --reporte.
+    Al terminar reconstruye rollups y benchmarks e invalida la caché de métricas.
+    Uso: python manage.py importar_matriz matrices/ [--procesos 4] [--simulacro] [--reporte rechazos.json]
+    """
+    help = "Importa masivamente empresas, proyectos y consumos desde matrices PEVI (CSV/XLSX)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('rutas', nargs='+', help="Archivos .csv/.xlsx o directorios que los contengan.")
+        parser.add_argument('--lote', type=int, default=1000, help="Filas por transacción (default: 1000).")
+        parser.add_argument(
+            '--procesos', type=int, default=os.cpu_count(),
+            help="Procesos que analizan archivos en paralelo (default: núcleos disponibles)."
+        )
+        parser.add_argument(
+            '--tolerancia', type=float, default=TOLERANCIA,
+            help=f"Diferencia relativa admitida entre valores declarados y calculados (default: {TOLERANCIA})."
+        )
+        parser.add_argument(
+            '--simulacro', action='store_true',
+            help="Analiza y escribe todo dentro de una transacción que se revierte: no guarda nada."
+        )
+        parser.add_argument('--reporte', help="Ruta del reporte JSON de archivos y filas rechazadas.")
+        parser.add_argument(
+            '--crear-centros', action='store_true',
+            help="Crear los Centros PEVI que no existan (por defecto esas filas se rechazan)."
+        )
+        parser.add_argument('--encoding', default='latin-1', help="Codificación de los CSV (default: latin-1).")
+        parser.add_argument('--delimitador', default=';', help="Separador de columnas de los CSV (default: ';').")
+
+    def handle(self, *args, **options):
+        rutas = archivos_matriz(options['rutas'])
+        if not rutas:
+            raise CommandError("No hay archivos .csv ni .xlsx para importar.")
+
+        importador = ImportadorMatriz(tamano_lote=options['lote'], crear_centros=options['crear_centros'])
+        inicio = time.perf_counter()
+
+        # Cada lote se confirma en su propia transacción; solo el simulacro envuelve todo para revertirlo
+        with transaction.atomic() if options['simulacro'] else nullcontext():
+            importar_archivos(
+                rutas, importador, procesos=max(1, options['procesos']),
+                encoding=options['encoding'], delimitador=options['delimitador'], tolerancia=options['tolerancia'],
+            )
+            if options['simulacro']:
+                transaction.set_rollback(True)
+
+        self._resumen(importador, time.perf_counter() - inicio, options['simulacro'])
+        if options['reporte']:
+            self._reporte(options['reporte'], importador, options)
+
+        conteo = importador.conteo
+        if options['simulacro'] or not (conteo['proyectos_creados'] or conteo['proyectos_actualizados']):
+            return
+
+        # bulk_* no dispara señales: agregados y caché se actualizan una sola vez al final
+        call_command('reconstruir_rollups', stdout=self.stdout)
+        call_command('calcular_benchmarks', stdout=self.stdout)
+        cache_metricas.invalidar(*importador.centros_afectados)
+
+    def _resumen(self, importador, segundos, simulacro):
+        conteo = importador.conteo
+        titulo = "Simulacro (no se guardó nada)" if simulacro else "Importación"
+        self.stdout.write(self.style.SUCCESS(
+            f"{titulo}: {conteo['filas']} filas de {len(importador.por_archivo)} archivos en {segundos:.1f} s"
+        ))
+        for clave in (
+            'empresas_creadas', 'empresas_actualizadas', 'proyectos_creados', 'proyectos_actualizados',
+            'registros_creados', 'registros_actualizados', 'registros_eliminados', 'centros_creados', 'duplicadas', 'lideres_sin_usuario',
+        ):
+            if conteo[clave]:
+                self.stdout.write(f"  {clave.replace('_', ' ').capitalize()}: {conteo[clave]}")
+
+        if importador.rechazos:
+            self.stdout.write(self.style.WARNING(f"Filas rechazadas: {len(importador.rechazos)}"))
+            for rechazo in importador.rechazos:
+                self.stdout.write(f"  {rechazo['archivo']}:{rechazo['linea']}: {'; '.join(rechazo['motivos'])}")
+
+    def _reporte(self, ruta, importador, options):
+        reporte = {
+            'simulacro': options['simulacro'],
+            'tolerancia': options['tolerancia'],
+            'archivos': [
+                {'archivo': archivo, 'filas': conteo['filas'], 'rechazadas': conteo['rechazadas']}
+                for archivo, conteo in importador.por_archivo.items()
+            ],
+            'conteo': dict(importador.conteo),
+            'rechazos': importador.rechazos,
+        }
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, ensure_ascii=False, indent=2)
+        self.stdout.write(f"Reporte: {ruta}")
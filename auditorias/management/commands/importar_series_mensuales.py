@@ -0,0 +1,185 @@
+import json
+import re
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from auditorias.busqueda import normalizar
+from auditorias.energia import FUENTES
+from auditorias.importacion import ErrorFormato, FilaInvalida, archivos_matriz, filas_archivo, numero
+from auditorias.models import ConsumoMensual, ProyectoAuditoria
+from metricas import cache as cache_metricas
+
+# Encabezado normalizado -> campo ('costo' es opcional)
+COLUMNAS = {'proyecto': 'proyecto', 'fuente': 'fuente', 'mes': 'mes', 'consumo': 'cantidad', 'costo': 'costo'}
+OBLIGATORIAS = {'proyecto', 'fuente', 'mes', 'cantidad'}
+
+# Acepta la clave ('gas_natural') o el nombre ('Gas Natural') de la fuente
+FUENTE_POR_TEXTO = {
+    **{normalizar(fuente.nombre): fuente for fuente in FUENTES},
+    **{fuente.clave: fuente for fuente in FUENTES},
+}
+
+MES = re.compile(r'^(?:(\d{4})-(\d{1,2})(?:-\d{1,2})?|(\d{1,2})/(\d{4}))$')
+
+
+def periodo(texto):
+    """Primer día del mes de '2024-03', '2024-03-01' o '03/2024'."""
+    coincide = MES.match((texto or '').strip())
+    if not coincide:
+        raise FilaInvalida(f"Mes inválido: '{(texto or '').strip()}' (use AAAA-MM)")
+    anio, mes = (coincide.group(1), coincide.group(2)) if coincide.group(1) else (coincide.group(4), coincide.group(3))
+    if not 1 <= int(mes) <= 12:
+        raise FilaInvalida(f"Mes inválido: '{texto.strip()}'")
+    return date(int(anio), int(mes), 1)
+
+
+class Command(BaseCommand):
+    """
+    Carga en bloque series mensuales de consumo (ConsumoMensual) desde CSV/XLSX en formato
+    largo: una fila por proyecto, fuente y mes, con columnas Proyecto (id), Fuente, Mes
+    (AAAA-MM), Consumo (unidad original de la fuente; kWh para electricidad) y Costo (opcional),
+    con números en el formato colombiano de la matriz ("1.442.736", "0,25", "$ 880.068").
+    Los meses se guardan por lotes con upsert (re-importar actualiza en lugar de duplicar) y al
+    final se derivan los totales anuales de cada registro tocado (aplicar_serie_mensual), lo que
+    actualiza kWh, emisiones, libro, resumen, rollups y caché como un guardado desde el formulario;
+    la caché de métricas de los centros tocados se invalida aunque no cambie ningún total anual.
+    Las filas de fuentes sin registro anual en el proyecto se rechazan: la serie necesita su PC y FE.
+    Uso: python manage.py importar_series_mensuales series/ [--simulacro] [--reporte rechazos.json]
+    """
+    help = "Importa series mensuales de consumo por proyecto y fuente (CSV/XLSX)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('rutas', nargs='+', help="Archivos .csv/.xlsx o directorios que los contengan.")
+        parser.add_argument('--lote', type=int, default=5000, help="Filas por lote (default: 5000).")
+        parser.add_argument(
+            '--simulacro', action='store_true',
+            help="Valida y escribe todo dentro de una transacción que se revierte: no guarda nada."
+        )
+        parser.add_argument('--reporte', help="Ruta del reporte JSON de filas rechazadas.")
+        parser.add_argument('--encoding', default='latin-1', help="Codificación de los CSV (default: latin-1).")
+        parser.add_argument('--delimitador', default=';', help="Separador de columnas de los CSV (default: ';').")
+
+    def handle(self, *args, **options):
+        rutas = archivos_matriz(options['rutas'])
+        if not rutas:
+            raise CommandError("No hay archivos .csv ni .xlsx para importar.")
+
+        inicio = time.perf_counter()
+        self.rechazos = []
+        self.meses = 0
+        # (proyecto_id, clave de fuente) -> registro anual; None si el proyecto no lo tiene
+        self.registros = {}
+
+        with transaction.atomic():
+            for ruta in rutas:
+                try:
+                    self._importar(ruta, options)
+                except ErrorFormato as error:
+                    self.rechazos.append({'archivo': ruta, 'linea': 0, 'motivos': [f"Archivo no importable: {error}"]})
+
+            # Totales anuales: un guardado por registro tocado (kWh, emisiones, libro, resumen y rollups)
+            afectados = [registro for registro in self.registros.values() if registro is not None]
+            totalizados = sum(registro.aplicar_serie_mensual() for registro in afectados)
+            # guardar_lote no dispara señales: se invalida aunque ningún total anual cambie
+            # (tras el COMMIT; en el simulacro no se llega a invalidar)
+            cache_metricas.invalidar(*ProyectoAuditoria.objects.filter(
+                pk__in={registro.proyecto_id for registro in afectados}
+            ).values_list('centro_id', flat=True).distinct())
+            transaction.set_rollback(options['simulacro'])
+
+        titulo = "Simulacro (no se guardó nada)" if options['simulacro'] else "Series mensuales"
+        self.stdout.write(self.style.SUCCESS(
+            f"{titulo}: {self.meses} meses de {len(afectados)} registros en {time.perf_counter() - inicio:.1f} s; "
+            f"totales anuales recalculados en {totalizados}"
+        ))
+        if self.rechazos:
+            self.stdout.write(self.style.WARNING(f"Filas rechazadas: {len(self.rechazos)}"))
+            for rechazo in self.rechazos:
+                self.stdout.write(f"  {rechazo['archivo']}:{rechazo['linea']}: {'; '.join(rechazo['motivos'])}")
+        if options['reporte']:
+            with open(options['reporte'], 'w', encoding='utf-8') as archivo:
+                json.dump(
+                    {'simulacro': options['simulacro'], 'meses': self.meses, 'rechazos': self.rechazos},
+                    archivo, ensure_ascii=False, indent=2
+                )
+            self.stdout.write(f"Reporte: {options['reporte']}")
+
+    def _importar(self, ruta, options):
+        filas = filas_archivo(ruta, options['encoding'], options['delimitador'])
+        _linea, encabezado = next(filas, (0, []))
+        indices = {COLUMNAS[normalizar(nombre)]: i for i, nombre in enumerate(encabezado) if normalizar(nombre) in COLUMNAS}
+        faltantes = OBLIGATORIAS - set(indices)
+        if faltantes:
+            raise ErrorFormato(f"faltan las columnas {', '.join(sorted(faltantes))}")
+
+        lote = []
+        for linea, valores in filas:
+            if not any(v.strip() for v in valores):
+                continue
+            try:
+                lote.append((linea, self._fila(valores, indices)))
+            except FilaInvalida as error:
+                self.rechazos.append({'archivo': ruta, 'linea': linea, 'motivos': list(error.args)})
+                continue
+            if len(lote) >= options['lote']:
+                self._guardar(ruta, lote)
+                lote = []
+        if lote:
+            self._guardar(ruta, lote)
+
+    def _fila(self, valores, indices):
+        def celda(campo):
+            i = indices.get(campo)
+            return valores[i].strip() if i is not None and i < len(valores) else ''
+
+        if not celda('proyecto').isdigit():
+            raise FilaInvalida(f"Proyecto inválido: '{celda('proyecto')}'")
+        fuente = FUENTE_POR_TEXTO.get(normalizar(celda('fuente')))
+        if fuente is None:
+            raise FilaInvalida(f"Fuente desconocida: '{celda('fuente')}'")
+        cantidad, costo = numero(celda('cantidad')), numero(celda('costo'))
+        if cantidad < 0 or costo < 0:
+            raise FilaInvalida("Valor negativo")
+        return {
+            'proyecto_id': int(celda('proyecto')), 'fuente': fuente, 'periodo': periodo(celda('mes')),
+            'cantidad': cantidad, 'costo': costo,
+        }
+
+    def _cargar_registros(self, filas):
+        """Registro anual de cada (proyecto, fuente) nuevo del lote: una consulta por fuente."""
+        pendientes = {}
+        for fila in filas:
+            clave = (fila['proyecto_id'], fila['fuente'].clave)
+            if clave not in self.registros:
+                pendientes.setdefault(fila['fuente'], set()).add(fila['proyecto_id'])
+
+        for fuente, proyecto_ids in pendientes.items():
+            # El primero de cada proyecto, como registros_proyecto() y el formulario
+            for registro in fuente.modelo.objects.filter(proyecto_id__in=proyecto_ids).order_by('-pk'):
+                self.registros[registro.proyecto_id, fuente.clave] = registro
+            for proyecto_id in proyecto_ids:
+                self.registros.setdefault((proyecto_id, fuente.clave), None)
+
+    def _guardar(self, ruta, lote):
+        self._cargar_registros(fila for _linea, fila in lote)
+
+        meses = {}
+        for linea, fila in lote:
+            registro = self.registros[fila['proyecto_id'], fila['fuente'].clave]
+            if registro is None:
+                self.rechazos.append({
+                    'archivo': ruta, 'linea': linea,
+                    'motivos': [f"El proyecto {fila['proyecto_id']} no tiene registro anual de {fila['fuente'].nombre}"],
+                })
+                continue
+            # Un mes repetido en el lote: gana la última fila
+            meses[fila['proyecto_id'], fila['fuente'].clave, fila['periodo']] = ConsumoMensual(
+                proyecto_id=fila['proyecto_id'], fuente=fila['fuente'].clave, periodo=fila['periodo'],
+                cantidad=fila['cantidad'], costo=fila['costo'], kwh=fila['cantidad'] * registro.kwh_por_unidad(),
+            )
+
+        ConsumoMensual.guardar_lote(list(meses.values()))
+        self.meses += len(meses)
@@ -0,0 +1,147 @@
+import time
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auditorias.energia import FUENTES
+from auditorias.importacion import actualizar_lote
+from auditorias.models import (
+    CombustibleBase, ConsumoMensual, ProyectoAuditoria, RegistroEnergetico, ResumenEnergetico
+)
+from metricas import cache as cache_metricas
+
+COMBUSTIBLES = {fuente.clave: fuente for fuente in FUENTES if issubclass(fuente.modelo, CombustibleBase)}
+
+# Columnas leídas de cada registro (sin instanciar modelos)
+COLUMNAS = (
+    'pk', 'proyecto_id', 'consumo_anual_orig', 'poder_calorifico', 'costo_total_anual',
+    'consumo_anual_kwh', 'costo_kwh_equivalente', 'factor_emision', 'emisiones_totales',
+)
+DERIVADOS = ['consumo_anual_kwh', 'costo_kwh_equivalente', 'emisiones_totales']
+
+
+class Command(BaseCommand):
+    """
+    Recalcula los campos derivados de los combustibles (consumo_anual_kwh, costo_kwh_equivalente y
+    emisiones_totales) con las fórmulas vigentes de save(), p. ej. tras corregir un FACTOR_UNIDAD.
+    Lee por lotes con iterator(), calcula cada lote vectorizado (CombustibleBase.derivar_lote)
+    y guarda solo las filas que cambian (upsert por pk, ver importacion.actualizar_lote),
+    junto con su libro energético, los kWh de su serie mensual y su resumen.
+    Con --diferencias solo informa las filas cuyo valor guardado no coincide con la fórmula.
+    Uso: python manage.py recalcular_combustibles [--centro ID] [--fuente fuel_oil] [--diferencias]
+    """
+    help = "Recalcula en bloque los kWh, $/kWh y emisiones derivados de los registros de combustibles."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--centro', type=int, help="Limitar a los proyectos de un Centro PEVI (id).")
+        parser.add_argument(
+            '--fuente', choices=sorted(COMBUSTIBLES), action='append',
+            help="Limitar a un combustible (se puede repetir). Por defecto, todos."
+        )
+        parser.add_argument('--lote', type=int, default=2000, help="Registros por lote (default: 2000).")
+        parser.add_argument(
+            '--diferencias', action='store_true',
+            help="No guardar: listar las filas cuyo valor guardado difiere del calculado."
+        )
+        parser.add_argument(
+            '--tolerancia', type=float, default=1e-9,
+            help="Diferencia relativa a partir de la cual un valor se considera distinto (default: 1e-9)."
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        claves = options['fuente'] or list(COMBUSTIBLES)
+        proyectos_afectados = set()
+        revisados = distintos = 0
+
+        for clave in claves:
+            fuente = COMBUSTIBLES[clave]
+            registros = fuente.modelo.objects.order_by('pk')
+            if options['centro']:
+                registros = registros.filter(proyecto__centro_id=options['centro'])
+
+            lote = []
+            for fila in registros.values_list(*COLUMNAS).iterator(chunk_size=options['lote']):
+                lote.append(fila)
+                if len(lote) >= options['lote']:
+                    distintos += self._procesar(fuente, lote, options, proyectos_afectados)
+                    revisados += len(lote)
+                    lote = []
+            if lote:
+                distintos += self._procesar(fuente, lote, options, proyectos_afectados)
+                revisados += len(lote)
+
+        segundos = time.perf_counter() - inicio
+        if options['diferencias']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Registros revisados: {revisados}; con valores distintos a la fórmula: {distintos} ({segundos:.1f} s)"
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Registros revisados: {revisados}; recalculados: {distintos} en {len(proyectos_afectados)} proyectos "
+            f"({segundos:.1f} s)"
+        ))
+        if distintos:
+            # Las escrituras en bloque no disparan señales: agregados y caché se actualizan una vez al final
+            call_command('reconstruir_rollups', stdout=self.stdout)
+            call_command('calcular_benchmarks', stdout=self.stdout)
+            centros = ProyectoAuditoria.objects.filter(pk__in=proyectos_afectados).values_list('centro_id', flat=True)
+            cache_metricas.invalidar(*set(centros))
+
+    def _procesar(self, fuente, lote, options, proyectos_afectados):
+        """Recalcula un lote; guarda (o informa) las filas distintas. Devuelve cuántas son."""
+        columnas = dict(zip(COLUMNAS, zip(*lote)))
+        kwh, costo_kwh = fuente.modelo.derivar_lote(
+            columnas['consumo_anual_orig'], columnas['poder_calorifico'], columnas['costo_total_anual'],
+            columnas['consumo_anual_kwh'], columnas['costo_kwh_equivalente'],
+        )
+        kwh_guardado = np.asarray(columnas['consumo_anual_kwh'], dtype=np.float64)
+        costo_kwh_guardado = np.asarray(columnas['costo_kwh_equivalente'], dtype=np.float64)
+        emisiones_guardadas = np.asarray(columnas['emisiones_totales'], dtype=np.float64)
+        # Mismas operaciones que factores.emisiones(): kWh * FE / 1000
+        emisiones = kwh * np.asarray(columnas['factor_emision'], dtype=np.float64) / 1000
+
+        tolerancia = options['tolerancia']
+        distintos = np.flatnonzero(
+            ~np.isclose(kwh, kwh_guardado, rtol=tolerancia, atol=0)
+            | ~np.isclose(costo_kwh, costo_kwh_guardado, rtol=tolerancia, atol=0)
+            | ~np.isclose(emisiones, emisiones_guardadas, rtol=tolerancia, atol=0)
+        )
+        if not distintos.size:
+            return 0
+
+        if options['diferencias']:
+            for i in distintos:
+                self.stdout.write(
+                    f"  {fuente.nombre} #{lote[i][0]} (proyecto {lote[i][1]}): "
+                    f"kWh {kwh_guardado[i]:.2f} -> {kwh[i]:.2f}, $/kWh {costo_kwh_guardado[i]:.4f} -> {costo_kwh[i]:.4f}, "
+                    f"TonCO2 {emisiones_guardadas[i]:.2f} -> {emisiones[i]:.2f}"
+                )
+            return distintos.size
+
+        with transaction.atomic():
+            # Registros completos: el upsert inserta la fila entera antes de resolver el conflicto
+            por_pk = fuente.modelo.objects.in_bulk([lote[i][0] for i in distintos])
+            registros = []
+            for i in distintos:
+                registro = por_pk.get(lote[i][0])
+                if registro is None:  # borrado mientras se recorría la tabla
+                    continue
+                registro.consumo_anual_kwh = float(kwh[i])
+                registro.costo_kwh_equivalente = float(costo_kwh[i])
+                # Antes del libro: desde_registro() copia las emisiones del registro
+                registro.emisiones_totales = registro.emisiones_calculadas()
+                registros.append(registro)
+            proyectos = {r.proyecto_id for r in registros}
+
+            actualizar_lote(fuente.modelo, registros, DERIVADOS)
+            RegistroEnergetico.guardar_lote([RegistroEnergetico.desde_registro(r) for r in registros])
+            ConsumoMensual.actualizar_kwh_lote(registros)
+            ResumenEnergetico.guardar_lote(ResumenEnergetico.calcular_lote(
+                list(ProyectoAuditoria.objects.filter(pk__in=proyectos).only('id', 'produccion_total'))
+            ))
+        proyectos_afectados.update(proyectos)
+        return len(registros)
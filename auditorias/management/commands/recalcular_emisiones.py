@@ -0,0 +1,67 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from auditorias import factores
+from auditorias.energia import FUENTE_POR_CLAVE
+from auditorias.models import ProyectoAuditoria
+from metricas import cache as cache_metricas
+
+
+class Command(BaseCommand):
+    """
+    Aplica el catálogo de factores de referencia (FactorReferencia) a todo el portafolio:
+    cada registro toma el factor de emisión vigente en el año de su proyecto y sus emisiones
+    se recalculan como kWh * FE / 1000 (la fórmula de FuenteEnergiaBase.save).
+    Todo ocurre en la base de datos: un UPDATE por fuente y vigencia y otro por fuente para
+    las emisiones, sin cargar registros. Luego reconstruye libro, resúmenes, rollups y benchmarks.
+    Los proyectos de años sin factor en el catálogo conservan el suyo.
+    Uso: python manage.py recalcular_emisiones [--centro ID] [--fuente electricidad] [--conservar-factores]
+    """
+    help = "Recalcula las emisiones de todo el portafolio con los factores de referencia vigentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--centro', type=int, help="Limitar a los proyectos de un Centro PEVI (id).")
+        parser.add_argument(
+            '--fuente', choices=sorted(FUENTE_POR_CLAVE), action='append',
+            help="Limitar a una fuente (se puede repetir). Por defecto, todas."
+        )
+        parser.add_argument(
+            '--conservar-factores', action='store_true',
+            help="No aplicar el catálogo: recalcular las emisiones con el factor guardado en cada registro."
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        claves = options['fuente'] or list(FUENTE_POR_CLAVE)
+
+        with transaction.atomic():
+            for clave in claves:
+                fuente = FUENTE_POR_CLAVE[clave]
+                registros = fuente.modelo.objects.all()
+                if options['centro']:
+                    registros = registros.filter(proyecto__centro_id=options['centro'])
+
+                con_catalogo = 0
+                if not options['conservar_factores']:
+                    for factor, desde, hasta in factores.vigencias(clave):
+                        vigentes = registros.filter(proyecto__anio__gte=desde)
+                        if hasta is not None:
+                            vigentes = vigentes.filter(proyecto__anio__lt=hasta)
+                        con_catalogo += vigentes.update(factor_emision=factor.factor_emision)
+
+                # Mismas operaciones que factores.emisiones(): kWh * FE / 1000
+                total = registros.update(emisiones_totales=F(fuente.campo_kwh) * F('factor_emision') / 1000)
+                self.stdout.write(f"  {fuente.nombre}: {total} registros ({con_catalogo} con factor del catálogo)")
+
+        self.stdout.write(self.style.SUCCESS(f"Emisiones recalculadas ({time.perf_counter() - inicio:.1f} s)"))
+
+        # update() no dispara señales: libro, resúmenes, rollups y benchmarks se rehacen en bloque
+        call_command('reconstruir_resumenes', centro=options['centro'], stdout=self.stdout)
+        if options['centro']:
+            cache_metricas.invalidar(options['centro'])
+        else:
+            cache_metricas.invalidar(*ProyectoAuditoria.objects.values_list('centro_id', flat=True).distinct())
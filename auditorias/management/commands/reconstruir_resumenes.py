@@ -0,0 +1,76 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auditorias.energia import FUENTES
+from auditorias.models import ProyectoAuditoria, RegistroEnergetico, ResumenEnergetico
+
+
+class Command(BaseCommand):
+    """
+    Reconstruye en bloque el libro energético (RegistroEnergetico) y la tabla
+    ResumenEnergetico desde la bitácora. Procesa los proyectos por lotes para mantener la memoria acotada.
+    Al terminar reconstruye también los rollups por centro y región.
+    Uso: python manage.py reconstruir_resumenes [--centro ID] [--lote 2000]
+    """
+    help = "Recalcula los resúmenes energéticos materializados de todos los proyectos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--centro', type=int, help="Limitar a los proyectos de un Centro PEVI (id).")
+        parser.add_argument('--lote', type=int, default=2000, help="Proyectos por transacción (default: 2000).")
+
+    def handle(self, *args, **options):
+        self._reconstruir_libro(options['centro'], options['lote'])
+
+        proyectos = ProyectoAuditoria.objects.only('id', 'produccion_total').order_by('id')
+        if options['centro']:
+            proyectos = proyectos.filter(centro_id=options['centro'])
+
+        tamano_lote = options['lote']
+        lote = []
+        total = 0
+
+        for proyecto in proyectos.iterator(chunk_size=tamano_lote):
+            lote.append(proyecto)
+            if len(lote) >= tamano_lote:
+                total += self._guardar_lote(lote)
+                lote = []
+        if lote:
+            total += self._guardar_lote(lote)
+
+        self.stdout.write(self.style.SUCCESS(f"Resúmenes reconstruidos: {total}"))
+
+        # bulk_create no dispara señales: los rollups de centro/región se rehacen completos
+        call_command('reconstruir_rollups', stdout=self.stdout)
+        # Los benchmarks sectoriales se derivan de los mismos resúmenes
+        call_command('calcular_benchmarks', stdout=self.stdout)
+
+    def _reconstruir_libro(self, centro_id, tamano_lote):
+        """Rehace el libro desde las seis tablas (también descarta filas huérfanas de borrados masivos)."""
+        total = 0
+        with transaction.atomic():
+            libro = RegistroEnergetico.objects.all()
+            if centro_id:
+                libro = libro.filter(proyecto__centro_id=centro_id)
+            libro.delete()
+
+            for fuente in FUENTES:
+                registros = fuente.modelo.objects.order_by('pk')
+                if centro_id:
+                    registros = registros.filter(proyecto__centro_id=centro_id)
+                lote = []
+                for registro in registros.iterator(chunk_size=tamano_lote):
+                    lote.append(RegistroEnergetico.desde_registro(registro))
+                    if len(lote) >= tamano_lote:
+                        total += len(RegistroEnergetico.guardar_lote(lote))
+                        lote = []
+                if lote:
+                    total += len(RegistroEnergetico.guardar_lote(lote))
+
+        self.stdout.write(self.style.SUCCESS(f"Libro energético reconstruido: {total} registros"))
+
+    def _guardar_lote(self, proyectos):
+        resumenes = ResumenEnergetico.calcular_lote(proyectos)
+        with transaction.atomic():
+            ResumenEnergetico.guardar_lote(resumenes)
+        return len(resumenes)
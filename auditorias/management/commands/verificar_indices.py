@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from auditorias import indices
+
+
+class Command(BaseCommand):
+    """
+    Ejecuta EXPLAIN sobre las consultas calientes de ProyectoAuditoria (auditorias.indices)
+    y falla si alguna recorre la tabla completa. La misma verificación corre como test
+    (auditorias.tests.IndicesProyectoTests); el comando sirve para revisar una base real.
+    Con --proyectos N siembra N proyectos sintéticos en una transacción que se
+    revierte al final, para que el planificador decida con volúmenes reales.
+    Uso: python manage.py verificar_indices [--proyectos 50000]
+    """
+    help = "Verifica con EXPLAIN que los filtros frecuentes de proyectos usan índices."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--proyectos', type=int, default=0,
+            help="Proyectos sintéticos a sembrar antes de medir (0 = usar los datos actuales)."
+        )
+        parser.add_argument('--centros', type=int, default=30, help="Centros sintéticos al sembrar.")
+        parser.add_argument('--semilla', type=int, default=42, help="Semilla aleatoria de los datos sintéticos.")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in indices.DETECTORES:
+            raise CommandError(f"Motor '{connection.vendor}' sin detector de recorridos completos.")
+
+        fallas = []
+        with transaction.atomic():
+            if options['proyectos']:
+                indices.sembrar(options['proyectos'], options['centros'], options['semilla'])
+                self.stdout.write(f"Sembrados {options['proyectos']} proyectos en {options['centros']} centros.")
+            if not indices.consultas_calientes():
+                raise CommandError("No hay proyectos con líder: use --proyectos para sembrar datos.")
+
+            for nombre, plan, recorridos in indices.planes():
+                if recorridos:
+                    fallas.append(nombre)
+                    self.stdout.write(self.style.ERROR(f"✗ {nombre}: {'; '.join(recorridos)}"))
+                else:
+                    self.stdout.write(f"✓ {nombre}")
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan)
+            transaction.set_rollback(True)
+
+        if fallas:
+            raise CommandError(f"Recorridos completos en: {', '.join(fallas)}")
+        self.stdout.write(self.style.SUCCESS("Todas las consultas usan índices."))
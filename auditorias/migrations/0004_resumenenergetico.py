@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+FUENTES = [
+    ('Electricidad', 'consumo_anual', 'kwh_electrico'),
+    ('GasNatural', 'consumo_anual_kwh', 'kwh_termico'),
+    ('CarbonMineral', 'consumo_anual_kwh', 'kwh_termico'),
+    ('FuelOil', 'consumo_anual_kwh', 'kwh_termico'),
+    ('Biomasa', 'consumo_anual_kwh', 'kwh_termico'),
+    ('GasPropano', 'consumo_anual_kwh', 'kwh_termico'),
+]
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Crea el resumen inicial de los proyectos existentes."""
+    ProyectoAuditoria = apps.get_model('auditorias', 'ProyectoAuditoria')
+    ResumenEnergetico = apps.get_model('auditorias', 'ResumenEnergetico')
+
+    acumulado = {
+        pk: {'kwh_electrico': 0.0, 'kwh_termico': 0.0, 'costo_total': 0.0, 'emisiones_totales': 0.0}
+        for pk in ProyectoAuditoria.objects.values_list('pk', flat=True)
+    }
+    for nombre_modelo, campo_kwh, destino in FUENTES:
+        modelo = apps.get_model('auditorias', nombre_modelo)
+        filas = modelo.objects.order_by().values('proyecto_id').annotate(
+            kwh=Sum(campo_kwh), costo=Sum('costo_total_anual'), emisiones=Sum('emisiones_totales')
+        )
+        for fila in filas:
+            totales = acumulado[fila['proyecto_id']]
+            totales[destino] += fila['kwh'] or 0.0
+            totales['costo_total'] += fila['costo'] or 0.0
+            totales['emisiones_totales'] += fila['emisiones'] or 0.0
+
+    resumenes = []
+    for pk, produccion in ProyectoAuditoria.objects.values_list('pk', 'produccion_total'):
+        totales = acumulado[pk]
+        kwh_total = totales['kwh_electrico'] + totales['kwh_termico']
+        ides = kwh_total / produccion if produccion and produccion > 0 else 0.0
+        resumenes.append(ResumenEnergetico(proyecto_id=pk, kwh_total=kwh_total, ides=ides, **totales))
+    ResumenEnergetico.objects.bulk_create(resumenes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditorias', '0003_alter_biomasa_poder_calorifico_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenEnergetico',
+            fields=[
+                ('proyecto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='auditorias.proyectoauditoria')),
+                ('kwh_electrico', models.FloatField(default=0, verbose_name='Energía Eléctrica (kWh/año)')),
+                ('kwh_termico', models.FloatField(default=0, verbose_name='Energía Térmica (kWh/año)')),
+                ('kwh_total', models.FloatField(default=0, verbose_name='Energía Total (kWh/año)')),
+                ('costo_total', models.FloatField(default=0, verbose_name='Costo Total Anual (COP)')),
+                ('emisiones_totales', models.FloatField(default=0, verbose_name='Emisiones Totales (TonCO2/año)')),
+                ('ides', models.FloatField(default=0, verbose_name='IDES (kWh/Unidad)')),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen Energético',
+                'verbose_name_plural': 'Resúmenes Energéticos',
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import ExtractYear
+
+
+def poblar_anio(apps, schema_editor):
+    """Año de los proyectos existentes a partir de su fecha de inicio (un solo UPDATE)."""
+    ProyectoAuditoria = apps.get_model('auditorias', 'ProyectoAuditoria')
+    ProyectoAuditoria.objects.filter(anio__isnull=True).update(anio=ExtractYear('fecha_inicio'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditorias', '0004_resumenenergetico'),
+        ('gestion', '0002_alter_usuario_cargo_alter_usuario_centro_pevi_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proyectoauditoria',
+            name='anio',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Año de la auditoría. Si se deja vacío se toma de la fecha de inicio.', null=True, verbose_name='Año'),
+        ),
+        migrations.AddField(
+            model_name='proyectoauditoria',
+            name='fase',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Fase PEVI'),
+        ),
+        migrations.AddIndex(
+            model_name='proyectoauditoria',
+            index=models.Index(fields=['centro', 'anio'], name='proyecto_centro_anio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyectoauditoria',
+            index=models.Index(fields=['anio', 'fase'], name='proyecto_anio_fase_idx'),
+        ),
+        migrations.RunPython(poblar_anio, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+FUENTES = [
+    ('electricidad', 'Electricidad', 'consumo_anual'),
+    ('gas_natural', 'GasNatural', 'consumo_anual_kwh'),
+    ('carbon_mineral', 'CarbonMineral', 'consumo_anual_kwh'),
+    ('fuel_oil', 'FuelOil', 'consumo_anual_kwh'),
+    ('biomasa', 'Biomasa', 'consumo_anual_kwh'),
+    ('gas_propano', 'GasPropano', 'consumo_anual_kwh'),
+]
+
+
+def poblar_libro(apps, schema_editor):
+    """Copia al libro unificado los registros existentes de las seis tablas de energía."""
+    RegistroEnergetico = apps.get_model('auditorias', 'RegistroEnergetico')
+
+    for clave, nombre_modelo, campo_kwh in FUENTES:
+        modelo = apps.get_model('auditorias', nombre_modelo)
+        filas = modelo.objects.values_list('pk', 'proyecto_id', campo_kwh, 'costo_total_anual', 'emisiones_totales')
+        RegistroEnergetico.objects.bulk_create(
+            [
+                RegistroEnergetico(
+                    proyecto_id=proyecto_id, fuente=clave, registro_id=pk,
+                    kwh=kwh or 0.0, costo=costo or 0.0, emisiones=emisiones or 0.0,
+                )
+                for pk, proyecto_id, kwh, costo, emisiones in filas.iterator(chunk_size=2000)
+            ],
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditorias', '0005_proyecto_anio_fase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroEnergetico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fuente', models.CharField(choices=[('electricidad', 'Electricidad'), ('gas_natural', 'Gas Natural'), ('carbon_mineral', 'Carbón Mineral'), ('fuel_oil', 'Fuel Oil'), ('biomasa', 'Biomasa'), ('gas_propano', 'GLP')], max_length=20)),
+                ('registro_id', models.PositiveBigIntegerField(help_text='Id del registro en la tabla de su fuente')),
+                ('kwh', models.FloatField(default=0, verbose_name='Energía (kWh/año)')),
+                ('costo', models.FloatField(default=0, verbose_name='Costo Anual (COP)')),
+                ('emisiones', models.FloatField(default=0, verbose_name='Emisiones (TonCO2/año)')),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='libro_energetico', to='auditorias.proyectoauditoria')),
+            ],
+            options={
+                'verbose_name': 'Registro del Libro Energético',
+                'verbose_name_plural': 'Libro Energético',
+                'indexes': [models.Index(fields=['proyecto', 'fuente'], name='libro_proyecto_fuente_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fuente', 'registro_id'), name='libro_registro_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_libro, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditorias', '0006_libro_energetico'),
+        ('gestion', '0002_alter_usuario_cargo_alter_usuario_centro_pevi_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proyectoauditoria',
+            index=models.Index(fields=['centro', 'estado'], name='proyecto_centro_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyectoauditoria',
+            index=models.Index(fields=['centro', '-updated_at'], name='proyecto_centro_reciente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyectoauditoria',
+            index=models.Index(fields=['lider_proyecto', '-updated_at'], name='proyecto_lider_reciente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyectoauditoria',
+            index=models.Index(fields=['-updated_at'], name='proyecto_reciente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyectoauditoria',
+            index=models.Index(condition=models.Q(('estado', 'EJECUCION')), fields=['centro'], name='proyecto_en_ejecucion_idx'),
+        ),
+    ]
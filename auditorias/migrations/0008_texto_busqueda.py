@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:17
+
+import unicodedata
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def _normalizar(texto):
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_tildes.casefold().split())
+
+
+def poblar_texto_busqueda(apps, schema_editor):
+    """Texto de búsqueda (sin tildes) de los proyectos existentes."""
+    ProyectoAuditoria = apps.get_model('auditorias', 'ProyectoAuditoria')
+
+    proyectos = list(ProyectoAuditoria.objects.select_related('empresa').only(
+        'pk', 'nombre_proyecto', 'empresa__razon_social', 'empresa__nit', 'empresa__ciudad'
+    ))
+    for p in proyectos:
+        p.texto_busqueda = _normalizar(' '.join([
+            p.nombre_proyecto or '', p.empresa.razon_social or '', p.empresa.nit or '', p.empresa.ciudad or '',
+        ]))
+    ProyectoAuditoria.objects.bulk_update(proyectos, ['texto_busqueda'], batch_size=1000)
+
+
+def crear_indice_trigramas(apps, schema_editor):
+    """Índice GIN de trigramas: solo PostgreSQL (en SQLite la búsqueda funciona sin índice)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS proyecto_busqueda_trgm_idx "
+        "ON auditorias_proyectoauditoria USING gin (texto_busqueda gin_trgm_ops)"
+    )
+
+
+def borrar_indice_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS proyecto_busqueda_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditorias', '0007_indices_filtros_proyecto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proyectoauditoria',
+            name='texto_busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(poblar_texto_busqueda, migrations.RunPython.noop),
+        # pg_trgm: no hace nada fuera de PostgreSQL
+        TrigramExtension(),
+        migrations.RunPython(crear_indice_trigramas, borrar_indice_trigramas),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditorias', '0008_texto_busqueda'),
+        ('gestion', '0002_alter_usuario_cargo_alter_usuario_centro_pevi_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='proyectoauditoria',
+            name='proyecto_centro_reciente_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='proyectoauditoria',
+            name='proyecto_lider_reciente_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='proyectoauditoria',
+            name='proyecto_reciente_idx',
+        ),
+        migrations.AddIndex(
+            model_name='proyectoauditoria',
+            index=models.Index(fields=['centro', '-updated_at', '-id'], name='proyecto_centro_reciente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyectoauditoria',
+            index=models.Index(fields=['lider_proyecto', '-updated_at', '-id'], name='proyecto_lider_reciente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyectoauditoria',
+            index=models.Index(fields=['-updated_at', '-id'], name='proyecto_reciente_idx'),
+        ),
+    ]
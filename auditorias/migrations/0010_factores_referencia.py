@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditorias', '0009_indices_cursor_proyecto'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='biomasa',
+            name='factor_emision',
+            field=models.FloatField(help_text='kgCO2/kWh', verbose_name='Factor de Emisión (FE)'),
+        ),
+        migrations.AlterField(
+            model_name='carbonmineral',
+            name='factor_emision',
+            field=models.FloatField(help_text='kgCO2/kWh', verbose_name='Factor de Emisión (FE)'),
+        ),
+        migrations.AlterField(
+            model_name='electricidad',
+            name='factor_emision',
+            field=models.FloatField(help_text='kgCO2/kWh', verbose_name='Factor de Emisión (FE)'),
+        ),
+        migrations.AlterField(
+            model_name='fueloil',
+            name='factor_emision',
+            field=models.FloatField(help_text='kgCO2/kWh', verbose_name='Factor de Emisión (FE)'),
+        ),
+        migrations.AlterField(
+            model_name='gasnatural',
+            name='factor_emision',
+            field=models.FloatField(help_text='kgCO2/kWh', verbose_name='Factor de Emisión (FE)'),
+        ),
+        migrations.AlterField(
+            model_name='gaspropano',
+            name='factor_emision',
+            field=models.FloatField(help_text='kgCO2/kWh', verbose_name='Factor de Emisión (FE)'),
+        ),
+        migrations.CreateModel(
+            name='FactorReferencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fuente', models.CharField(choices=[('electricidad', 'Electricidad'), ('gas_natural', 'Gas Natural'), ('carbon_mineral', 'Carbón Mineral'), ('fuel_oil', 'Fuel Oil'), ('biomasa', 'Biomasa'), ('gas_propano', 'GLP')], max_length=20)),
+                ('anio', models.PositiveSmallIntegerField(verbose_name='Vigente desde (año)')),
+                ('factor_emision', models.FloatField(verbose_name='Factor de Emisión (kgCO2/kWh)')),
+                ('poder_calorifico', models.FloatField(blank=True, help_text='kJ/m³ (Gases/Líq) o kJ/kg (Sólidos). Vacío para electricidad.', null=True, verbose_name='Poder Calorífico (PC)')),
+                ('referencia', models.CharField(blank=True, help_text='Ej: UPME - Resolución de factores 2025', max_length=200)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Factor de Referencia',
+                'verbose_name_plural': 'Factores de Referencia',
+                'ordering': ['fuente', '-anio'],
+                'constraints': [models.UniqueConstraint(fields=('fuente', 'anio'), name='factor_fuente_anio_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditorias', '0010_factores_referencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fuente', models.CharField(choices=[('electricidad', 'Electricidad'), ('gas_natural', 'Gas Natural'), ('carbon_mineral', 'Carbón Mineral'), ('fuel_oil', 'Fuel Oil'), ('biomasa', 'Biomasa'), ('gas_propano', 'GLP')], max_length=20)),
+                ('periodo', models.DateField(help_text='Primer día del mes', verbose_name='Mes')),
+                ('cantidad', models.FloatField(help_text='kWh para electricidad', verbose_name='Consumo (Ud. Original)')),
+                ('costo', models.FloatField(default=0, verbose_name='Costo (COP)')),
+                ('kwh', models.FloatField(default=0, verbose_name='Energía (kWh)')),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos_mensuales', to='auditorias.proyectoauditoria')),
+            ],
+            options={
+                'verbose_name': 'Consumo Mensual',
+                'verbose_name_plural': 'Consumos Mensuales',
+                'ordering': ['proyecto', 'fuente', 'periodo'],
+                'constraints': [models.UniqueConstraint(fields=('proyecto', 'fuente', 'periodo'), name='consumo_mensual_unico')],
+            },
+        ),
+    ]
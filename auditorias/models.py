@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.conf import settings # Para referenciar al Usuario correctamente
 from gestion.models import CentroPevi
 from django.core.validators import FileExtensionValidator
@@ -21,6 +22,56 @@ class Empresa(models.Model):
     def __str__(self):
         return f"{self.razon_social} ({self.nit})"
 
+    # Campos que forman parte del texto de búsqueda de sus proyectos (auditorias.busqueda)
+    CAMPOS_BUSQUEDA = ('razon_social', 'nit', 'ciudad')
+
+    def save(self, *args, **kwargs):
+        from .busqueda import texto_busqueda
+
+        with transaction.atomic():
+            reindexar = self._cambio_busqueda(kwargs.get('update_fields'))
+            super().save(*args, **kwargs)
+            if reindexar:
+                proyectos = list(self.auditorias.only('pk', 'nombre_proyecto'))
+                for proyecto in proyectos:
+                    proyecto.texto_busqueda = texto_busqueda(proyecto, empresa=self)
+                ProyectoAuditoria.objects.bulk_update(proyectos, ['texto_busqueda'])
+
+    def _cambio_busqueda(self, update_fields=None):
+        """True si este guardado cambia razón social, NIT o ciudad respecto a la fila guardada."""
+        if self._state.adding:
+            return False  # Empresa nueva: aún no tiene proyectos
+        if update_fields is not None and not set(update_fields) & set(self.CAMPOS_BUSQUEDA):
+            return False
+        guardada = Empresa.objects.filter(pk=self.pk).values(*self.CAMPOS_BUSQUEDA).first()
+        return guardada != {campo: getattr(self, campo) for campo in self.CAMPOS_BUSQUEDA}
+
+class ProyectoQuerySet(models.QuerySet):
+
+    def con_totales_energia(self):
+        """
+        Anota los totales energéticos del resumen materializado con un solo JOIN
+        (total_kwh, total_emisiones, total_costo, ...). get_total_kwh() y
+        get_total_emisiones() los usan sin volver a consultar.
+        """
+        from .energia import anotar_totales
+        return anotar_totales(self)
+
+    def con_tamano_equipo(self):
+        """
+        Anota 'tamano_equipo' con una subconsulta correlacionada (no con Count('equipo'),
+        que tras filter(equipo=...) reutilizaría el JOIN y contaría solo al usuario filtrado).
+        """
+        miembros = (
+            ProyectoAuditoria.equipo.through.objects
+            .filter(proyectoauditoria=models.OuterRef('pk'))
+            .order_by()
+            .values('proyectoauditoria')
+            .annotate(total=models.Count('*'))
+            .values('total')
+        )
+        return self.annotate(tamano_equipo=Coalesce(models.Subquery(miembros), 0))
+
 class ProyectoAuditoria(models.Model):
     """
     La auditoría específica. Vincula un Centro PEVI con una Empresa en un tiempo determinado.
@@ -56,6 +107,13 @@ class ProyectoAuditoria(models.Model):
     fecha_inicio = models.DateField()
     fecha_cierre_estimada = models.DateField(null=True, blank=True)
     estado = models.CharField(max_length=20, choices=ESTADOS, default='BORRADOR')
+
+    # Dimensión temporal (columnas 'Año' y 'Fase' de la matriz PEVI)
+    anio = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name="Año",
+        help_text="Año de la auditoría. Si se deja vacío se toma de la fecha de inicio."
+    )
+    fase = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Fase PEVI")
     
     # Contexto Productivo (Para calcular indicadores de intensidad energética después)
     produccion_total = models.FloatField(
@@ -74,54 +132,71 @@ class ProyectoAuditoria(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Nombre, empresa, NIT y ciudad sin tildes ni mayúsculas (auditorias.busqueda)
+    texto_busqueda = models.TextField(blank=True, default='', editable=False)
+
+    objects = ProyectoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Dashboards por centro y año / comparativos interanuales por fase
+            models.Index(fields=['centro', 'anio'], name='proyecto_centro_anio_idx'),
+            models.Index(fields=['anio', 'fase'], name='proyecto_anio_fase_idx'),
+            # Listados y dashboards por alcance, "recientes primero" (python manage.py verificar_indices)
+            models.Index(fields=['centro', 'estado'], name='proyecto_centro_estado_idx'),
+            # (incluyen 'id': desempate del orden de la paginación por cursor)
+            models.Index(fields=['centro', '-updated_at', '-id'], name='proyecto_centro_reciente_idx'),
+            models.Index(fields=['lider_proyecto', '-updated_at', '-id'], name='proyecto_lider_reciente_idx'),
+            models.Index(fields=['-updated_at', '-id'], name='proyecto_reciente_idx'),
+            # KPI "activos": pocos proyectos en ejecución frente al histórico
+            models.Index(
+                fields=['centro'], condition=models.Q(estado='EJECUCION'), name='proyecto_en_ejecucion_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.nombre_proyecto} - {self.empresa.razon_social}"
     
+    def save(self, *args, **kwargs):
+        from .busqueda import texto_busqueda
+
+        if not self.anio and self.fecha_inicio:
+            self.anio = self.fecha_inicio.year
+        self.texto_busqueda = texto_busqueda(self)
+
+        # El IDES del resumen depende de la producción: se recalcula en la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ResumenEnergetico.recalcular(self)
+
+    def get_resumen(self):
+        """Resumen energético materializado del proyecto (None si aún no existe)."""
+        try:
+            return self.resumen
+        except ResumenEnergetico.DoesNotExist:
+            return None
+    
+    def _total(self, anotacion, campo):
+        """
+        Total leído sin consultas si ya está cargado: primero la anotación de
+        con_totales_energia(), luego el resumen de select_related/prefetch_related('resumen').
+        Solo sin ninguno de los dos se lee la fila del resumen.
+        """
+        if anotacion in self.__dict__:
+            return self.__dict__[anotacion]
+        resumen = self.get_resumen()
+        return getattr(resumen, campo) if resumen else 0.0
+
     def get_total_kwh(self):
         """
         Calcula la suma total de energía (Eléctrica + Térmica) en kWh.
         Usado para KPIs rápidos en listados y dashboards.
         """
-        total = 0.0
-        
-        # 1. Sumar Electricidad
-        # Usamos .first() porque la relación devuelve un QuerySet
-        elec = self.electricidad_related.first()
-        if elec:
-            total += elec.consumo_anual
-
-        # 2. Sumar Combustibles (Usando el campo normalizado en kWh)
-        # Lista de las relaciones inversas (related_name)
-        combustibles = [
-            self.gasnatural_related.first(),
-            self.carbonmineral_related.first(),
-            self.fueloil_related.first(),
-            self.biomasa_related.first(),
-            self.gaspropano_related.first()
-        ]
-
-        for fuente in combustibles:
-            if fuente:
-                # Sumamos el campo 'consumo_anual_kwh' que calculamos en el save()
-                total += fuente.consumo_anual_kwh
-        
-        return total
+        return self._total('total_kwh', 'kwh_total')
     
     def get_total_emisiones(self):
         """Calcula la Huella de Carbono Total del proyecto."""
-        total = 0.0
-        # Lista de relaciones
-        fuentes = [
-            self.electricidad_related.first(),
-            self.gasnatural_related.first(),
-            self.carbonmineral_related.first(),
-            self.fueloil_related.first(),
-            self.biomasa_related.first(),
-            self.gaspropano_related.first()
-        ]
-        for f in fuentes:
-            if f: total += f.emisiones_totales
-        return total
+        return self._total('total_emisiones', 'emisiones_totales')
 
 class DocumentoProyecto(models.Model):
     """
@@ -156,25 +231,78 @@ class FuenteEnergiaBase(models.Model):
     costo_mensual_promedio = models.FloatField(verbose_name="Costo Mensual Promedio (COP)")
     costo_total_anual = models.FloatField(verbose_name="Costo Total Anual (COP)")
 
-    # --- 2. DATOS AMBIENTALES (Manuales) ---
-    factor_emision = models.FloatField(verbose_name="Factor de Emisión (FE)", help_text="kgCO2/Unidad")
+    # --- 2. DATOS AMBIENTALES ---
+    # El factor lo propone el catálogo (FactorReferencia); las emisiones se calculan al guardar
+    factor_emision = models.FloatField(verbose_name="Factor de Emisión (FE)", help_text="kgCO2/kWh")
     emisiones_totales = models.FloatField(verbose_name="Emisiones Totales (TonCO2/año)")
 
     class Meta:
         abstract = True
 
+    # (mensual, anual) del consumo en unidad original: lo define cada fuente
+    CAMPOS_CONSUMO = None
+
+    def emisiones_calculadas(self):
+        """Emisiones (TonCO2/año) = kWh/año * FE (kgCO2/kWh) / 1000."""
+        from .factores import emisiones
+        return emisiones(self.get_kwh_equivalente(), self.factor_emision)
+
+    def save(self, *args, **kwargs):
+        self.emisiones_totales = self.emisiones_calculadas()
+        # Libro energético, serie mensual y resumen del proyecto se actualizan en la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            RegistroEnergetico.sincronizar(self)
+            ConsumoMensual.actualizar_kwh(self)
+            ResumenEnergetico.recalcular(self.proyecto)
+
+    def totalizar_serie_mensual(self):
+        """
+        Deriva (sin guardar) los totales anuales de la serie mensual: consumo y costo anual
+        son la suma de los meses base (ConsumoMensual.meses_base), los mensuales su promedio.
+        Devuelve False si no hay meses registrados.
+        """
+        totales = ConsumoMensual.meses_base(self).aggregate(
+            cantidad=models.Sum('cantidad'), costo=models.Sum('costo'), meses=models.Count('pk')
+        )
+        meses = totales['meses']
+        if not meses:
+            return False
+
+        campo_mensual, campo_anual = self.CAMPOS_CONSUMO
+        setattr(self, campo_anual, totales['cantidad'])
+        setattr(self, campo_mensual, totales['cantidad'] / meses)
+        # Sin costos en la serie se conservan los del registro
+        if totales['costo']:
+            self.costo_total_anual = totales['costo']
+            self.costo_mensual_promedio = totales['costo'] / meses
+            if totales['cantidad']:
+                self.costo_unitario = totales['costo'] / totales['cantidad']
+        return True
+
+    def aplicar_serie_mensual(self):
+        """Totaliza la serie mensual y guarda el registro (kWh, emisiones, libro y resumen)."""
+        if not self.totalizar_serie_mensual():
+            return False
+        self.save()
+        return True
+
 class Electricidad(FuenteEnergiaBase):
     """ Campos específicos del Excel para Electricidad """
     consumo_mensual = models.FloatField(verbose_name="Consumo Mensual (kWh/mes)")
     consumo_anual = models.FloatField(verbose_name="Consumo Anual (kWh/año)")
     
     # La electricidad no tiene conversión de unidades ni PC complejo
+    CAMPOS_CONSUMO = ('consumo_mensual', 'consumo_anual')
     
     def get_kwh_equivalente(self):
         return self.consumo_anual # Ya viene en kWh
 
+    def kwh_por_unidad(self):
+        return 1.0
+
     def calcular_emisiones_ton_co2(self):
-        return self.emisiones_totales # Retornamos el valor manual
+        return self.emisiones_totales
 
     class Meta:
         verbose_name = "Registro Electricidad"
@@ -203,29 +331,18 @@ class CombustibleBase(FuenteEnergiaBase):
         abstract = True
     
 
+    # Unidad original -> unidad del PC (1.0: Gas Natural en m3 con PC en kJ/m3, GLP en kg con PC en kJ/kg)
+    FACTOR_UNIDAD = 1.0
+    CAMPOS_CONSUMO = ('consumo_mensual_orig', 'consumo_anual_orig')
+
     def save(self, *args, **kwargs):
         # CÁLCULO AUTOMÁTICO DE ENERGÍA (kWh)
         # Fórmula Base: Energía (kJ) = Cantidad * PC
         # Energía (kWh) = Energía (kJ) / 3600
-        
-        factor_conversion_unidad = 1.0
-        
-        # CASO ESPECIAL: Fuel Oil (Entra en Galones, PC en kJ/m3)
-        # 1 Galón = 0.00378541 m3
-        if self._meta.model_name == 'fueloil':
-             factor_conversion_unidad = 0.00378541
-        
-        # CASO ESPECIAL: Carbón/Biomasa (Entra en Toneladas, PC en kJ/kg)
-        # 1 Tonelada = 1000 kg
-        elif self._meta.model_name in ['carbonmineral', 'biomasa']:
-            factor_conversion_unidad = 1000.0
-            
-        # Gas Natural entra en m3 y PC en kJ/m3 -> Factor 1.0
-        # GLP entra en kg y PC en kJ/kg -> Factor 1.0
 
         if self.consumo_anual_orig and self.poder_calorifico:
             # 1. Calculamos energía total en kJ
-            energia_kj = (self.consumo_anual_orig * factor_conversion_unidad) * self.poder_calorifico
+            energia_kj = (self.consumo_anual_orig * self.FACTOR_UNIDAD) * self.poder_calorifico
             
             # 2. Convertimos a kWh (1 kWh = 3600 kJ)
             self.consumo_anual_kwh = energia_kj / 3600
@@ -235,9 +352,42 @@ class CombustibleBase(FuenteEnergiaBase):
                 self.costo_kwh_equivalente = self.costo_total_anual / self.consumo_anual_kwh
         
         super().save(*args, **kwargs)
-        
+
+    @classmethod
+    def derivar_lote(cls, consumo_anual_orig, poder_calorifico, costo_total_anual, consumo_anual_kwh, costo_kwh_equivalente):
+        """
+        Versión vectorizada (numpy) del cálculo de save() para muchos registros a la vez.
+        Recibe columnas y devuelve (consumo_anual_kwh, costo_kwh_equivalente) tal como save()
+        los dejaría: donde save() no recalcula, se conservan los valores recibidos.
+        """
+        import numpy as np
+
+        orig = np.asarray(consumo_anual_orig, dtype=np.float64)
+        pc = np.asarray(poder_calorifico, dtype=np.float64)
+        costo = np.asarray(costo_total_anual, dtype=np.float64)
+        kwh = np.asarray(consumo_anual_kwh, dtype=np.float64)
+        costo_kwh = np.asarray(costo_kwh_equivalente, dtype=np.float64)
+
+        # Mismas operaciones y en el mismo orden que save(): resultados idénticos bit a bit
+        calcula = (orig != 0) & (pc != 0)
+        kwh = np.where(calcula, (orig * cls.FACTOR_UNIDAD) * pc / 3600, kwh)
+        con_costo = calcula & (costo != 0) & (kwh > 0)
+        costo_kwh = np.where(con_costo, costo / np.where(con_costo, kwh, 1.0), costo_kwh)
+        return kwh, costo_kwh
+
     def get_kwh_equivalente(self):
         return self.consumo_anual_kwh
+
+    def kwh_por_unidad(self):
+        """kWh de una unidad original con el PC del registro (misma fórmula que save())."""
+        return self.FACTOR_UNIDAD * (self.poder_calorifico or 0.0) / 3600
+
+    def totalizar_serie_mensual(self):
+        if not super().totalizar_serie_mensual():
+            return False
+        # save() calcula el kWh anual; el promedio mensual en kWh se deriva aquí
+        self.consumo_mensual_kwh = self.consumo_mensual_orig * self.kwh_por_unidad()
+        return True
         
     def calcular_emisiones_ton_co2(self):
         return self.emisiones_totales
@@ -249,14 +399,273 @@ class GasNatural(CombustibleBase):
     class Meta: verbose_name = "Registro Gas Natural"
 
 class CarbonMineral(CombustibleBase):
+    FACTOR_UNIDAD = 1000.0  # Entra en Toneladas, PC en kJ/kg (1 Ton = 1000 kg)
     class Meta: verbose_name = "Registro Carbón Mineral"
 
 class FuelOil(CombustibleBase):
+    FACTOR_UNIDAD = 0.00378541  # Entra en Galones, PC en kJ/m3 (1 Gal = 0.00378541 m3)
     class Meta: verbose_name = "Registro Fuel Oil"
 
 class Biomasa(CombustibleBase):
+    FACTOR_UNIDAD = 1000.0  # Entra en Toneladas, PC en kJ/kg
     tipo = models.CharField(max_length=50, default="Genérica")
     class Meta: verbose_name = "Registro Biomasa"
 
 class GasPropano(CombustibleBase):
-    class Meta: verbose_name = "Registro GLP"
\ No newline at end of file
+    class Meta: verbose_name = "Registro GLP"
+
+
+# ==========================================
+#  LIBRO ENERGÉTICO UNIFICADO
+# ==========================================
+
+class RegistroEnergetico(models.Model):
+    """
+    Una fila por registro de la bitácora, sin importar la fuente: kWh normalizados,
+    costo y emisiones. Las seis tablas de arriba siguen siendo las que editan los
+    formularios; este libro se sincroniza al guardarlas y es el que se agrega
+    (un solo recorrido indexado para cualquier total entre fuentes).
+    Reconstrucción masiva: python manage.py reconstruir_resumenes
+    """
+    # Mismas claves que auditorias.energia.FUENTES
+    FUENTES = [
+        ('electricidad', 'Electricidad'),
+        ('gas_natural', 'Gas Natural'),
+        ('carbon_mineral', 'Carbón Mineral'),
+        ('fuel_oil', 'Fuel Oil'),
+        ('biomasa', 'Biomasa'),
+        ('gas_propano', 'GLP'),
+    ]
+
+    proyecto = models.ForeignKey(ProyectoAuditoria, on_delete=models.CASCADE, related_name="libro_energetico")
+    fuente = models.CharField(max_length=20, choices=FUENTES)
+    registro_id = models.PositiveBigIntegerField(help_text="Id del registro en la tabla de su fuente")
+    kwh = models.FloatField(default=0, verbose_name="Energía (kWh/año)")
+    costo = models.FloatField(default=0, verbose_name="Costo Anual (COP)")
+    emisiones = models.FloatField(default=0, verbose_name="Emisiones (TonCO2/año)")
+
+    class Meta:
+        verbose_name = "Registro del Libro Energético"
+        verbose_name_plural = "Libro Energético"
+        constraints = [
+            models.UniqueConstraint(fields=['fuente', 'registro_id'], name='libro_registro_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['proyecto', 'fuente'], name='libro_proyecto_fuente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_fuente_display()} - Proyecto {self.proyecto_id}"
+
+    @staticmethod
+    def clave_de(registro):
+        """Identidad en el libro de un registro de cualquiera de las seis tablas."""
+        from .energia import FUENTE_POR_MODELO  # energia importa este módulo
+        return {'fuente': FUENTE_POR_MODELO[registro._meta.concrete_model].clave, 'registro_id': registro.pk}
+
+    @classmethod
+    def desde_registro(cls, registro):
+        """Fila del libro (sin guardar) para un registro ya guardado."""
+        from .energia import FUENTE_POR_MODELO
+        fuente = FUENTE_POR_MODELO[registro._meta.concrete_model]
+        return cls(
+            proyecto_id=registro.proyecto_id,
+            fuente=fuente.clave,
+            registro_id=registro.pk,
+            kwh=getattr(registro, fuente.campo_kwh) or 0.0,
+            costo=registro.costo_total_anual or 0.0,
+            emisiones=registro.emisiones_totales or 0.0,
+        )
+
+    @classmethod
+    def guardar_lote(cls, filas, batch_size=None):
+        """Inserta o actualiza filas del libro (upsert por fuente + registro)."""
+        return cls.objects.bulk_create(
+            filas,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['fuente', 'registro_id'],
+            update_fields=['proyecto', 'kwh', 'costo', 'emisiones'],
+        )
+
+    @classmethod
+    def sincronizar(cls, registro):
+        """Refleja en el libro el registro recién guardado (una sola consulta)."""
+        cls.guardar_lote([cls.desde_registro(registro)])
+
+
+# ==========================================
+#  SERIE MENSUAL DE CONSUMOS
+# ==========================================
+
+class ConsumoMensual(models.Model):
+    """
+    Consumo de una fuente en un mes (tabla angosta: una fila por proyecto, fuente y mes).
+    Muestra la estacionalidad y permite detectar anomalías de facturación; los totales
+    anuales del registro de la fuente se derivan de aquí (FuenteEnergiaBase.aplicar_serie_mensual).
+    Los kWh se normalizan con el poder calorífico del registro y se actualizan al guardarlo.
+    """
+    proyecto = models.ForeignKey(ProyectoAuditoria, on_delete=models.CASCADE, related_name="consumos_mensuales")
+    fuente = models.CharField(max_length=20, choices=RegistroEnergetico.FUENTES)
+    periodo = models.DateField(verbose_name="Mes", help_text="Primer día del mes")
+    cantidad = models.FloatField(verbose_name="Consumo (Ud. Original)", help_text="kWh para electricidad")
+    costo = models.FloatField(default=0, verbose_name="Costo (COP)")
+    kwh = models.FloatField(default=0, verbose_name="Energía (kWh)")
+
+    class Meta:
+        verbose_name = "Consumo Mensual"
+        verbose_name_plural = "Consumos Mensuales"
+        ordering = ['proyecto', 'fuente', 'periodo']
+        constraints = [
+            # Su índice (proyecto, fuente, periodo) sirve también a las series de un proyecto
+            models.UniqueConstraint(fields=['proyecto', 'fuente', 'periodo'], name='consumo_mensual_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_fuente_display()} {self.periodo:%Y-%m} - Proyecto {self.proyecto_id}"
+
+    @classmethod
+    def de_registro(cls, registro):
+        """Serie mensual del proyecto y la fuente de un registro de la bitácora."""
+        return cls.objects.filter(proyecto_id=registro.proyecto_id, fuente=RegistroEnergetico.clave_de(registro)['fuente'])
+
+    @classmethod
+    def meses_base(cls, registro):
+        """Meses que forman los totales anuales: los del año del proyecto o, sin año, los 12 más recientes."""
+        serie = cls.de_registro(registro)
+        anio = registro.proyecto.anio
+        if anio:
+            return serie.filter(periodo__year=anio)
+        return cls.objects.filter(pk__in=serie.order_by('-periodo').values('pk')[:12])
+
+    @classmethod
+    def guardar_lote(cls, meses, batch_size=None):
+        """Inserta o actualiza meses (upsert por proyecto + fuente + periodo)."""
+        return cls.objects.bulk_create(
+            meses,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['proyecto', 'fuente', 'periodo'],
+            update_fields=['cantidad', 'costo', 'kwh'],
+        )
+
+    @classmethod
+    def actualizar_kwh(cls, registro):
+        """Normaliza a kWh la serie de un registro con su PC vigente (una sola consulta)."""
+        return cls.de_registro(registro).update(kwh=models.F('cantidad') * registro.kwh_por_unidad())
+
+    @classmethod
+    def actualizar_kwh_lote(cls, registros):
+        """actualizar_kwh() de muchos registros: una consulta para saber cuáles tienen serie."""
+        por_clave = {(r.proyecto_id, RegistroEnergetico.clave_de(r)['fuente']): r for r in registros}
+        con_serie = (
+            cls.objects.filter(proyecto_id__in={proyecto_id for proyecto_id, _ in por_clave})
+            .order_by().values_list('proyecto_id', 'fuente').distinct()
+        )
+        for clave in con_serie:
+            if clave in por_clave:
+                cls.actualizar_kwh(por_clave[clave])
+
+
+# ==========================================
+#  CATÁLOGO DE FACTORES DE REFERENCIA
+# ==========================================
+
+class FactorReferencia(models.Model):
+    """
+    Factor de emisión y poder calorífico de referencia (UPME) por fuente y año.
+    Un factor rige desde su año hasta el año del siguiente de la misma fuente.
+    Los formularios lo proponen por defecto (auditorias.factores) y
+    'manage.py recalcular_emisiones' lo aplica a todo el portafolio.
+    """
+    fuente = models.CharField(max_length=20, choices=RegistroEnergetico.FUENTES)
+    anio = models.PositiveSmallIntegerField(verbose_name="Vigente desde (año)")
+    factor_emision = models.FloatField(verbose_name="Factor de Emisión (kgCO2/kWh)")
+    poder_calorifico = models.FloatField(
+        null=True, blank=True, verbose_name="Poder Calorífico (PC)",
+        help_text="kJ/m³ (Gases/Líq) o kJ/kg (Sólidos). Vacío para electricidad."
+    )
+    referencia = models.CharField(max_length=200, blank=True, help_text="Ej: UPME - Resolución de factores 2025")
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Factor de Referencia"
+        verbose_name_plural = "Factores de Referencia"
+        ordering = ['fuente', '-anio']
+        constraints = [
+            models.UniqueConstraint(fields=['fuente', 'anio'], name='factor_fuente_anio_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_fuente_display()} {self.anio}: {self.factor_emision} kgCO2/kWh"
+
+
+# ==========================================
+#  RESUMEN MATERIALIZADO POR PROYECTO
+# ==========================================
+
+class ResumenEnergetico(models.Model):
+    """
+    Totales desnormalizados de un proyecto (una fila por auditoría).
+    Evita re-sumar las seis tablas de la bitácora en cada pantalla.
+    Se recalcula al guardar/eliminar un registro de energía o el contexto productivo.
+    Reconstrucción masiva: python manage.py reconstruir_resumenes
+    """
+    proyecto = models.OneToOneField(
+        ProyectoAuditoria,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="resumen"
+    )
+    kwh_electrico = models.FloatField(default=0, verbose_name="Energía Eléctrica (kWh/año)")
+    kwh_termico = models.FloatField(default=0, verbose_name="Energía Térmica (kWh/año)")
+    kwh_total = models.FloatField(default=0, verbose_name="Energía Total (kWh/año)")
+    costo_total = models.FloatField(default=0, verbose_name="Costo Total Anual (COP)")
+    emisiones_totales = models.FloatField(default=0, verbose_name="Emisiones Totales (TonCO2/año)")
+    ides = models.FloatField(default=0, verbose_name="IDES (kWh/Unidad)")
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen Energético"
+        verbose_name_plural = "Resúmenes Energéticos"
+
+    def __str__(self):
+        return f"Resumen {self.proyecto_id}"
+
+    @classmethod
+    def calcular_lote(cls, proyectos):
+        """
+        Calcula (sin guardar) los resúmenes de una lista de proyectos.
+        Una consulta agrupada por tabla de energía para todo el lote (auditorias.energia).
+        """
+        from .energia import totales_por_proyecto, totales_vacios  # energia importa este módulo
+
+        acumulado = totales_por_proyecto([p.pk for p in proyectos])
+
+        resumenes = []
+        for p in proyectos:
+            totales = acumulado.get(p.pk) or totales_vacios()
+            kwh_total = totales['kwh_electrico'] + totales['kwh_termico']
+            ides = 0.0
+            if p.produccion_total and p.produccion_total > 0:
+                ides = kwh_total / p.produccion_total
+            resumenes.append(cls(proyecto_id=p.pk, kwh_total=kwh_total, ides=ides, **totales))
+        return resumenes
+
+    @classmethod
+    def guardar_lote(cls, resumenes):
+        """Inserta o actualiza resúmenes calculados con calcular_lote()."""
+        return cls.objects.bulk_create(
+            resumenes,
+            update_conflicts=True,
+            unique_fields=['proyecto'],
+            update_fields=['kwh_electrico', 'kwh_termico', 'kwh_total', 'costo_total', 'emisiones_totales', 'ides', 'actualizado'],
+        )
+
+    @classmethod
+    def recalcular(cls, proyecto):
+        """Recalcula y guarda el resumen de un proyecto."""
+        resumen = cls.calcular_lote([proyecto])[0]
+        resumen.save()
+        proyecto.resumen = resumen
+        return resumen
@@ -0,0 +1,40 @@
+"""
+Señales de la app de auditorías:
+1. Invalidación del catálogo de factores de referencia que auditorias.factores mantiene en memoria.
+2. Limpieza al eliminar un registro de energía (libro, serie mensual y resumen del proyecto).
+   Es una señal y no un delete() del modelo para cubrir también los borrados por queryset
+   (p. ej. la acción "eliminar seleccionados" del admin), que no pasan por delete().
+"""
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import factores
+from .energia import FUENTES
+from .models import ConsumoMensual, FactorReferencia, RegistroEnergetico, ResumenEnergetico
+
+
+@receiver([post_save, post_delete], sender=FactorReferencia, dispatch_uid="factores_catalogo")
+def invalidar_catalogo(sender, instance, **kwargs):
+    factores.invalidar()
+
+
+def sincronizar_registro_eliminado(sender, instance, origin=None, **kwargs):
+    # Borrado en cascada de un proyecto (o de su empresa o centro): libro, serie y resumen se
+    # eliminan con él, y recalcular el resumen aquí descontaría dos veces su energía de los rollups
+    modelo_origen = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if modelo_origen is not sender:
+        return
+
+    RegistroEnergetico.objects.filter(**RegistroEnergetico.clave_de(instance)).delete()
+    # La serie se normaliza con el PC del registro: sin registro de la fuente ya no tiene kWh válidos
+    if not sender.objects.filter(proyecto_id=instance.proyecto_id).exists():
+        ConsumoMensual.de_registro(instance).delete()
+    ResumenEnergetico.recalcular(instance.proyecto)
+
+
+for _fuente in FUENTES:
+    post_delete.connect(
+        sincronizar_registro_eliminado, sender=_fuente.modelo,
+        dispatch_uid=f"auditorias_{_fuente.modelo.__name__}_eliminado",
+    )
@@ -1,3 +1,345 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import unittest
+from datetime import date
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from auditorias import indices
+from auditorias.busqueda import buscar_proyectos, normalizar
+from auditorias.energia import FUENTES
+from auditorias.importacion import (
+    Encabezado, ErrorFormato, FilaInvalida, ImportadorMatriz, _difieren, filas_archivo, importar_archivos,
+    leer_matriz, numero, validar_fuente,
+)
+from auditorias.models import (
+    Electricidad, Empresa, GasNatural, ProyectoAuditoria, RegistroEnergetico, ResumenEnergetico,
+)
+from gestion.models import CentroPevi
+
+# Matriz histórica de ejemplo versionada con el proyecto
+MATRIZ = str(settings.BASE_DIR / 'empresas.csv')
+
+
+def filas_matriz(*empresas):
+    """Filas crudas de empresas.csv: las dos de encabezado y las de 'empresas' (nombre tal cual)."""
+    filas = filas_archivo(MATRIZ)
+    encabezados = [next(filas), next(filas)]
+    return encabezados + [(linea, valores) for linea, valores in filas if valores[3].strip() in empresas]
+
+
+class ValidacionEmisionesTests(SimpleTestCase):
+    """Emisiones declaradas que la fórmula kWh x FE no puede reproducir."""
+
+    def test_emisiones_declaradas_sin_factor_rechazan_la_fila(self):
+        # Multinsa declara Emis.GN = 308 con FE.GN = 0: se guardaría como 0 t
+        (_linea, fila), = leer_matriz(filas_matriz('Multinsa'))
+        self.assertIsInstance(fila, FilaInvalida)
+        self.assertIn("Gas Natural: emisiones (kWh x FE) declarado 308.00 y calculado 0.00", fila.args)
+
+    def test_cero_contra_valor_solo_difiere_si_se_pide(self):
+        self.assertFalse(_difieren(0, 120.0, 0.05))
+        self.assertFalse(_difieren(308.0, 0, 0.05))
+        self.assertTrue(_difieren(308.0, 0, 0.05, 0.5, cero_difiere=True))
+        self.assertTrue(_difieren(0, 120.0, 0.05, 0.5, cero_difiere=True))
+        # Dentro del redondeo de la matriz (toneladas sin decimales)
+        self.assertFalse(_difieren(0, 0.4, 0.05, 0.5, cero_difiere=True))
+        self.assertFalse(_difieren(0, 0, 0.05, 0.5, cero_difiere=True))
+
+
+def electricidad(**cambios):
+    """Datos consistentes de electricidad: 10.000 kWh/mes a $500, FE 0,2."""
+    datos = {
+        'consumo_mensual': 10000, 'consumo_anual': 120000, 'costo_unitario': 500,
+        'costo_mensual_promedio': 5e6, 'costo_total_anual': 6e7, 'factor_emision': 0.2, 'emisiones_totales': 24,
+    }
+    return {**datos, **cambios}
+
+
+def gas_natural(**cambios):
+    """Datos consistentes de gas natural: 1.000 m3/mes, PC 36.000 kJ/m3 (10 kWh/m3), $1.000/m3, FE 0,2."""
+    datos = {
+        'consumo_mensual_orig': 1000, 'consumo_anual_orig': 12000, 'costo_unitario': 1000,
+        'costo_mensual_promedio': 1e6, 'costo_total_anual': 1.2e7, 'poder_calorifico': 36000,
+        'consumo_mensual_kwh': 10000, 'consumo_anual_kwh': 120000, 'costo_kwh_equivalente': 100,
+        'factor_emision': 0.2, 'emisiones_totales': 24,
+    }
+    return {**datos, **cambios}
+
+
+class ValidarFuenteTests(SimpleTestCase):
+    """Reglas de consistencia de validar_fuente (las mismas fórmulas que guardan los modelos)."""
+
+    def test_fuentes_consistentes(self):
+        self.assertEqual(validar_fuente('electricidad', electricidad()), [])
+        self.assertEqual(validar_fuente('gas_natural', gas_natural()), [])
+        # Dentro de la tolerancia (5 %) y del redondeo de las toneladas
+        self.assertEqual(validar_fuente('gas_natural', gas_natural(consumo_anual_kwh=123000, emisiones_totales=24.4)), [])
+
+    def test_valores_en_blanco_no_se_contrastan(self):
+        self.assertEqual(validar_fuente('electricidad', electricidad(consumo_mensual=0, costo_unitario=0)), [])
+        self.assertEqual(validar_fuente('gas_natural', gas_natural(poder_calorifico=0, costo_kwh_equivalente=0)), [])
+
+    def test_fuentes_inconsistentes(self):
+        casos = [
+            ('electricidad', electricidad(consumo_anual=150000, costo_total_anual=7.5e7, emisiones_totales=30),
+             "Electricidad: consumo anual declarado 150000.00 y calculado 120000.00"),
+            ('electricidad', electricidad(costo_total_anual=9e7), "Electricidad: costo anual declarado 90000000.00 y calculado 60000000.00"),
+            ('gas_natural', gas_natural(poder_calorifico=72000),
+             "Gas Natural: kWh anual (cantidad x PC) declarado 120000.00 y calculado 240000.00"),
+            ('gas_natural', gas_natural(costo_kwh_equivalente=150), "Gas Natural: $/kWh equivalente declarado 150.00 y calculado 100.00"),
+            ('gas_natural', gas_natural(emisiones_totales=40), "Gas Natural: emisiones (kWh x FE) declarado 40.00 y calculado 24.00"),
+            ('gas_natural', gas_natural(factor_emision=0), "Gas Natural: emisiones (kWh x FE) declarado 24.00 y calculado 0.00"),
+            ('gas_natural', gas_natural(emisiones_totales=0), "Gas Natural: emisiones (kWh x FE) declarado 0.00 y calculado 24.00"),
+            ('gas_natural', gas_natural(costo_unitario=-1000), "Gas Natural: valor negativo en costo_unitario"),
+        ]
+        for clave, datos, motivo in casos:
+            with self.subTest(motivo=motivo):
+                self.assertEqual(validar_fuente(clave, datos), [motivo])
+
+    def test_todos_los_motivos_de_la_fuente(self):
+        motivos = validar_fuente('gas_natural', gas_natural(consumo_mensual_orig=2000, factor_emision=0))
+        self.assertEqual(len(motivos), 2)
+
+
+class ReporteRechazosTests(TestCase):
+    """El usuario ve cada fila rechazada con su archivo, línea y motivos (consola y --reporte)."""
+
+    def test_reporte_de_filas_rechazadas(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'rechazos.json')
+            salida = StringIO()
+            call_command('importar_matriz', MATRIZ, '--crear-centros', '--reporte', ruta, stdout=salida)
+            with open(ruta, encoding='utf-8') as archivo:
+                reporte = json.load(archivo)
+
+        multinsa = {
+            'archivo': MATRIZ, 'linea': 9,
+            'motivos': ["Gas Natural: emisiones (kWh x FE) declarado 308.00 y calculado 0.00"],
+        }
+        self.assertIn(multinsa, reporte['rechazos'])
+        self.assertEqual(reporte['conteo']['rechazadas'], len(reporte['rechazos']))
+        self.assertEqual(reporte['archivos'], [
+            {'archivo': MATRIZ, 'filas': reporte['conteo']['filas'], 'rechazadas': len(reporte['rechazos'])}
+        ])
+        self.assertEqual(
+            ProyectoAuditoria.objects.count(), reporte['conteo']['filas'] - len(reporte['rechazos'])
+            - reporte['conteo'].get('duplicadas', 0)
+        )
+        self.assertIn(f"Filas rechazadas: {len(reporte['rechazos'])}", salida.getvalue())
+        self.assertIn(f"{MATRIZ}:9: Gas Natural: emisiones (kWh x FE) declarado 308.00 y calculado 0.00", salida.getvalue())
+
+
+class NumeroTests(SimpleTestCase):
+    def test_formato_colombiano(self):
+        casos = {
+            '1.442.736': 1442736.0, '0,2445': 0.2445, ' $ 880.068.960 ': 880068960.0, '37.280': 37280.0,
+            '12,5': 12.5, ' $ -   ': 0.0, '-': 0.0, '': 0.0, None: 0.0,
+        }
+        for texto, esperado in casos.items():
+            with self.subTest(texto=texto):
+                self.assertEqual(numero(texto), esperado)
+
+    def test_texto_no_numerico_rechaza_la_fila(self):
+        with self.assertRaisesMessage(FilaInvalida, "Número inválido: 'N/A'"):
+            numero(' N/A ')
+
+
+class EncabezadoTests(SimpleTestCase):
+    def setUp(self):
+        filas = filas_archivo(MATRIZ)
+        (_, self.superior), (_, self.inferior) = next(filas), next(filas)
+
+    def test_columnas_de_identificacion(self):
+        columnas = Encabezado(self.superior, self.inferior).columnas
+        self.assertEqual(
+            {campo: columnas[campo] for campo in ('fase', 'anio', 'centro', 'empresa', 'produccion_mensual', 'unidad')},
+            {'fase': 0, 'anio': 1, 'centro': 2, 'empresa': 3, 'produccion_mensual': 7, 'unidad': 8},
+        )
+
+    def test_grupos_de_fuentes(self):
+        encabezado = Encabezado(self.superior, self.inferior)
+        self.assertEqual(set(encabezado.fuentes), {fuente.clave for fuente in FUENTES})
+        self.assertEqual(encabezado.fuentes['electricidad'][0], ('consumo_mensual', 9))
+        gas = dict(encabezado.fuentes['gas_natural'])
+        self.assertEqual((gas['poder_calorifico'], gas['emisiones_totales']), (22, 27))
+        # 'IC' no es un campo: el carbón salta esa columna entre los kWh mensuales y anuales
+        carbon = dict(encabezado.fuentes['carbon_mineral'])
+        self.assertEqual(carbon['consumo_anual_kwh'], carbon['consumo_mensual_kwh'] + 2)
+        # PC.GN en kJ/m3, PC.CM en MJ/kg
+        self.assertEqual(encabezado.factor_pc['gas_natural'], 1.0)
+        self.assertEqual(encabezado.factor_pc['carbon_mineral'], 1000.0)
+
+    def test_columna_obligatoria_faltante(self):
+        superior = ['' if celda == 'Año' else celda for celda in self.superior]
+        with self.assertRaisesMessage(ErrorFormato, "Faltan columnas obligatorias: anio"):
+            Encabezado(superior, self.inferior)
+
+    def test_grupo_incompleto(self):
+        with self.assertRaisesMessage(ErrorFormato, "El grupo 'gas_natural' tiene 3 columnas de datos"):
+            Encabezado(self.superior[:20], self.inferior[:20])
+
+
+class ReimportacionMatrizTests(TestCase):
+    """Re-importar actualiza en lugar de duplicar, y la matriz manda sobre las fuentes del proyecto."""
+
+    def importar(self, filas=None):
+        importador = ImportadorMatriz(crear_centros=True)
+        if filas is None:
+            importar_archivos([MATRIZ], importador, procesos=1)
+        else:
+            importador.importar(leer_matriz(filas), archivo='prueba.csv')
+        return importador.conteo
+
+    def totales(self):
+        return {
+            'proyectos': ProyectoAuditoria.objects.count(),
+            'registros': {fuente.clave: fuente.modelo.objects.count() for fuente in FUENTES},
+            'libro': RegistroEnergetico.objects.aggregate(
+                n=Count('pk'), kwh=Sum('kwh'), costo=Sum('costo'), emisiones=Sum('emisiones')
+            ),
+            'resumen': ResumenEnergetico.objects.aggregate(
+                kwh=Sum('kwh_total'), costo=Sum('costo_total'), emisiones=Sum('emisiones_totales')
+            ),
+        }
+
+    def test_reimportar_el_mismo_archivo_deja_los_mismos_totales(self):
+        primera = self.importar()
+        antes = self.totales()
+        segunda = self.importar()
+
+        self.assertGreater(primera['proyectos_creados'], 0)
+        self.assertEqual(segunda['proyectos_creados'], 0)
+        self.assertEqual(segunda['registros_creados'], 0)
+        self.assertEqual(segunda['registros_eliminados'], 0)
+        self.assertEqual(segunda['proyectos_actualizados'], primera['proyectos_creados'])
+        self.assertEqual(self.totales(), antes)
+
+    def test_fuente_retirada_de_la_fila_se_elimina(self):
+        filas = filas_matriz('Salsan')
+        self.importar(filas)
+        proyecto = ProyectoAuditoria.objects.get()
+        self.assertTrue(GasNatural.objects.filter(proyecto=proyecto).exists())
+
+        # La misma fila sin gas natural
+        (_, superior), (_, inferior), (linea, valores) = filas
+        valores = list(valores)
+        for _campo, indice in Encabezado(superior, inferior).fuentes['gas_natural']:
+            valores[indice] = '0'
+        conteo = self.importar([filas[0], filas[1], (linea, valores)])
+
+        self.assertEqual(conteo['registros_eliminados'], 1)
+        self.assertFalse(GasNatural.objects.filter(proyecto=proyecto).exists())
+        self.assertEqual(list(RegistroEnergetico.objects.filter(proyecto=proyecto).values_list('fuente', flat=True)), ['electricidad'])
+        electricidad = Electricidad.objects.get(proyecto=proyecto)
+        self.assertAlmostEqual(ResumenEnergetico.objects.get(proyecto=proyecto).kwh_total, electricidad.consumo_anual)
+
+
+class BusquedaProyectosTests(TestCase):
+    """buscar_proyectos sobre texto_busqueda: sin tildes, por términos en cualquier orden, NIT y ciudad."""
+
+    @classmethod
+    def setUpTestData(cls):
+        centro = CentroPevi.objects.create(nombre='Centro Búsqueda', codigo_interno='T-BUS', region='Andina')
+        cls.carbones = Empresa.objects.create(
+            razon_social='Carbones Andinos S.A.S.', nit='900.123.456-7', sector_productivo='Minería', direccion='-',
+            ciudad='Medellín', contacto_nombre='-', contacto_email='c@pevi.co', contacto_telefono='-',
+        )
+        cls.lacteos = Empresa.objects.create(
+            razon_social='Lácteos del Río', nit='800555111', sector_productivo='Alimentos', direccion='-',
+            ciudad='Bogotá', contacto_nombre='-', contacto_email='l@pevi.co', contacto_telefono='-',
+        )
+
+        def proyecto(empresa, nombre):
+            return ProyectoAuditoria.objects.create(
+                centro=centro, empresa=empresa, nombre_proyecto=nombre, fecha_inicio=date(2024, 1, 1),
+            )
+
+        cls.calderas = proyecto(cls.carbones, 'Calderas de carbón')
+        cls.motores = proyecto(cls.carbones, 'Motores y bombeo')
+        cls.vapor = proyecto(cls.lacteos, 'Vapor en pasteurización')
+
+    def buscar(self, consulta):
+        return list(buscar_proyectos(ProyectoAuditoria.objects.all(), consulta).order_by('-relevancia', 'pk'))
+
+    def test_normalizar(self):
+        self.assertEqual(normalizar('  Carbón   ANDINO  Pingüino '), 'carbon andino pinguino')
+        self.assertEqual(normalizar(None), '')
+
+    def test_sin_tildes_en_la_consulta_ni_en_los_datos(self):
+        self.assertEqual(self.buscar('CARBÓN'), [self.calderas, self.motores])
+        self.assertEqual(self.buscar('lacteos pasteurizacion'), [self.vapor])
+        self.assertEqual(self.buscar('bogota'), [self.vapor])
+
+    def test_terminos_en_cualquier_orden(self):
+        self.assertEqual(self.buscar('medellin bombeo'), [self.motores])
+        self.assertEqual(self.buscar('bombeo lacteos'), [])
+
+    def test_nit_completo_o_parcial(self):
+        self.assertEqual(self.buscar('900.123.456-7'), [self.calderas, self.motores])
+        self.assertEqual(self.buscar('800555'), [self.vapor])
+        self.assertEqual(self.buscar('123.456'), [self.calderas, self.motores])
+
+    @unittest.skipIf(connection.vendor == 'postgresql', "En PostgreSQL la relevancia es TrigramWordSimilarity.")
+    def test_relevancia_sqlite(self):
+        relevancia = {
+            p.pk: p.relevancia for p in buscar_proyectos(ProyectoAuditoria.objects.all(), 'Calderas de carbón')
+        }
+        self.assertEqual(relevancia, {self.calderas.pk: 2.0})
+        relevancia = {p.pk: p.relevancia for p in buscar_proyectos(ProyectoAuditoria.objects.all(), 'carbones andinos')}
+        self.assertEqual(relevancia, {self.calderas.pk: 1.0, self.motores.pk: 1.0})
+        relevancia = {p.pk: p.relevancia for p in buscar_proyectos(ProyectoAuditoria.objects.all(), 'andinos calderas')}
+        self.assertEqual(relevancia, {self.calderas.pk: 0.0})
+
+    def test_consulta_vacia_no_filtra(self):
+        self.assertEqual(len(self.buscar('   ')), 3)
+
+    def actualizaciones_de_proyectos(self, guardar):
+        with CaptureQueriesContext(connection) as consultas:
+            guardar()
+        tabla = ProyectoAuditoria._meta.db_table
+        return [c['sql'] for c in consultas if c['sql'].startswith(f'UPDATE "{tabla}"')]
+
+    def test_cambiar_la_empresa_reindexa_sus_proyectos(self):
+        self.carbones.razon_social = 'Hullas del Norte'
+        self.assertEqual(len(self.actualizaciones_de_proyectos(self.carbones.save)), 1)
+        self.assertEqual(self.buscar('hullas'), [self.calderas, self.motores])
+        self.assertEqual(self.buscar('carbones'), [])
+
+        self.lacteos.ciudad = 'Tunja'
+        self.lacteos.save(update_fields=['ciudad'])
+        self.assertEqual(self.buscar('tunja'), [self.vapor])
+
+    def test_guardar_sin_cambios_de_busqueda_no_reindexa(self):
+        self.carbones.contacto_telefono = '555 0000'
+        self.assertEqual(self.actualizaciones_de_proyectos(self.carbones.save), [])
+
+        # Con update_fields ni siquiera se consulta la fila guardada
+        self.lacteos.contacto_email = 'otro@pevi.co'
+        with CaptureQueriesContext(connection) as consultas:
+            self.lacteos.save(update_fields=['contacto_email'])
+        self.assertEqual([c['sql'] for c in consultas if c['sql'].startswith('SELECT')], [])
+        self.assertEqual(self.buscar('lacteos'), [self.vapor])
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Los planes de consulta se verifican sobre PostgreSQL (producción).")
+class IndicesProyectoTests(TestCase):
+    """Las consultas calientes de proyectos usan índices con un volumen como el de producción."""
+
+    @classmethod
+    def setUpTestData(cls):
+        indices.sembrar(50000)
+
+    def test_consultas_calientes_sin_recorridos_completos(self):
+        resultados = list(indices.planes())
+        self.assertTrue(resultados)
+        for nombre, plan, recorridos in resultados:
+            with self.subTest(consulta=nombre):
+                self.assertEqual(recorridos, [], plan)
@@ -149,6 +149,26 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Informes PDF generados (gestion/informes.py). Fuera de MEDIA_ROOT: no se sirven sin permisos
+INFORMES_CACHE_DIR = config('INFORMES_CACHE_DIR', default=str(BASE_DIR / 'cache' / 'informes'))
+# True: los PDF se generan en segundo plano; requiere el worker 'manage.py procesar_informes'
+# corriendo (DESPLIEGUE.md), o los trabajos quedan en cola para siempre.
+# False (por defecto): se generan dentro de la petición
+INFORMES_EN_COLA = config('INFORMES_EN_COLA', default=False, cast=bool)
+
+
+# Caché (Dashboards BI). Las versiones de invalidación (metricas/cache.py) deben ser las mismas
+# para todos los workers: por defecto archivos en disco, compartidos por los procesos del servidor.
+# Con varios servidores, Redis vía .env (CACHE_BACKEND=django.core.cache.backends.redis.RedisCache,
+# CACHE_LOCATION=redis://...). LocMemCache es por proceso: solo se admite con DEBUG (check metricas.E001)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache' / 'metricas')),
+    }
+}
+METRICAS_CACHE_TIMEOUT = config('METRICAS_CACHE_TIMEOUT', default=60 * 15, cast=int)
+
 
 AUTHENTICATION_BACKENDS = [
     'gestion.backends.EmailOrUsernameModelBackend', # Nuestro backend personalizado
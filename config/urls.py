@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
 from gestion.views import (
-    cambiar_estado_proyecto, crear_empresa, crear_usuario, dashboard, crear_proyecto, detalle_proyecto, editar_proyecto, editar_usuario, eliminar_usuario, generar_informe_pdf, 
-    lista_proyectos, lista_empresas, lista_usuarios, registrar_consumo, registrar_produccion, subir_documento
+    cambiar_estado_proyecto, crear_empresa, crear_usuario, dashboard, crear_proyecto, detalle_proyecto, editar_proyecto, editar_usuario, eliminar_usuario, estado_informe, exportar_informes_centro, generar_informe_pdf, 
+    lista_proyectos, lista_empresas, lista_usuarios, registrar_consumo, registrar_produccion, registrar_serie_mensual,
+    subir_documento
 )
 from django.conf import settings
 from django.conf.urls.static import static
@@ -21,17 +22,20 @@ urlpatterns = [
     # --- PROYECTOS ---
     path('proyectos/', lista_proyectos, name='lista_proyectos'),
     path('proyectos/nuevo/', crear_proyecto, name='crear_proyecto'),
+    path('proyectos/informes/zip/', exportar_informes_centro, name='exportar_informes_centro'),
     
     # --- DETALLE Y GESTIÓN DE PROYECTO ---
     path('proyectos/<int:proyecto_id>/', detalle_proyecto, name='detalle_proyecto'),
     path('proyectos/<int:proyecto_id>/editar/', editar_proyecto, name='editar_proyecto'),
     path('proyectos/<int:proyecto_id>/documentos/subir/', subir_documento, name='subir_documento'),
     path('proyectos/<int:proyecto_id>/informe/pdf/', generar_informe_pdf, name='generar_informe_pdf'),
+    path('informes/<int:trabajo_id>/estado/', estado_informe, name='estado_informe'),
     path('proyectos/<int:proyecto_id>/estado/<str:nuevo_estado>/', cambiar_estado_proyecto, name='cambiar_estado'),
 
     # --- REGISTROS DE BITÁCORA (Orden Importante) ---
     path('proyectos/<int:proyecto_id>/registro/produccion/', registrar_produccion, name='registrar_produccion'),
     path('proyectos/<int:proyecto_id>/registro/<str:tipo_energia>/', registrar_consumo, name='registrar_consumo'),
+    path('proyectos/<int:proyecto_id>/serie-mensual/<str:tipo_energia>/', registrar_serie_mensual, name='registrar_serie_mensual'),
 
     # --- GESTIÓN DE EQUIPO (RRHH) - NUEVAS RUTAS ---
     path('equipo/', lista_usuarios, name='lista_usuarios'),
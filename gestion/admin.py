@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, CentroPevi
+from .models import Usuario, CentroPevi, TrabajoInforme
 
 # 1. Registrar Centro PEVI
 @admin.register(CentroPevi)
@@ -29,4 +29,13 @@ class CustomUserAdmin(UserAdmin):
 
     def get_nombre_completo(self, obj):
         return obj.get_full_name()
-    get_nombre_completo.short_description = 'Nombre'
\ No newline at end of file
+    get_nombre_completo.short_description = 'Nombre'
+
+# 3. Cola de informes PDF (solo consulta: los trabajos los crea la vista y los procesa el worker)
+@admin.register(TrabajoInforme)
+class TrabajoInformeAdmin(admin.ModelAdmin):
+    list_display = ('proyecto', 'estado', 'intentos', 'solicitado_por', 'creado', 'terminado')
+    list_filter = ('estado',)
+    raw_id_fields = ('proyecto', 'solicitado_por')
+    exclude = ('html',)
+    readonly_fields = ('clave', 'base_url', 'error', 'creado', 'iniciado', 'terminado')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GestionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gestion'
+
+    def ready(self):
+        # Limpieza de la caché de informes PDF
+        from . import signals  # noqa: F401
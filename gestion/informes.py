@@ -0,0 +1,331 @@
+"""
+Informe PDF de un proyecto y su caché en disco, direccionada por contenido.
+
+La clave de un informe es el SHA-256 de su HTML ya renderizado más la versión del generador.
+El HTML contiene todas las entradas del informe (proyecto, empresa, las seis fuentes de la
+bitácora, benchmark y la propia plantilla), así que cualquier cambio en ellas produce otra
+clave: una entrada nunca queda desactualizada y no hace falta invalidar nada al editar.
+Renderizar el HTML cuesta milisegundos; WeasyPrint, segundos: solo se ejecuta si el PDF
+de esa clave no existe.
+
+Archivos: INFORMES_CACHE_DIR/<proyecto_id>/<clave>.pdf. Al generar un informe se borran
+los anteriores del proyecto (solo se conserva el vigente) y al eliminar el proyecto se
+borra su directorio (gestion.signals).
+
+Cola (TrabajoInforme): con INFORMES_EN_COLA la vista no ejecuta WeasyPrint; encola el HTML
+y un proceso aparte ('manage.py procesar_informes') genera el PDF en esta misma caché.
+
+Lote de un centro (zip_informes): los PDF que faltan se generan en un pool de procesos y el
+ZIP se entrega por partes mientras tanto, con memoria acotada sin importar cuántos proyectos haya.
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+from importlib.metadata import version
+
+import django
+from django.conf import settings
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import slugify
+
+from auditorias.energia import registros_proyecto, desglose_de_registros, indicadores
+from metricas.benchmark import benchmark_proyecto
+from . import recursos_pdf
+from .models import TrabajoInforme
+
+PLANTILLA = 'gestion/informe_pdf.html'
+
+# Cambiarla descarta todos los PDF en caché (p. ej. al cambiar imágenes o estilos fuera del HTML)
+VERSION = 1
+
+# Un trabajo que falla este número de veces queda en ERROR hasta que se vuelva a pedir
+MAX_INTENTOS = 3
+
+
+def contexto_informe(proyecto):
+    """Datos del informe (misma agregación que detalle_proyecto, formateada para PDF)."""
+    desglose = desglose_de_registros(registros_proyecto(proyecto))
+    totales = indicadores(desglose, proyecto.produccion_total)
+
+    # Pre-formateo para evitar errores en template
+    datos_tabla = [
+        {
+            'nombre': nombre,
+            'unidad': fuente['unidad'],
+            'consumo': f"{fuente['consumo_original']:,.0f}",
+            'energia': f"{fuente['kwh']:,.0f}",
+            'emisiones': f"{fuente['emisiones']:,.2f}",
+            'costo': f"{fuente['costo']:,.0f}"
+        }
+        for nombre, fuente in desglose.items()
+    ]
+
+    # Fecha de corte de los datos (no la de hoy): mismo contenido, mismo PDF
+    resumen = proyecto.get_resumen()
+
+    return {
+        'proyecto': proyecto,
+        'datos_tabla': datos_tabla,
+        'kpi_emisiones': f"{totales['emisiones_totales']:,.2f}",
+        'kpi_energia': f"{totales['kwh_total']:,.0f}",
+        'kpi_costo': f"{totales['costo_total']:,.0f}",
+        'kpi_ides': f"{totales['ides']:,.2f}",
+        'kpi_elec': f"{totales['kwh_electrico']:,.0f}",
+        'kpi_term': f"{totales['kwh_termico']:,.0f}",
+        'benchmark': benchmark_proyecto(proyecto),
+        'fecha_corte': resumen.actualizado if resumen else proyecto.updated_at,
+    }
+
+
+def html_informe(proyecto):
+    return render_to_string(PLANTILLA, contexto_informe(proyecto))
+
+
+def clave(html):
+    """Clave de caché (y ETag) del informe con este HTML."""
+    contenido = f"{VERSION}:{version('weasyprint')}:{html}"
+    return hashlib.sha256(contenido.encode()).hexdigest()
+
+
+def _directorio(proyecto_id):
+    return os.path.join(settings.INFORMES_CACHE_DIR, str(proyecto_id))
+
+
+def ruta(proyecto_id, clave_informe):
+    return os.path.join(_directorio(proyecto_id), f"{clave_informe}.pdf")
+
+
+def obtener_o_generar(proyecto_id, html, base_url, clave_informe=None):
+    """
+    Ruta del PDF del informe con este HTML: el de la caché o uno recién generado.
+    La escritura es atómica (archivo temporal + os.replace): una petición concurrente
+    nunca lee un PDF a medias; si dos generan a la vez, ambas escriben el mismo contenido.
+    """
+    clave_informe = clave_informe or clave(html)
+    destino = ruta(proyecto_id, clave_informe)
+    if os.path.exists(destino):
+        return destino
+
+    from weasyprint import HTML
+
+    # Recursos desde el disco (sin peticiones HTTP) y cachés de fuentes/imágenes del proceso
+    pdf = HTML(string=html, base_url=base_url, url_fetcher=recursos_pdf.fetcher(base_url)).write_pdf(
+        **recursos_pdf.opciones_render()
+    )
+
+    directorio = _directorio(proyecto_id)
+    os.makedirs(directorio, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(pdf)
+    os.replace(temporal, destino)
+
+    # Los informes anteriores del proyecto ya no corresponden a sus datos
+    for nombre in os.listdir(directorio):
+        if nombre.endswith('.pdf') and nombre != os.path.basename(destino):
+            try:
+                os.remove(os.path.join(directorio, nombre))
+            except FileNotFoundError:
+                pass
+    return destino
+
+
+def invalidar(proyecto_id):
+    """Borra los PDF en caché de un proyecto."""
+    shutil.rmtree(_directorio(proyecto_id), ignore_errors=True)
+
+
+# ---------------------------------------------------------
+# Cola de generación (TrabajoInforme)
+# ---------------------------------------------------------
+
+def encolar(proyecto_id, html, base_url, clave_informe=None, usuario=None):
+    """
+    Trabajo que genera el PDF de este HTML: el que ya existe para esa versión del informe o uno
+    nuevo. Un trabajo en error, o listo cuyo archivo ya no está en la caché, vuelve a la cola.
+    """
+    clave_informe = clave_informe or clave(html)
+    trabajo, creado = TrabajoInforme.objects.get_or_create(
+        proyecto_id=proyecto_id, clave=clave_informe,
+        defaults={'html': html, 'base_url': base_url, 'solicitado_por': usuario},
+    )
+    if creado:
+        # Las versiones anteriores del proyecto ya no se pueden descargar (su PDF se poda)
+        TrabajoInforme.objects.filter(proyecto_id=proyecto_id).exclude(pk=trabajo.pk).filter(
+            estado__in=[TrabajoInforme.LISTO, TrabajoInforme.ERROR]
+        ).delete()
+        return trabajo
+
+    perdido = trabajo.estado == TrabajoInforme.LISTO and not os.path.exists(ruta(proyecto_id, clave_informe))
+    if trabajo.estado == TrabajoInforme.ERROR or perdido:
+        trabajo.html, trabajo.base_url = html, base_url
+        trabajo.estado, trabajo.intentos, trabajo.error = TrabajoInforme.PENDIENTE, 0, ''
+        trabajo.save(update_fields=['html', 'base_url', 'estado', 'intentos', 'error'])
+    return trabajo
+
+
+def tomar_siguiente():
+    """
+    Reserva el trabajo pendiente más antiguo. La reserva es un UPDATE condicionado al estado,
+    así que varios workers (y SQLite, sin SELECT ... SKIP LOCKED) nunca toman el mismo trabajo.
+    """
+    while True:
+        pk = TrabajoInforme.objects.filter(estado=TrabajoInforme.PENDIENTE).order_by('creado', 'pk').values_list(
+            'pk', flat=True
+        ).first()
+        if pk is None:
+            return None
+        tomado = TrabajoInforme.objects.filter(pk=pk, estado=TrabajoInforme.PENDIENTE).update(
+            estado=TrabajoInforme.PROCESANDO, iniciado=timezone.now(), intentos=F('intentos') + 1
+        )
+        if tomado:
+            return TrabajoInforme.objects.get(pk=pk)
+
+
+def procesar(trabajo):
+    """Genera el PDF del trabajo. Si falla, vuelve a la cola hasta MAX_INTENTOS."""
+    try:
+        obtener_o_generar(trabajo.proyecto_id, trabajo.html, trabajo.base_url, trabajo.clave)
+    except Exception as error:
+        trabajo.error = f"{type(error).__name__}: {error}"
+        trabajo.estado = TrabajoInforme.ERROR if trabajo.intentos >= MAX_INTENTOS else TrabajoInforme.PENDIENTE
+        trabajo.save(update_fields=['estado', 'error'])
+        return False
+
+    trabajo.estado, trabajo.html, trabajo.error = TrabajoInforme.LISTO, '', ''
+    trabajo.terminado = timezone.now()
+    trabajo.save(update_fields=['estado', 'html', 'error', 'terminado'])
+    return True
+
+
+def reencolar_vencidos(minutos):
+    """
+    Devuelve a la cola los trabajos que un worker tomó y no terminó (p. ej. se cayó).
+    Los que ya agotaron sus intentos pasan a ERROR: un informe que tumba al worker no lo repite sin fin.
+    """
+    vencidos = TrabajoInforme.objects.filter(
+        estado=TrabajoInforme.PROCESANDO, iniciado__lt=timezone.now() - timedelta(minutes=minutos)
+    )
+    vencidos.filter(intentos__gte=MAX_INTENTOS).update(
+        estado=TrabajoInforme.ERROR, error="El worker no terminó el trabajo (tiempo agotado)"
+    )
+    return vencidos.update(estado=TrabajoInforme.PENDIENTE)
+
+
+# ---------------------------------------------------------
+# Lote de informes (ZIP en streaming)
+# ---------------------------------------------------------
+
+# Bloques de lectura de cada PDF al copiarlo al ZIP
+TAMANO_BLOQUE = 64 * 1024
+
+
+class _SalidaZip:
+    """
+    Destino de zipfile sin seek(): acumula lo escrito hasta que el generador lo entrega.
+    Sin seek, zipfile escribe cada entrada con descriptor de datos y nunca vuelve atrás.
+    """
+
+    def __init__(self):
+        self.partes = []
+        self.posicion = 0
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _generar_en_pool(proyecto_id, html, base_url, clave_informe):
+    """Lo que corre en cada proceso del pool: solo WeasyPrint y la escritura en la caché."""
+    return obtener_o_generar(proyecto_id, html, base_url, clave_informe)
+
+
+def nombre_en_zip(proyecto):
+    return f"Informe_PEVI_{proyecto.id}_{slugify(proyecto.empresa.razon_social)[:60]}.pdf"
+
+
+def zip_informes(proyectos, base_url, procesos=None):
+    """
+    Genera (en bytes, por partes) un ZIP con el informe PDF de cada proyecto.
+    Los PDF ya en caché se copian de inmediato; los demás se generan en un pool de procesos
+    ('procesos', por defecto todos los núcleos) que solo se crea si falta alguno.
+    Memoria acotada: a lo sumo 2 * procesos informes en vuelo y cada PDF se copia por bloques.
+    Un informe que falla no corta la descarga: se lista en ERRORES.txt al final del ZIP.
+    'proyectos' debe traer la empresa (select_related) y puede ser un iterador.
+    """
+    procesos = procesos or os.cpu_count() or 1
+    salida = _SalidaZip()
+    archivo_zip = zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED)  # Los PDF ya vienen comprimidos
+    pool = None
+    en_vuelo = {}  # futuro -> proyecto
+    errores = []
+
+    def agregar(proyecto, ruta_pdf):
+        with open(ruta_pdf, 'rb') as origen, archivo_zip.open(nombre_en_zip(proyecto), 'w') as destino:
+            for bloque in iter(lambda: origen.read(TAMANO_BLOQUE), b''):
+                destino.write(bloque)
+                yield salida.vaciar()
+
+    def recoger(terminados):
+        for futuro in terminados:
+            proyecto = en_vuelo.pop(futuro)
+            try:
+                ruta_pdf = futuro.result()
+            except Exception as error:
+                errores.append(f"{nombre_en_zip(proyecto)}: {type(error).__name__}: {error}")
+                continue
+            yield from agregar(proyecto, ruta_pdf)
+
+    try:
+        for proyecto in proyectos:
+            html = html_informe(proyecto)
+            clave_informe = clave(html)
+            ruta_pdf = ruta(proyecto.id, clave_informe)
+            if os.path.exists(ruta_pdf):
+                yield from agregar(proyecto, ruta_pdf)
+                continue
+
+            if pool is None:
+                # 'spawn': los hijos no heredan las conexiones a la base de datos (como auditorias.importacion)
+                pool = ProcessPoolExecutor(
+                    max_workers=procesos, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup
+                )
+            en_vuelo[pool.submit(_generar_en_pool, proyecto.id, html, base_url, clave_informe)] = proyecto
+
+            # Lo ya terminado sale sin esperar; con la ventana llena se espera al primero
+            terminados, _ = wait(en_vuelo, timeout=0)
+            if not terminados and len(en_vuelo) >= 2 * procesos:
+                terminados, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            yield from recoger(terminados)
+
+        while en_vuelo:
+            terminados, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            yield from recoger(terminados)
+
+        if errores:
+            archivo_zip.writestr('ERRORES.txt', '\n'.join(errores) + '\n')
+        archivo_zip.close()
+        yield salida.vaciar()
+    finally:
+        # También si el cliente corta la descarga (GeneratorExit): no se generan más informes
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,195 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from importlib.metadata import version
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from auditorias.energia import FUENTES
+from auditorias.models import Electricidad, Empresa, ProyectoAuditoria
+from gestion import informes, recursos_pdf
+from gestion.models import CentroPevi
+from metricas.models import BenchmarkSector, PosicionSectorial
+
+# (nombre, fuentes registradas, con sección de benchmarking sectorial)
+CASOS = [
+    ('1 fuente', 1, False),
+    ('3 fuentes', 3, False),
+    ('6 fuentes', 6, False),
+    ('6 fuentes + benchmark', 6, True),
+]
+
+# Holgura absoluta sobre la tolerancia relativa: evita fallas por ruido en valores pequeños
+MARGEN = {'render_ms': 2.0, 'pdf_ms': 25.0, 'pico_kb': 512.0}
+
+SECTOR = 'benchmark informes'
+
+
+class Command(BaseCommand):
+    """
+    Mide el informe PDF (gestion.informes) con proyectos sintéticos de distinto tamaño: renderizado
+    de la plantilla (incluye las consultas del contexto) y HTML.write_pdf por separado, más el pico
+    de memoria de write_pdf (tracemalloc, en una pasada aparte para no inflar los tiempos).
+    Con --linea-base compara contra una corrida guardada con --guardar y falla si un tiempo o el
+    pico de memoria supera la línea base en más de --tolerancia, o si aumentan las consultas.
+    Los datos se crean dentro de una transacción que se revierte y no se escribe en la caché de informes.
+    Uso: python manage.py benchmark_informes [--repeticiones 5] [--guardar base.json] [--linea-base base.json]
+    """
+    help = "Mide el renderizado y la generación PDF de informes y detecta regresiones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=5, help="Mediciones por caso; se reporta la mediana (default: 5).")
+        parser.add_argument('--linea-base', help="JSON de una corrida anterior (--guardar) contra el cual comparar.")
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.25,
+            help="Aumento relativo permitido sobre la línea base (default: 0.25 = 25%%)."
+        )
+        parser.add_argument('--guardar', help="Ruta donde guardar los resultados como nueva línea base.")
+
+    def handle(self, *args, **options):
+        base = None
+        if options['linea_base']:
+            with open(options['linea_base'], encoding='utf-8') as archivo:
+                base = json.load(archivo)
+
+        self.stdout.write(f"{'Caso':<24} {'HTML':>8} {'Render':>10} {'PDF':>10} {'Pico PDF':>10} {'Consultas':>10}")
+        resultados = {}
+        with transaction.atomic():
+            proyectos = self._poblar()
+            for nombre, _fuentes, _benchmark in CASOS:
+                resultados[nombre] = self._medir(proyectos[nombre], options['repeticiones'])
+                r = resultados[nombre]
+                self.stdout.write(
+                    f"{nombre:<24} {r['html_kb']:>6.1f}kB {r['render_ms']:>8.1f}ms {r['pdf_ms']:>8.1f}ms "
+                    f"{r['pico_kb']:>8.0f}kB {r['consultas']:>10}"
+                )
+            transaction.set_rollback(True)
+
+        corrida = {
+            'weasyprint': version('weasyprint'), 'python': platform.python_version(),
+            'maquina': platform.node(), 'casos': resultados,
+        }
+        if options['guardar']:
+            with open(options['guardar'], 'w', encoding='utf-8') as archivo:
+                json.dump(corrida, archivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Línea base guardada en {options['guardar']}")
+
+        if base is not None:
+            self._comparar(base, corrida, options['tolerancia'])
+
+    # ---------------------------------------------
+    #  DATOS SINTÉTICOS
+    # ---------------------------------------------
+    def _poblar(self):
+        """Un proyecto por caso, con sus registros guardados por save() (kWh, emisiones, libro y resumen)."""
+        centro = CentroPevi.objects.create(nombre='Benchmark informes', codigo_interno='BENCH-INF', region='Benchmark')
+        empresa = Empresa.objects.create(
+            razon_social='Empresa Benchmark Informes', nit='BENCH-INF', sector_productivo=SECTOR,
+            direccion='-', ciudad='-', contacto_nombre='-', contacto_email='bench@pevi.co', contacto_telefono='-',
+        )
+        for indicador, unidad in [('IDES', 'ton'), ('COSTO_KWH', '')]:
+            BenchmarkSector.objects.create(
+                sector=SECTOR, unidad=unidad, indicador=indicador,
+                muestras=40, media=300, p10=100, p25=200, p50=300, p75=400, p90=500,
+            )
+
+        proyectos = {}
+        for nombre, fuentes, con_benchmark in CASOS:
+            proyecto = ProyectoAuditoria.objects.create(
+                centro=centro, empresa=empresa, nombre_proyecto=f'Benchmark {nombre}',
+                fecha_inicio='2024-01-01', anio=2024, produccion_total=5000, unidad_produccion='Ton',
+            )
+            for i, fuente in enumerate(FUENTES[:fuentes]):
+                comunes = {
+                    'proyecto': proyecto, 'costo_unitario': 500, 'costo_mensual_promedio': 5e6,
+                    'costo_total_anual': 6e7, 'factor_emision': 0.2, 'emisiones_totales': 0,
+                }
+                if fuente.modelo is Electricidad:
+                    Electricidad(consumo_mensual=1e5, consumo_anual=1.2e6, **comunes).save()
+                else:
+                    fuente.modelo(
+                        consumo_mensual_orig=1000 * (i + 1), consumo_anual_orig=12000 * (i + 1), poder_calorifico=35000,
+                        consumo_mensual_kwh=0, consumo_anual_kwh=0, costo_kwh_equivalente=0, **comunes,
+                    ).save()
+            if con_benchmark:
+                PosicionSectorial.objects.create(
+                    proyecto=proyecto, sector=SECTOR, unidad='ton',
+                    costo_kwh=25, percentil_ides=35, percentil_costo_kwh=60,
+                )
+            proyectos[nombre] = proyecto.pk
+        return proyectos
+
+    # ---------------------------------------------
+    #  MEDICIÓN
+    # ---------------------------------------------
+    def _medir(self, proyecto_id, repeticiones):
+        from weasyprint import HTML
+
+        def generar(html):
+            # Como informes.obtener_o_generar, sin pasar por la caché en disco
+            return HTML(string=html, base_url='http://localhost/', url_fetcher=recursos_pdf.url_fetcher).write_pdf(
+                **recursos_pdf.opciones_render()
+            )
+
+        def html_proyecto():
+            # Proyecto recién leído: sin relaciones en caché, como en cada petición
+            return informes.html_informe(ProyectoAuditoria.objects.get(pk=proyecto_id))
+
+        # Calentamiento: plantillas compiladas, fuentes y recursos en caché del proceso
+        html = html_proyecto()
+        generar(html)
+
+        with CaptureQueriesContext(connection) as consultas:
+            html_proyecto()
+
+        tiempos_render, tiempos_pdf = [], []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            html = html_proyecto()
+            tiempos_render.append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            generar(html)
+            tiempos_pdf.append(time.perf_counter() - inicio)
+
+        tracemalloc.start()
+        try:
+            generar(html)
+            _actual, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'html_kb': round(len(html.encode()) / 1024, 1),
+            'render_ms': round(statistics.median(tiempos_render) * 1000, 2),
+            'pdf_ms': round(statistics.median(tiempos_pdf) * 1000, 2),
+            'pico_kb': round(pico / 1024),
+            'consultas': len(consultas),
+        }
+
+    def _comparar(self, base, corrida, tolerancia):
+        if base.get('weasyprint') != corrida['weasyprint']:
+            self.stdout.write(self.style.WARNING(
+                f"Línea base con WeasyPrint {base.get('weasyprint')}; esta corrida usa {corrida['weasyprint']}"
+            ))
+
+        regresiones = []
+        for nombre, actual in corrida['casos'].items():
+            anterior = base['casos'].get(nombre)
+            if anterior is None:
+                continue
+            for metrica, margen in MARGEN.items():
+                limite = anterior[metrica] * (1 + tolerancia) + margen
+                if actual[metrica] > limite:
+                    regresiones.append(f"{nombre} / {metrica}: {actual[metrica]} > {limite:.1f} (base {anterior[metrica]})")
+            # Las consultas no dependen de la máquina: cualquier aumento es una regresión
+            if actual['consultas'] > anterior['consultas']:
+                regresiones.append(f"{nombre} / consultas: {actual['consultas']} > {anterior['consultas']}")
+
+        if regresiones:
+            raise CommandError("Regresiones frente a la línea base:\n  " + "\n  ".join(regresiones))
+        self.stdout.write(self.style.SUCCESS(f"Sin regresiones frente a la línea base (tolerancia {tolerancia:.0%})."))
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from gestion import informes
+
+
+class Command(BaseCommand):
+    """
+    Worker de la cola de informes PDF (TrabajoInforme): toma el trabajo pendiente más antiguo,
+    lo genera con WeasyPrint en la caché de gestion.informes y sigue con el siguiente; sin trabajos,
+    consulta la cola cada --espera segundos. Se pueden correr varios a la vez (la reserva es atómica).
+    Uso (servicio systemd o similar): python manage.py procesar_informes
+         (cron, vaciar la cola y salir): python manage.py procesar_informes --una-vez
+    """
+    help = "Genera en segundo plano los informes PDF encolados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help="Procesar lo pendiente y terminar.")
+        parser.add_argument('--espera', type=float, default=2.0, help="Segundos entre consultas con la cola vacía (default: 2).")
+        parser.add_argument(
+            '--vencimiento', type=int, default=10,
+            help="Minutos tras los cuales un trabajo en proceso se considera abandonado y vuelve a la cola (default: 10)."
+        )
+
+    def handle(self, *args, **options):
+        generados = fallidos = 0
+        try:
+            while True:
+                # Proceso de larga duración: conexiones caídas o vencidas se reabren como en una petición
+                close_old_connections()
+                vencidos = informes.reencolar_vencidos(options['vencimiento'])
+                if vencidos:
+                    self.stdout.write(self.style.WARNING(f"{vencidos} trabajos abandonados vuelven a la cola"))
+
+                trabajo = informes.tomar_siguiente()
+                if trabajo is None:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['espera'])
+                    continue
+
+                inicio = time.perf_counter()
+                if informes.procesar(trabajo):
+                    generados += 1
+                    self.stdout.write(f"  Proyecto {trabajo.proyecto_id}: PDF en {time.perf_counter() - inicio:.1f} s")
+                else:
+                    fallidos += 1
+                    self.stdout.write(self.style.ERROR(
+                        f"  Proyecto {trabajo.proyecto_id} (intento {trabajo.intentos}): {trabajo.error}"
+                    ))
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Informes generados: {generados}; fallidos: {fallidos}"))
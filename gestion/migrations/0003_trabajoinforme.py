@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditorias', '0011_consumo_mensual'),
+        ('gestion', '0002_alter_usuario_cargo_alter_usuario_centro_pevi_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoInforme',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(help_text='SHA-256 del HTML del informe (gestion.informes.clave)', max_length=64)),
+                ('html', models.TextField(blank=True, help_text='Se vacía al terminar')),
+                ('base_url', models.CharField(max_length=500)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'En cola'), ('PROCESANDO', 'Generando'), ('LISTO', 'Listo'), ('ERROR', 'Error')], default='PENDIENTE', max_length=20)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+                ('proyecto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_informe', to='auditorias.proyectoauditoria')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Informe PDF',
+                'verbose_name_plural': 'Trabajos de Informes PDF',
+                'indexes': [models.Index(fields=['estado', 'creado'], name='trabajo_informe_cola_idx')],
+                'constraints': [models.UniqueConstraint(fields=('proyecto', 'clave'), name='trabajo_informe_unico')],
+            },
+        ),
+    ]
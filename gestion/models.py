@@ -60,4 +60,56 @@ class Usuario(AbstractUser):
         return self.rol in [self.ROL_DIRECTOR, self.ROL_NACIONAL] or self.is_superuser
 
     def __str__(self):
-        return f"{self.username} - {self.get_rol_display()}"
\ No newline at end of file
+        return f"{self.username} - {self.get_rol_display()}"
+
+
+# ==========================================
+#  COLA DE INFORMES PDF
+# ==========================================
+
+class TrabajoInforme(models.Model):
+    """
+    Generación de un informe PDF en segundo plano (cola en la base de datos, sin Redis ni Celery).
+    La vista lo encola con el HTML ya renderizado y 'manage.py procesar_informes' lo convierte
+    a PDF en la caché de gestion.informes. Un trabajo por proyecto y versión del informe (clave):
+    pedir el mismo informe varias veces reutiliza el trabajo en curso.
+    """
+    PENDIENTE = 'PENDIENTE'
+    PROCESANDO = 'PROCESANDO'
+    LISTO = 'LISTO'
+    ERROR = 'ERROR'
+
+    ESTADOS = [
+        (PENDIENTE, 'En cola'),
+        (PROCESANDO, 'Generando'),
+        (LISTO, 'Listo'),
+        (ERROR, 'Error'),
+    ]
+
+    proyecto = models.ForeignKey(
+        'auditorias.ProyectoAuditoria', on_delete=models.CASCADE, related_name='trabajos_informe'
+    )
+    clave = models.CharField(max_length=64, help_text="SHA-256 del HTML del informe (gestion.informes.clave)")
+    html = models.TextField(blank=True, help_text="Se vacía al terminar")
+    base_url = models.CharField(max_length=500)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    solicitado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trabajo de Informe PDF"
+        verbose_name_plural = "Trabajos de Informes PDF"
+        constraints = [
+            models.UniqueConstraint(fields=['proyecto', 'clave'], name='trabajo_informe_unico'),
+        ]
+        indexes = [
+            # El worker toma el pendiente más antiguo
+            models.Index(fields=['estado', 'creado'], name='trabajo_informe_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"Informe proyecto {self.proyecto_id} ({self.get_estado_display()})"
@@ -0,0 +1,123 @@
+"""
+Paginación por cursor (keyset) para listados largos.
+
+En lugar de OFFSET (que recorre y descarta todas las filas anteriores), cada página
+pide "las N siguientes después de la última fila vista" según las columnas de orden.
+Con un índice que cubra ese orden, cualquier página cuesta lo mismo que la primera.
+El cursor es opaco para el usuario: los valores de orden de la fila frontera en base64.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+TAMANO_PAGINA = 25
+TAMANO_PAGINA_MAX = 100
+
+# Un cursor legítimo (tres valores de orden) ocupa ~100 caracteres; uno más largo es manipulado
+LARGO_CURSOR_MAX = 512
+
+
+def tamano_pagina(request):
+    """'por_pagina' del GET acotado a [1, TAMANO_PAGINA_MAX]."""
+    try:
+        por_pagina = int(request.GET.get('por_pagina', TAMANO_PAGINA))
+    except (TypeError, ValueError):
+        return TAMANO_PAGINA
+    return max(1, min(por_pagina, TAMANO_PAGINA_MAX))
+
+
+# ==========================================
+#  CURSORES
+# ==========================================
+
+def codificar_cursor(valores):
+    crudo = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in valores])
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, num_campos):
+    """Valores del cursor, o None si está vacío o manipulado (se vuelve a la primera página)."""
+    if not cursor or len(cursor) > LARGO_CURSOR_MAX:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError, RecursionError):
+        return None
+    if not isinstance(valores, list) or len(valores) != num_campos:
+        return None
+    return valores
+
+
+def condicion_cursor(orden, valores, hacia_atras=False):
+    """
+    Filas estrictamente posteriores a 'valores' en 'orden' (o anteriores si hacia_atras).
+    (a, b) > (x, y)  ==  a > x  OR  (a = x AND b > y); la primera columna se acota
+    además con >= para que el planificador use el índice como rango.
+    """
+    condicion = Q()
+    iguales = Q()
+    for campo, valor in zip(orden, valores):
+        descendente = campo.startswith('-')
+        nombre = campo.lstrip('-')
+        operador = 'lt' if descendente != hacia_atras else 'gt'
+        condicion |= iguales & Q(**{f'{nombre}__{operador}': valor})
+        iguales &= Q(**{nombre: valor})
+
+    primero = orden[0].lstrip('-')
+    rango = 'lte' if orden[0].startswith('-') != hacia_atras else 'gte'
+    return Q(**{f'{primero}__{rango}': valores[0]}) & condicion
+
+
+def _invertir(orden):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+
+
+# ==========================================
+#  PÁGINA
+# ==========================================
+
+def paginar_por_cursor(qs, orden, despues=None, antes=None, por_pagina=TAMANO_PAGINA):
+    """
+    Una página de 'qs' según 'orden' (la última columna debe ser única, p. ej. '-id').
+    'despues'/'antes' son cursores de la página siguiente/anterior.
+    Devuelve {'filas', 'siguiente', 'anterior'} con los cursores vecinos (o None).
+    Siempre una sola consulta: se pide una fila de más para saber si hay otra página.
+    """
+    valores_antes = decodificar_cursor(antes, len(orden))
+    valores_despues = None if valores_antes else decodificar_cursor(despues, len(orden))
+    try:
+        return _pagina(qs, orden, valores_despues, valores_antes, por_pagina)
+    except (ValidationError, ValueError, TypeError):
+        # Cursor con valores de otro tipo (manipulado a mano): primera página
+        return _pagina(qs, orden, None, None, por_pagina)
+
+
+def _pagina(qs, orden, valores_despues, valores_antes, por_pagina):
+    campos = [campo.lstrip('-') for campo in orden]
+
+    if valores_antes:
+        qs = qs.filter(condicion_cursor(orden, valores_antes, hacia_atras=True)).order_by(*_invertir(orden))
+        filas = list(qs[:por_pagina + 1])
+        hay_mas = len(filas) > por_pagina
+        filas = filas[:por_pagina][::-1]
+        hay_anterior, hay_siguiente = hay_mas, bool(filas)
+    else:
+        if valores_despues:
+            qs = qs.filter(condicion_cursor(orden, valores_despues))
+        filas = list(qs.order_by(*orden)[:por_pagina + 1])
+        hay_mas = len(filas) > por_pagina
+        filas = filas[:por_pagina]
+        hay_anterior, hay_siguiente = bool(valores_despues and filas), hay_mas
+
+    def cursor(fila):
+        return codificar_cursor([getattr(fila, campo) for campo in campos])
+
+    return {
+        'filas': filas,
+        'siguiente': cursor(filas[-1]) if hay_siguiente else None,
+        'anterior': cursor(filas[0]) if hay_anterior else None,
+    }
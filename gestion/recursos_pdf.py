@@ -0,0 +1,123 @@
+"""
+Recursos de los informes PDF para WeasyPrint, sin red.
+
+WeasyPrint resuelve las URL del HTML (logo, imágenes, hojas de estilo) contra base_url y por defecto
+las descarga por HTTP: cada informe volvía a pedir /static/... a nuestro propio servidor (un worker
+más ocupado por informe) y fallaba en nodos sin red. fetcher(base_url) las lee del disco:
+  - STATIC_URL -> STATIC_ROOT (collectstatic) o los finders de staticfiles (STATICFILES_DIRS y apps).
+  - MEDIA_URL  -> MEDIA_ROOT.
+  - data:      -> el fetcher de WeasyPrint (no usa red).
+Solo se mapean las URL de nuestro propio sitio: mismo esquema y host que el base_url del informe
+(o que STATIC_URL/MEDIA_URL si son absolutas). Cualquier otra URL (CDN, otros hosts con rutas
+/static/ o /media/, file://) se rechaza: WeasyPrint registra la advertencia y omite el recurso,
+así que generar un informe nunca sale a la red ni lee fuera de esos directorios.
+
+opciones_render() reutiliza entre informes del mismo proceso (worker, pool del ZIP) la configuración
+de fuentes y la caché de imágenes ya decodificadas de WeasyPrint.
+"""
+import mimetypes
+import os
+import threading
+from functools import lru_cache, partial
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+
+_local = threading.local()
+
+
+def _prefijo(url):
+    """'/static/' de STATIC_URL = 'static/' o 'https://cdn/static/'."""
+    return '/' + urlsplit(url or '').path.strip('/') + '/'
+
+
+def _origen(url):
+    """(esquema, host, puerto) de una URL; None si no es http(s) absoluta."""
+    partes = urlsplit(url or '')
+    esquema = partes.scheme.lower()
+    if esquema not in ('http', 'https') or not partes.hostname:
+        return None
+    try:
+        puerto = partes.port or (443 if esquema == 'https' else 80)
+    except ValueError:
+        return None  # Puerto inválido
+    return esquema, partes.hostname, puerto
+
+
+def ruta_local(url, base_url):
+    """
+    Archivo en disco de una URL de estáticos o media del sitio de base_url, o None si es de
+    otro esquema u host, no es de estáticos/media o no existe.
+    """
+    origen = _origen(url)
+    if origen is None:
+        return None
+    ruta = unquote(urlsplit(url).path)
+    estaticos, media = _prefijo(settings.STATIC_URL), _prefijo(settings.MEDIA_URL)
+    # STATIC_URL/MEDIA_URL relativas se sirven desde el mismo sitio que el informe
+    sitio = _origen(base_url)
+    try:
+        if ruta.startswith(estaticos) and origen == (_origen(settings.STATIC_URL) or sitio):
+            relativa = ruta[len(estaticos):]
+            if settings.STATIC_ROOT:
+                recopilado = safe_join(settings.STATIC_ROOT, relativa)
+                if os.path.isfile(recopilado):
+                    return recopilado
+            return finders.find(relativa)
+        if ruta.startswith(media) and settings.MEDIA_ROOT and origen == (_origen(settings.MEDIA_URL) or sitio):
+            archivo = safe_join(settings.MEDIA_ROOT, ruta[len(media):])
+            return archivo if os.path.isfile(archivo) else None
+    except SuspiciousFileOperation:
+        return None  # '../' fuera del directorio
+    return None
+
+
+@lru_cache(maxsize=64)
+def _leer(ruta, _modificado, _tamano):
+    # La clave incluye fecha y tamaño: un archivo reemplazado en disco se vuelve a leer
+    with open(ruta, 'rb') as archivo:
+        return archivo.read()
+
+
+def url_fetcher(url, timeout=10, ssl_context=None, base_url=None, **kwargs):
+    """
+    url_fetcher de WeasyPrint: estáticos y media del sitio de base_url desde el disco; data: en
+    memoria; nada más. Sin base_url ninguna URL http(s) es local. Usar fetcher(base_url).
+    """
+    if urlsplit(url).scheme.lower() == 'data':
+        from weasyprint import default_url_fetcher
+
+        return default_url_fetcher(url, timeout=timeout, ssl_context=ssl_context, **kwargs)
+
+    ruta = ruta_local(url, base_url) if base_url else None
+    if ruta is None:
+        raise ValueError(f"Recurso no disponible sin red para el informe: {url}")
+
+    estado = os.stat(ruta)
+    mime_type = mimetypes.guess_type(ruta)[0]
+    return {
+        'string': _leer(ruta, estado.st_mtime_ns, estado.st_size),
+        'mime_type': mime_type or 'application/octet-stream',
+        'filename': os.path.basename(ruta),
+        'redirected_url': url,
+    }
+
+
+def fetcher(base_url):
+    """url_fetcher para un HTML resuelto contra base_url (se puede enviar al pool de procesos)."""
+    return partial(url_fetcher, base_url=base_url)
+
+
+def opciones_render():
+    """
+    Argumentos de write_pdf() con cachés persistentes en el hilo: fuentes (FontConfiguration) e
+    imágenes decodificadas. Por hilo porque WeasyPrint no garantiza compartirlas entre hilos.
+    """
+    if not hasattr(_local, 'opciones'):
+        from weasyprint.text.fonts import FontConfiguration
+
+        _local.opciones = {'font_config': FontConfiguration(), 'cache': {}}
+    return _local.opciones
@@ -0,0 +1,17 @@
+"""
+Señales de la app de gestión: limpieza de la caché de informes PDF (gestion.informes).
+Editar un proyecto no necesita invalidar nada (la clave cambia con el contenido);
+al eliminarlo se borran sus archivos.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from auditorias.models import ProyectoAuditoria
+from . import informes
+
+
+@receiver(post_delete, sender=ProyectoAuditoria, dispatch_uid="informes_proyecto_eliminado")
+def borrar_informes(sender, instance, **kwargs):
+    proyecto_id = instance.pk
+    transaction.on_commit(lambda: informes.invalidar(proyecto_id))
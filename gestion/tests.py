@@ -1,3 +1,307 @@
-from django.test import TestCase
+import base64
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone as tz
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from auditorias.models import Empresa, ProyectoAuditoria
+from . import informes, recursos_pdf
+from .paginacion import codificar_cursor, paginar_por_cursor
+from .models import CentroPevi, TrabajoInforme, Usuario
+
+
+def crear_empresa(nombre='Empresa Pruebas', **campos):
+    datos = {
+        'razon_social': nombre, 'nit': nombre.upper().replace(' ', '-'), 'sector_productivo': 'Alimentos',
+        'direccion': '-', 'ciudad': 'Bucaramanga', 'contacto_nombre': '-', 'contacto_email': 'pruebas@pevi.co',
+        'contacto_telefono': '-',
+    }
+    datos.update(campos)
+    return Empresa.objects.create(**datos)
+
+
+def crear_proyecto(centro, empresa, nombre='Auditoría de prueba', **campos):
+    return ProyectoAuditoria.objects.create(
+        centro=centro, empresa=empresa, nombre_proyecto=nombre, fecha_inicio=date(2024, 1, 1), anio=2024,
+        produccion_total=1000, unidad_produccion='Ton', **campos,
+    )
+
+
+class CacheInformesMixin:
+    """INFORMES_CACHE_DIR en un directorio temporal por test."""
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajuste = override_settings(INFORMES_CACHE_DIR=directorio)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+
+# ---------------------------------------------------------
+# Paginación por cursor (paginacion.py)
+# ---------------------------------------------------------
+
+class PaginacionCursorTests(TestCase):
+    """Páginas de 3 sobre 8 proyectos con solo dos valores de updated_at: desempata '-id'."""
+
+    ORDEN = ['-updated_at', '-id']
+
+    @classmethod
+    def setUpTestData(cls):
+        centro = CentroPevi.objects.create(nombre='Centro Páginas', codigo_interno='T-PAG', region='Caribe')
+        empresa = crear_empresa()
+        ids = [crear_proyecto(centro, empresa, f'Proyecto {i}').pk for i in range(8)]
+        # updated_at es auto_now: se fija con update() para forzar empates
+        ProyectoAuditoria.objects.filter(pk__in=ids[:5]).update(updated_at=datetime(2024, 5, 1, tzinfo=tz.utc))
+        ProyectoAuditoria.objects.filter(pk__in=ids[5:]).update(updated_at=datetime(2024, 6, 1, tzinfo=tz.utc))
+        # Orden esperado: primero los de junio, en cada fecha id descendente
+        cls.esperado = ids[5:][::-1] + ids[:5][::-1]
+
+    def pagina(self, **cursores):
+        return paginar_por_cursor(ProyectoAuditoria.objects.all(), self.ORDEN, por_pagina=3, **cursores)
+
+    def ids(self, pagina):
+        return [proyecto.pk for proyecto in pagina['filas']]
+
+    def test_siguientes_y_anteriores_con_empates(self):
+        primera = self.pagina()
+        self.assertEqual(self.ids(primera), self.esperado[:3])
+        self.assertIsNone(primera['anterior'])
+
+        segunda = self.pagina(despues=primera['siguiente'])
+        self.assertEqual(self.ids(segunda), self.esperado[3:6])
+        tercera = self.pagina(despues=segunda['siguiente'])
+        self.assertEqual(self.ids(tercera), self.esperado[6:])
+        self.assertIsNone(tercera['siguiente'])
+
+        # Hacia atrás se recorren las mismas páginas
+        self.assertEqual(self.ids(self.pagina(antes=tercera['anterior'])), self.esperado[3:6])
+        vuelta = self.pagina(antes=segunda['anterior'])
+        self.assertEqual(self.ids(vuelta), self.esperado[:3])
+        self.assertIsNone(vuelta['anterior'])
+        self.assertIsNotNone(vuelta['siguiente'])
+
+    def test_cursor_invalido_vuelve_a_la_primera_pagina(self):
+        manipulados = [
+            'no-es-base64!', codificar_cursor([]), codificar_cursor(['2024-06-01T00:00:00+00:00']),
+            codificar_cursor(['no-es-fecha', 1]), codificar_cursor([None, 1]),
+            codificar_cursor([{'a': 1}, [2]]), codificar_cursor(['2024-06-01T00:00:00+00:00', 'x']),
+            codificar_cursor({'a': 1}), base64.urlsafe_b64encode(b'[' * 100000).decode(), 'A' * 100000,
+        ]
+        for cursor in manipulados:
+            for direccion in ('despues', 'antes'):
+                with self.subTest(cursor=cursor, direccion=direccion):
+                    self.assertEqual(self.ids(self.pagina(**{direccion: cursor})), self.esperado[:3])
+
+    def test_cursor_invalido_en_el_listado(self):
+        nacional = Usuario.objects.create_user('nacional', password='-', rol='DIRECTOR_NACIONAL')
+        self.client.force_login(nacional)
+        for parametros in [{'despues': 'xx'}, {'antes': codificar_cursor([{'a': 1}, [2]])},
+                           {'q': 'Proyecto', 'despues': codificar_cursor(['x', 'y', 'z'])}]:
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(reverse('lista_proyectos'), parametros).status_code, 200)
+
+
+# ---------------------------------------------------------
+# Cola de informes PDF (TrabajoInforme)
+# ---------------------------------------------------------
+
+class ColaInformesTests(CacheInformesMixin, TestCase):
+    """Con INFORMES_EN_COLA: en cola (202) -> el worker lo genera -> se sirve desde la caché (200/304)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.centro = CentroPevi.objects.create(nombre='Centro Informes', codigo_interno='T-INF', region='Caribe')
+        cls.proyecto = crear_proyecto(cls.centro, crear_empresa())
+        cls.nacional = Usuario.objects.create_user('nacional', password='-', rol='DIRECTOR_NACIONAL')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.nacional)
+        self.url = reverse('generar_informe_pdf', args=[self.proyecto.pk])
+
+    def estado(self, trabajo):
+        return self.client.get(reverse('estado_informe', args=[trabajo.pk])).json()
+
+    @override_settings(INFORMES_EN_COLA=True)
+    def test_pendiente_listo_y_desde_cache(self):
+        # 1. Pendiente: la petición no genera el PDF
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 202)
+        trabajo = TrabajoInforme.objects.get()
+        self.assertEqual(trabajo.estado, TrabajoInforme.PENDIENTE)
+        self.assertEqual(self.estado(trabajo), {'estado': 'PENDIENTE', 'estado_display': 'En cola', 'posicion': 0})
+
+        # Pedirlo otra vez reutiliza el trabajo en cola
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+        self.assertEqual(TrabajoInforme.objects.count(), 1)
+
+        # 2. El worker lo toma (una sola vez) y lo genera
+        tomado = informes.tomar_siguiente()
+        self.assertEqual((tomado.pk, tomado.estado), (trabajo.pk, TrabajoInforme.PROCESANDO))
+        self.assertIsNone(informes.tomar_siguiente())
+        self.assertTrue(informes.procesar(tomado))
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.html), (TrabajoInforme.LISTO, ''))
+        self.assertEqual(self.estado(trabajo)['url'], self.url)
+
+        # 3. Desde la caché: el PDF sin nuevo trabajo, y 304 con su ETag
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        self.assertEqual(respuesta['ETag'], f'"{trabajo.clave}"')
+        self.assertEqual(TrabajoInforme.objects.count(), 1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+    @override_settings(INFORMES_EN_COLA=True)
+    def test_falla_reintenta_hasta_max_intentos(self):
+        self.client.get(self.url)
+        with mock.patch.object(informes, 'obtener_o_generar', side_effect=RuntimeError('WeasyPrint')):
+            for intento in range(1, informes.MAX_INTENTOS + 1):
+                tomado = informes.tomar_siguiente()
+                self.assertEqual(tomado.intentos, intento)
+                self.assertFalse(informes.procesar(tomado))
+
+        trabajo = TrabajoInforme.objects.get()
+        self.assertEqual((trabajo.estado, trabajo.error), (TrabajoInforme.ERROR, 'RuntimeError: WeasyPrint'))
+        self.assertIsNone(informes.tomar_siguiente())
+        self.assertIn('error', self.estado(trabajo))
+
+        # Volver a pedirlo lo devuelve a la cola
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), (TrabajoInforme.PENDIENTE, 0))
+
+    def test_sin_cola_se_genera_en_la_peticion(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        self.assertFalse(TrabajoInforme.objects.exists())
+
+
+# ---------------------------------------------------------
+# Exportación de informes del centro (ZIP)
+# ---------------------------------------------------------
+
+def pool_de_hilos(max_workers, mp_context=None, initializer=None):
+    """En los tests el pool de zip_informes usa hilos: comparten la configuración (override_settings)."""
+    return ThreadPoolExecutor(max_workers)
+
+
+class ExportarInformesCentroTests(CacheInformesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.centro = CentroPevi.objects.create(nombre='Centro ZIP', codigo_interno='T-ZIP', region='Caribe')
+        otro = CentroPevi.objects.create(nombre='Centro Otro', codigo_interno='T-OTRO', region='Andina')
+        empresa = crear_empresa('Empresa Exportación')
+        cls.proyectos = [
+            crear_proyecto(cls.centro, empresa, 'Calderas', estado='FINALIZADO'),
+            crear_proyecto(cls.centro, empresa, 'Motores', estado='EJECUCION'),
+            crear_proyecto(cls.centro, empresa, 'Vapor', estado='FINALIZADO'),
+        ]
+        crear_proyecto(otro, empresa, 'Otro centro')
+        cls.director = Usuario.objects.create_user(
+            'director', password='-', rol='DIRECTOR_CENTRO', centro_pevi=cls.centro
+        )
+        cls.nacional = Usuario.objects.create_user('nacional', password='-', rol='DIRECTOR_NACIONAL')
+        cls.profesor = Usuario.objects.create_user('profesor', password='-', rol='PROFESOR', centro_pevi=cls.centro)
+
+    def descargar(self, usuario, **parametros):
+        self.client.force_login(usuario)
+        with mock.patch.object(informes, 'ProcessPoolExecutor', pool_de_hilos):
+            respuesta = self.client.get(reverse('exportar_informes_centro'), parametros)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(respuesta['Content-Type'], 'application/zip')
+            return zipfile.ZipFile(BytesIO(b''.join(respuesta.streaming_content)))
+
+    def test_un_pdf_por_proyecto_del_centro(self):
+        # Uno ya en caché (se copia) y dos que se generan en el pool
+        primero = self.proyectos[0]
+        informes.obtener_o_generar(primero.pk, informes.html_informe(primero), 'http://testserver/')
+
+        archivo = self.descargar(self.director)
+        self.assertIsNone(archivo.testzip())
+        self.assertEqual(sorted(archivo.namelist()), sorted(informes.nombre_en_zip(p) for p in self.proyectos))
+        for nombre in archivo.namelist():
+            with self.subTest(nombre=nombre):
+                self.assertTrue(archivo.read(nombre).startswith(b'%PDF'))
+
+    def test_nacional_por_centro_y_estado(self):
+        archivo = self.descargar(self.nacional, centro=self.centro.pk, estado='FINALIZADO')
+        esperados = [informes.nombre_en_zip(p) for p in self.proyectos if p.estado == 'FINALIZADO']
+        self.assertEqual(sorted(archivo.namelist()), sorted(esperados))
+
+    def test_boton_de_exportar_solo_para_directivos(self):
+        casos = [
+            (self.director, {}, True),
+            (self.nacional, {}, False),  # Vista nacional: primero se elige el centro
+            (self.nacional, {'centro': self.centro.pk}, True),
+            (self.profesor, {}, False),
+            (self.profesor, {'centro': self.centro.pk}, False),
+        ]
+        url_exportar = reverse('exportar_informes_centro')
+        for usuario, parametros, visible in casos:
+            with self.subTest(usuario=usuario.username, parametros=parametros):
+                self.client.force_login(usuario)
+                respuesta = self.client.get(reverse('lista_proyectos'), parametros)
+                self.assertEqual(url_exportar in respuesta.content.decode(), visible)
+
+
+# ---------------------------------------------------------
+# Recursos de los PDF sin red (recursos_pdf)
+# ---------------------------------------------------------
+
+class RecursosPdfTests(SimpleTestCase):
+    BASE = 'https://pevi.example.co/proyectos/1/informe/pdf/'
+    LOGO = 'https://pevi.example.co/static/img/logo_pevi.png'
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        os.makedirs(os.path.join(self.media, 'documentos'))
+        with open(os.path.join(self.media, 'documentos', 'foto.png'), 'wb') as archivo:
+            archivo.write(b'png')
+
+    def test_mismo_sitio_se_lee_del_disco(self):
+        with override_settings(MEDIA_ROOT=self.media):
+            self.assertTrue(recursos_pdf.ruta_local(self.LOGO, self.BASE).endswith('logo_pevi.png'))
+            self.assertEqual(
+                recursos_pdf.ruta_local('https://pevi.example.co:443/media/documentos/foto.png', self.BASE),
+                os.path.join(self.media, 'documentos', 'foto.png'),
+            )
+            recurso = recursos_pdf.fetcher(self.BASE)(self.LOGO)
+        self.assertEqual((recurso['mime_type'], recurso['filename']), ('image/png', 'logo_pevi.png'))
+
+    def test_otro_host_o_esquema_se_rechaza(self):
+        ajenas = [
+            'https://otro.example.com/static/img/logo_pevi.png',
+            'http://pevi.example.co/static/img/logo_pevi.png',
+            'https://pevi.example.co:8443/static/img/logo_pevi.png',
+            'https://otro.example.com/media/documentos/foto.png',
+            'file:///etc/passwd',
+        ]
+        with override_settings(MEDIA_ROOT=self.media):
+            for url in ajenas:
+                with self.subTest(url=url):
+                    self.assertIsNone(recursos_pdf.ruta_local(url, self.BASE))
+                    with self.assertRaises(ValueError):
+                        recursos_pdf.fetcher(self.BASE)(url)
+
+    def test_sin_base_url_nada_es_local(self):
+        with self.assertRaises(ValueError):
+            recursos_pdf.url_fetcher(self.LOGO)
+
+    @override_settings(STATIC_URL='https://cdn.example.net/static/')
+    def test_static_url_absoluta_usa_su_propio_host(self):
+        self.assertIsNotNone(recursos_pdf.ruta_local('https://cdn.example.net/static/img/logo_pevi.png', self.BASE))
+        self.assertIsNone(recursos_pdf.ruta_local(self.LOGO, self.BASE))
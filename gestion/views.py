@@ -1,29 +1,42 @@
 import json
+import os
+from datetime import date
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from django.db.models import Sum, Q
+from django.conf import settings
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Sum
+from django.urls import reverse
 from django.utils import timezone
-
-# Librería PDF
-from weasyprint import HTML
-import tempfile
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.utils.text import slugify
+from django.views.decorators.cache import cache_control
 
 # Modelos y Formularios del Sistema
-from .models import CentroPevi, Usuario
+from .models import CentroPevi, Usuario, TrabajoInforme
 from .forms import UsuarioForm, UsuarioEditarForm
-from auditorias.models import ProyectoAuditoria, Empresa
+from . import informes
+from auditorias.models import ProyectoAuditoria, Empresa, ConsumoMensual
 from auditorias.forms import (
     ProyectoForm, ProduccionForm, DocumentoForm, EmpresaForm,
     ElectricidadForm, GasNaturalForm, CarbonForm, 
-    FuelOilForm, BiomasaForm, GasPropanoForm
+    FuelOilForm, BiomasaForm, GasPropanoForm, SerieMensualFormSet
+)
+from auditorias.energia import (
+    FUENTE_POR_MODELO, registros_proyecto, desglose_de_registros, indicadores, serie_mensual
 )
+from auditorias.factores import valores_iniciales
+from auditorias.busqueda import buscar_proyectos
+from metricas import cache as cache_metricas
+from metricas.benchmark import benchmark_proyecto
 
 # Decoradores de Seguridad Personalizados
 from .decorators import acceso_staff, solo_directivos, solo_lideres
+from .paginacion import paginar_por_cursor, tamano_pagina
 
 # ==============================================================================
 #  CONFIGURACIÓN GLOBAL
@@ -70,6 +83,11 @@ FORM_MAPPING = {
     },
 }
 
+MESES = (
+    'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre',
+)
+
 def verificar_acceso_proyecto(user, proyecto):
     """
     Helper de Seguridad: Valida si un usuario tiene derecho a ver/editar un proyecto específico.
@@ -139,12 +157,12 @@ def dashboard(request):
     total_proyectos = proyectos.count()
     activos = proyectos.filter(estado='EJECUCION').count()
     
-    # Suma rápida de energía usando el helper del modelo
-    total_kwh = sum([p.get_total_kwh() for p in proyectos]) 
+    # Suma de energía en base de datos sobre los resúmenes materializados
+    total_kwh = proyectos.aggregate(total=Sum('resumen__kwh_total'))['total'] or 0
 
     # 4. CONTEXTO PARA EL TEMPLATE
     context = {
-        'lista_proyectos': proyectos.order_by('-updated_at')[:10], # Top 10 recientes
+        'lista_proyectos': proyectos.select_related('empresa').con_totales_energia().order_by('-updated_at')[:10], # Top 10 recientes
         'kpi_total': total_proyectos,
         'kpi_activos': activos,
         'kpi_energia': round(total_kwh),
@@ -201,13 +219,13 @@ def lista_proyectos(request):
         
     # CASO C: Profesor
     elif user.rol == 'PROFESOR':
-        proyectos = ProyectoAuditoria.objects.filter(lider_proyecto=user).select_related('empresa')
+        proyectos = ProyectoAuditoria.objects.filter(lider_proyecto=user).select_related('empresa', 'lider_proyecto')
         es_vista_nacional = False
         titulo_vista = "Mis Proyectos Liderados"
         
     # CASO D: Estudiante
     elif user.rol == 'ESTUDIANTE':
-        proyectos = ProyectoAuditoria.objects.filter(equipo=user).select_related('empresa')
+        proyectos = ProyectoAuditoria.objects.filter(equipo=user).select_related('empresa', 'lider_proyecto')
         es_vista_nacional = False
         titulo_vista = "Mis Asignaciones"
 
@@ -217,8 +235,12 @@ def lista_proyectos(request):
     filtro_lider = request.GET.get('lider')
     filtro_centro = request.GET.get('centro')
 
+    # Búsqueda sin tildes por proyecto, empresa, NIT o ciudad (más relevantes primero)
+    # 'id' desempata el orden: la paginación por cursor necesita un orden total
+    orden = ['-updated_at', '-id']
     if filtro_q:
-        proyectos = proyectos.filter(Q(nombre_proyecto__icontains=filtro_q) | Q(empresa__razon_social__icontains=filtro_q))
+        proyectos = buscar_proyectos(proyectos, filtro_q)
+        orden.insert(0, '-relevancia')
 
     if filtro_estado:
         proyectos = proyectos.filter(estado=filtro_estado)
@@ -230,9 +252,20 @@ def lista_proyectos(request):
     if filtro_centro and es_vista_nacional:
         proyectos = proyectos.filter(centro_id=filtro_centro)
 
-    # 3. CONTEXTO
+    # 3. PÁGINA (cursor sobre el orden; tamaño del equipo anotado en la misma consulta)
+    pagina = paginar_por_cursor(
+        proyectos.con_tamano_equipo(),
+        orden,
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        por_pagina=tamano_pagina(request),
+    )
+
+    # 4. CONTEXTO
     context = {
-        'proyectos': proyectos.order_by('-updated_at'),
+        'proyectos': pagina['filas'],
+        'pagina_siguiente': pagina['siguiente'],
+        'pagina_anterior': pagina['anterior'],
         'page_subtitle': titulo_vista,
         'opciones_centros': opciones_centros,
         'opciones_lideres': opciones_lideres,
@@ -412,79 +445,14 @@ def detalle_proyecto(request, proyecto_id):
         raise PermissionDenied("Acceso Denegado: No estás autorizado para ver este proyecto.")
 
     # 1. Recuperar Bitácora Energética
-    electricidad = proyecto.electricidad_related.first()
-    gas_natural = proyecto.gasnatural_related.first()
-    carbon = proyecto.carbonmineral_related.first()
-    fuel_oil = proyecto.fueloil_related.first()
-    biomasa = proyecto.biomasa_related.first()
-    gas_propano = proyecto.gaspropano_related.first()
-
-    # 2. Cálculos de Totales (KPIs)
-    fuentes_map = [
-        ('Electricidad', electricidad),
-        ('Gas Natural', gas_natural),
-        ('Carbón Mineral', carbon),
-        ('Fuel Oil', fuel_oil),
-        ('Biomasa', biomasa),
-        ('GLP', gas_propano),
-    ]
-
-    total_emisiones = 0.0
-    total_costo = 0.0
-    total_energia = 0.0
-    
-    total_kwh_electrico = 0.0
-    total_kwh_termico = 0.0
-
-    # Listas para Chart.js
-    chart_labels = []
-    chart_data_energia = []
-    chart_data_costos = []
-    chart_colors = []
-
-    color_map = {
-        'Electricidad': '#ffc107', 'Gas Natural': '#0d6efd',
-        'Carbón Mineral': '#212529', 'Fuel Oil': '#dc3545',
-        'Biomasa': '#198754', 'GLP': '#0dcaf0'
-    }
+    registros = registros_proyecto(proyecto)
 
-    for nombre, fuente in fuentes_map:
-        if fuente:
-            total_emisiones += fuente.emisiones_totales
-            total_costo += fuente.costo_total_anual
-            
-            # Polimorfismo: Obtener kWh
-            energia_fuente = 0
-            if hasattr(fuente, 'consumo_anual_kwh'): 
-                energia_fuente = fuente.consumo_anual_kwh
-            elif hasattr(fuente, 'consumo_anual'): 
-                energia_fuente = fuente.consumo_anual
-            
-            total_energia += energia_fuente
+    # 2. Totales, MBTU, IDES y series de gráficas (auditorias.energia)
+    totales = indicadores(desglose_de_registros(registros), proyecto.produccion_total)
+    series = totales['series']
+    mensual = serie_mensual([proyecto.pk])
 
-            if nombre == 'Electricidad':
-                total_kwh_electrico += energia_fuente
-            else:
-                total_kwh_termico += energia_fuente
-
-            if energia_fuente > 0:
-                chart_labels.append(nombre)
-                chart_data_energia.append(round(energia_fuente))
-                chart_data_costos.append(round(fuente.costo_total_anual))
-                chart_colors.append(color_map.get(nombre, '#cccccc'))
-
-    # 3. MBTU (Millones de BTU)
-    FACTOR_MBTU = 0.00341214
-    mbtu_electrico = total_kwh_electrico * FACTOR_MBTU
-    mbtu_termico = total_kwh_termico * FACTOR_MBTU
-    chart_data_mbtu = [round(mbtu_electrico, 2), round(mbtu_termico, 2)]
-
-    # 4. IDES (Indicador de Desempeño)
-    indicador_ides = 0
-    if proyecto.produccion_total and proyecto.produccion_total > 0 and total_energia > 0:
-        indicador_ides = total_energia / proyecto.produccion_total
-
-    # 5. Producción Display (Entero)
+    # 3. Producción Display (Entero)
     produccion_display = 0
     if proyecto.produccion_total:
         produccion_display = round(proyecto.produccion_total)
@@ -493,28 +461,28 @@ def detalle_proyecto(request, proyecto_id):
         'proyecto': proyecto,
         'produccion_display': produccion_display,
         
-        # Objetos Individuales
-        'electricidad': electricidad,
-        'gas_natural': gas_natural,
-        'carbon_mineral': carbon,
-        'fuel_oil': fuel_oil,
-        'biomasa': biomasa,
-        'gas_propano': gas_propano,
+        # Objetos Individuales (electricidad, gas_natural, carbon_mineral, ...)
+        **registros,
         
         # KPIs Numéricos
-        'kpi_emisiones': round(total_emisiones, 2),
-        'kpi_energia': round(total_energia),
-        'kpi_costo': round(total_costo),
-        'kpi_ides': round(indicador_ides, 4),
-        'kpi_elec_kwh': round(total_kwh_electrico),
-        'kpi_term_mbtu': round(mbtu_termico, 2),
+        'kpi_emisiones': round(totales['emisiones_totales'], 2),
+        'kpi_energia': round(totales['kwh_total']),
+        'kpi_costo': round(totales['costo_total']),
+        'kpi_ides': round(totales['ides'], 4),
+        'kpi_elec_kwh': round(totales['kwh_electrico']),
+        'kpi_term_mbtu': round(totales['mbtu_termico'], 2),
+
+        # Posición frente al sector (precalculada por calcular_benchmarks)
+        'benchmark': benchmark_proyecto(proyecto),
 
         # Datos Gráficos JSON
-        'chart_labels': json.dumps(chart_labels),
-        'chart_data_energia': json.dumps(chart_data_energia),
-        'chart_data_costos': json.dumps(chart_data_costos),
-        'chart_colors': json.dumps(chart_colors),
-        'chart_data_mbtu': json.dumps(chart_data_mbtu),
+        'chart_labels': json.dumps(series['labels']),
+        'chart_data_energia': json.dumps(series['energia']),
+        'chart_data_costos': json.dumps(series['costos']),
+        'chart_colors': json.dumps(series['colors']),
+        'chart_data_mbtu': json.dumps(series['mbtu']),
+        'chart_mensual': json.dumps(mensual),
+        'tiene_serie_mensual': bool(mensual['labels']),
         
         # Permisos frontend
         'puede_editar_estructura': (request.user.rol != 'ESTUDIANTE'),
@@ -554,8 +522,11 @@ def registrar_consumo(request, proyecto_id, tipo_energia):
             accion = "actualizado" if registro_existente else "creado"
             messages.success(request, f"Registro de {config['titulo']} {accion}.")
             return redirect('detalle_proyecto', proyecto_id=proyecto.id)
-    else:
+    elif registro_existente:
         form = FormClass(instance=registro_existente)
+    else:
+        # Registro nuevo: FE y PC de referencia (catálogo UPME) para el año del proyecto
+        form = FormClass(initial=valores_iniciales(FUENTE_POR_MODELO[ModelClass].clave, proyecto.anio))
 
     context = {
         'proyecto': proyecto,
@@ -567,6 +538,89 @@ def registrar_consumo(request, proyecto_id, tipo_energia):
     }
     return render(request, 'gestion/registro_energia_form.html', context)
 
+@login_required
+@acceso_staff
+def registrar_serie_mensual(request, proyecto_id, tipo_energia):
+    """
+    Carga en bloque de los 12 meses de una fuente (?anio=, por defecto el del proyecto).
+    Los totales anuales del registro se derivan de la serie del año del proyecto.
+    """
+    proyecto = get_object_or_404(ProyectoAuditoria, id=proyecto_id)
+
+    if not verificar_acceso_proyecto(request.user, proyecto):
+        raise PermissionDenied("No tienes permiso para modificar este proyecto.")
+
+    config = FORM_MAPPING.get(tipo_energia)
+    if not config:
+        messages.error(request, "Tipo de energía no válido.")
+        return redirect('detalle_proyecto', proyecto_id=proyecto.id)
+
+    fuente = FUENTE_POR_MODELO[config['form']._meta.model]
+    registro = fuente.modelo.objects.filter(proyecto=proyecto).first()
+    if registro is None:
+        # La serie se normaliza con el PC del registro y las emisiones usan su FE
+        messages.warning(request, f"Registre primero el consumo anual de {config['titulo']}.")
+        return redirect('registrar_consumo', proyecto_id=proyecto.id, tipo_energia=tipo_energia)
+
+    try:
+        anio = int(request.GET.get('anio') or proyecto.anio or timezone.now().year)
+    except ValueError:
+        anio = proyecto.anio or timezone.now().year
+
+    serie = ConsumoMensual.de_registro(registro)
+    guardados = {c.periodo.month: c for c in serie.filter(periodo__year=anio)}
+    iniciales = [
+        {
+            'periodo': date(anio, mes, 1),
+            'cantidad': guardados[mes].cantidad if mes in guardados else None,
+            'costo': guardados[mes].costo if mes in guardados else None,
+        }
+        for mes in range(1, 13)
+    ]
+
+    if request.method == 'POST':
+        formset = SerieMensualFormSet(request.POST, initial=iniciales)
+        if formset.is_valid():
+            kwh_por_unidad = registro.kwh_por_unidad()
+            meses, vacios = [], []
+            for datos in formset.cleaned_data:
+                periodo = datos['periodo'].replace(day=1)
+                if datos.get('cantidad') is None:
+                    vacios.append(periodo)
+                    continue
+                meses.append(ConsumoMensual(
+                    proyecto=proyecto, fuente=fuente.clave, periodo=periodo,
+                    cantidad=datos['cantidad'], costo=datos.get('costo') or 0.0,
+                    kwh=datos['cantidad'] * kwh_por_unidad,
+                ))
+
+            with transaction.atomic():
+                serie.filter(periodo__in=vacios).delete()
+                ConsumoMensual.guardar_lote(meses)
+                totalizado = registro.aplicar_serie_mensual()
+                # guardar_lote no dispara señales: las curvas mensuales del centro cambian aunque no haya totales
+                cache_metricas.invalidar(proyecto.centro_id)
+
+            if totalizado:
+                messages.success(request, f"Serie mensual de {config['titulo']} guardada y totales anuales actualizados.")
+            else:
+                messages.success(request, f"Serie mensual de {config['titulo']} guardada (sin meses del año base).")
+            return redirect('detalle_proyecto', proyecto_id=proyecto.id)
+    else:
+        formset = SerieMensualFormSet(initial=iniciales)
+
+    context = {
+        'proyecto': proyecto,
+        'formset': formset,
+        'filas': zip(MESES, formset),
+        'anio': anio,
+        'unidad': fuente.unidad,
+        'tipo_energia': tipo_energia,
+        'titulo_energia': config['titulo'],
+        'icono': config['icono'],
+    }
+    return render(request, 'gestion/serie_mensual_form.html', context)
+
 @login_required
 @acceso_staff
 def registrar_produccion(request, proyecto_id):
@@ -606,92 +660,98 @@ def subir_documento(request, proyecto_id):
 
 @login_required
 @acceso_staff
+@cache_control(private=True, no_cache=True)
 def generar_informe_pdf(request, proyecto_id):
     proyecto = get_object_or_404(ProyectoAuditoria, id=proyecto_id)
     
     if not verificar_acceso_proyecto(request.user, proyecto):
         raise PermissionDenied("Acceso denegado.")
 
-    # Recuperación de datos (Similar a detalle_proyecto pero formateado para PDF)
-    electricidad = proyecto.electricidad_related.first()
-    gas_natural = proyecto.gasnatural_related.first()
-    carbon = proyecto.carbonmineral_related.first()
-    fuel_oil = proyecto.fueloil_related.first()
-    biomasa = proyecto.biomasa_related.first()
-    gas_propano = proyecto.gaspropano_related.first()
-
-    fuentes_map = [
-        ('Electricidad', electricidad, 'kWh'),
-        ('Gas Natural', gas_natural, 'm³'),
-        ('Carbón Mineral', carbon, 'Ton'),
-        ('Fuel Oil', fuel_oil, 'Gal'),
-        ('Biomasa', biomasa, 'Ton'),
-        ('GLP', gas_propano, 'kg'),
-    ]
-
-    total_emisiones = 0.0
-    total_costo = 0.0
-    total_energia = 0.0
-    total_kwh_electrico = 0.0
-    total_kwh_termico = 0.0
+    # El HTML (milisegundos) identifica el informe: su hash es el ETag y la clave del PDF en disco
+    html = informes.html_informe(proyecto)
+    clave = informes.clave(html)
+    etag = quote_etag(clave)
+
+    no_modificado = get_conditional_response(request, etag=etag)
+    if no_modificado is not None:
+        no_modificado['ETag'] = etag
+        return no_modificado
+
+    # WeasyPrint (segundos) solo si ese contenido aún no está en la caché
+    ruta = informes.ruta(proyecto.id, clave)
+    if not os.path.exists(ruta):
+        if settings.INFORMES_EN_COLA:
+            # Fuera del hilo de la petición: la página de espera consulta estado_informe
+            trabajo = informes.encolar(proyecto.id, html, request.build_absolute_uri(), clave, request.user)
+            return render(request, 'gestion/informe_espera.html', {'proyecto': proyecto, 'trabajo': trabajo}, status=202)
+        ruta = informes.obtener_o_generar(proyecto.id, html, request.build_absolute_uri(), clave)
+
+    response = FileResponse(open(ruta, 'rb'), content_type='application/pdf')
+    filename = f"Informe_PEVI_{proyecto.id}.pdf"
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['ETag'] = etag
+    return response
 
-    datos_tabla = []
 
-    for nombre_bonito, fuente, unidad in fuentes_map:
-        if fuente:
-            total_emisiones += fuente.emisiones_totales
-            total_costo += fuente.costo_total_anual
-            
-            energia_kwh = 0
-            consumo_orig = 0
-            if hasattr(fuente, 'consumo_anual_kwh'): 
-                energia_kwh = fuente.consumo_anual_kwh
-                consumo_orig = fuente.consumo_anual_orig
-            elif hasattr(fuente, 'consumo_anual'): 
-                energia_kwh = fuente.consumo_anual
-                consumo_orig = fuente.consumo_anual
-            
-            total_energia += energia_kwh
-
-            if nombre_bonito == 'Electricidad':
-                total_kwh_electrico += energia_kwh
-            else:
-                total_kwh_termico += energia_kwh
-
-            # Pre-formateo para evitar errores en template
-            datos_tabla.append({
-                'nombre': nombre_bonito,
-                'unidad': unidad,
-                'consumo': f"{consumo_orig:,.0f}",
-                'energia': f"{energia_kwh:,.0f}",
-                'emisiones': f"{fuente.emisiones_totales:,.2f}",
-                'costo': f"{fuente.costo_total_anual:,.0f}"
-            })
-
-    indicador_ides = 0
-    if proyecto.produccion_total and proyecto.produccion_total > 0 and total_energia > 0:
-        indicador_ides = total_energia / proyecto.produccion_total
+@login_required
+@solo_directivos
+def exportar_informes_centro(request):
+    """
+    Descarga en un ZIP el informe PDF de todos los proyectos de un centro (opcional: ?estado=).
+    Director de Centro: su centro. Dirección Nacional: ?centro= (obligatorio).
+    El ZIP se transmite mientras se generan los informes que no están en caché (gestion.informes.zip_informes).
+    """
+    user = request.user
+    if user.is_superuser or user.rol == 'DIRECTOR_NACIONAL':
+        centro_id = request.GET.get('centro')
+    else:
+        centro_id = user.centro_pevi_id
+    centro = get_object_or_404(CentroPevi, id=centro_id) if str(centro_id or '').isdigit() else None
+    if centro is None:
+        messages.error(request, "Seleccione un centro para exportar sus informes.")
+        return redirect('lista_proyectos')
+
+    proyectos = ProyectoAuditoria.objects.filter(centro=centro).select_related('empresa', 'centro').order_by('id')
+    estado = request.GET.get('estado')
+    if estado:
+        proyectos = proyectos.filter(estado=estado)
+    if not proyectos.exists():
+        messages.warning(request, f"{centro.nombre} no tiene proyectos para exportar.")
+        return redirect('lista_proyectos')
+
+    # iterator(): los proyectos se leen por bloques, no todos en memoria
+    contenido = informes.zip_informes(proyectos.iterator(chunk_size=100), request.build_absolute_uri('/'))
+    response = StreamingHttpResponse(contenido, content_type='application/zip')
+    filename = f"Informes_PEVI_{slugify(centro.codigo_interno)}{'_' + estado.lower() if estado else ''}.zip"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
-    context = {
-        'proyecto': proyecto,
-        'datos_tabla': datos_tabla,
-        'kpi_emisiones': f"{total_emisiones:,.2f}",
-        'kpi_energia': f"{total_energia:,.0f}",
-        'kpi_costo': f"{total_costo:,.0f}",
-        'kpi_ides': f"{indicador_ides:,.2f}",
-        'kpi_elec': f"{total_kwh_electrico:,.0f}",
-        'kpi_term': f"{total_kwh_termico:,.0f}",
-        'base_url': request.build_absolute_uri('/') 
-    }
 
-    html_string = render_to_string('gestion/informe_pdf.html', context)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    result = html.write_pdf()
+@login_required
+@acceso_staff
+@cache_control(private=True, no_store=True)
+def estado_informe(request, trabajo_id):
+    """
+    Estado de un trabajo de la cola de informes (JSON), consultado cada pocos segundos por la
+    página de espera. Liviano: no renderiza el informe ni lee la bitácora.
+    """
+    trabajo = get_object_or_404(
+        TrabajoInforme.objects.select_related('proyecto').defer('html'), id=trabajo_id
+    )
+    if not verificar_acceso_proyecto(request.user, trabajo.proyecto):
+        raise PermissionDenied("Acceso denegado.")
 
-    response = HttpResponse(result, content_type='application/pdf')
-    filename = f"Informe_PEVI_{proyecto.id}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    return response
+    datos = {'estado': trabajo.estado, 'estado_display': trabajo.get_estado_display()}
+    if trabajo.estado == TrabajoInforme.LISTO:
+        datos['url'] = reverse('generar_informe_pdf', args=[trabajo.proyecto_id])
+    elif trabajo.estado == TrabajoInforme.ERROR:
+        datos['error'] = "No se pudo generar el informe. Intente de nuevo o contacte al administrador."
+    elif trabajo.estado == TrabajoInforme.PENDIENTE:
+        # Trabajos por delante en la cola
+        datos['posicion'] = TrabajoInforme.objects.filter(
+            estado=TrabajoInforme.PENDIENTE, creado__lt=trabajo.creado
+        ).count()
+    return JsonResponse(datos)
 
 
 @login_required
@@ -1,3 +1,23 @@
 from django.contrib import admin
+from .models import RollupCentro, RollupRegion, RollupCentroAnio, BenchmarkSector
 
-# Register your models here.
+# Tablas derivadas: se mantienen solas vía metricas.signals
+@admin.register(RollupCentro)
+class RollupCentroAdmin(admin.ModelAdmin):
+    list_display = ('centro', 'proyectos_total', 'proyectos_finalizado', 'kwh_total', 'emisiones_totales', 'actualizado')
+
+@admin.register(RollupRegion)
+class RollupRegionAdmin(admin.ModelAdmin):
+    list_display = ('region', 'proyectos_total', 'proyectos_finalizado', 'kwh_total', 'emisiones_totales', 'actualizado')
+
+
+@admin.register(RollupCentroAnio)
+class RollupCentroAnioAdmin(admin.ModelAdmin):
+    list_display = ('centro', 'anio', 'proyectos_total', 'proyectos_finalizado', 'kwh_total', 'emisiones_totales', 'actualizado')
+    list_filter = ('anio',)
+
+
+@admin.register(BenchmarkSector)
+class BenchmarkSectorAdmin(admin.ModelAdmin):
+    list_display = ('sector', 'unidad', 'indicador', 'muestras', 'p25', 'p50', 'p75', 'actualizado')
+    list_filter = ('indicador',)
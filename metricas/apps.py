@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MetricasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'metricas'
+
+    def ready(self):
+        # Registro de señales para los rollups incrementales y del check de la caché
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,147 @@
+"""
+Benchmarking sectorial de IDES y costo por kWh.
+
+El cálculo es vectorizado (NumPy) sobre todo el portafolio y se guarda en
+BenchmarkSector / PosicionSectorial: las vistas y el PDF solo leen filas
+precalculadas. Recalcular: python manage.py calcular_benchmarks
+"""
+import numpy as np
+
+from .models import BenchmarkSector, PosicionSectorial
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def normalizar(texto):
+    """Clave de agrupación: sin espacios sobrantes y sin distinguir mayúsculas."""
+    return ' '.join((texto or '').split()).casefold()
+
+
+# ==========================================
+#  MOTOR VECTORIZADO
+# ==========================================
+
+def distribuciones_por_grupo(grupos, valores):
+    """
+    Posición relativa y cuantiles de 'valores' dentro de cada grupo, sin bucles por grupo.
+
+    grupos: códigos enteros (0..G-1) del grupo de cada muestra.
+    valores: indicador de cada muestra.
+
+    Devuelve (percentiles, grupos_presentes, muestras, cuantiles, medias):
+    - percentiles[i]: rango medio de la muestra i en su grupo, de 0 a 100 (los empates comparten valor).
+    - cuantiles: matriz (grupos_presentes x PERCENTILES) con interpolación lineal (= np.percentile).
+    """
+    grupos = np.asarray(grupos, dtype=np.int64)
+    valores = np.asarray(valores, dtype=np.float64)
+    n = valores.size
+    if n == 0:
+        vacio = np.empty(0)
+        return vacio, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, len(PERCENTILES))), vacio
+
+    # 1. Orden por (grupo, valor): cada grupo queda contiguo y ordenado
+    orden = np.lexsort((valores, grupos))
+    g = grupos[orden]
+    v = valores[orden]
+
+    tamanos = np.bincount(g)
+    inicio_grupo = np.searchsorted(g, g, side='left')
+
+    # 2. Corridas de valores iguales dentro del grupo (empates)
+    nueva_corrida = np.empty(n, dtype=bool)
+    nueva_corrida[0] = True
+    nueva_corrida[1:] = (g[1:] != g[:-1]) | (v[1:] != v[:-1])
+    inicio_corrida = np.flatnonzero(nueva_corrida)
+    id_corrida = np.cumsum(nueva_corrida) - 1
+    largo_corrida = np.diff(np.append(inicio_corrida, n))
+
+    # Rango medio: (menores + mitad de los iguales) / tamaño del grupo
+    menores = inicio_corrida[id_corrida] - inicio_grupo
+    rango = (menores + 0.5 * largo_corrida[id_corrida]) / tamanos[g] * 100
+
+    percentiles = np.empty(n)
+    percentiles[orden] = rango
+
+    # 3. Cuantiles por grupo con índices fraccionarios sobre el arreglo ordenado
+    presentes = np.flatnonzero(tamanos)
+    muestras = tamanos[presentes]
+    inicios = np.searchsorted(g, presentes, side='left')
+    q = np.asarray(PERCENTILES, dtype=np.float64) / 100
+    posicion = inicios[:, None] + q[None, :] * (muestras - 1)[:, None]
+    bajo = np.floor(posicion).astype(np.int64)
+    alto = np.ceil(posicion).astype(np.int64)
+    cuantiles = v[bajo] + (v[alto] - v[bajo]) * (posicion - bajo)
+
+    medias = np.bincount(g, weights=v)[presentes] / muestras
+
+    return percentiles, presentes, muestras, cuantiles, medias
+
+
+def codificar(claves):
+    """Convierte claves hashables en códigos enteros consecutivos. Devuelve (codigos, lista_de_claves)."""
+    indice = {}
+    codigos = np.fromiter((indice.setdefault(c, len(indice)) for c in claves), dtype=np.int64, count=len(claves))
+    return codigos, list(indice)
+
+
+# ==========================================
+#  LECTURA PARA VISTAS E INFORMES
+# ==========================================
+
+def _lectura(percentil):
+    """Interpretación del percentil (en ambos indicadores, menor es mejor)."""
+    if percentil <= 25:
+        return 'Cuartil más eficiente del sector'
+    if percentil <= 50:
+        return 'Mejor que la mediana del sector'
+    if percentil <= 75:
+        return 'Por encima de la mediana del sector'
+    return 'Cuartil menos eficiente del sector'
+
+
+def benchmark_proyecto(proyecto):
+    """
+    Posición del proyecto frente a sus pares del sector, lista para template.
+    Devuelve None si aún no se ha calculado (proyecto nuevo o sin datos suficientes).
+    """
+    try:
+        posicion = proyecto.posicion_sectorial
+    except PosicionSectorial.DoesNotExist:
+        return None
+
+    resumen = proyecto.get_resumen()
+    referencias = {
+        (b.indicador, b.unidad): b
+        for b in BenchmarkSector.objects.filter(sector=posicion.sector, unidad__in=['', posicion.unidad])
+    }
+
+    # (Indicador, unidad del grupo de pares, nombre visible, unidad visible, valor, percentil)
+    candidatos = [
+        ('IDES', posicion.unidad, 'IDES', f"kWh/{proyecto.unidad_produccion or 'u'}",
+         resumen.ides if resumen else None, posicion.percentil_ides),
+        ('COSTO_KWH', '', 'Costo por kWh', '$/kWh', posicion.costo_kwh, posicion.percentil_costo_kwh),
+    ]
+
+    indicadores = []
+    for indicador, unidad_grupo, nombre, unidad, valor, percentil in candidatos:
+        referencia = referencias.get((indicador, unidad_grupo))
+        if percentil is None or referencia is None:
+            continue
+        indicadores.append({
+            'nombre': nombre,
+            'unidad': unidad,
+            'valor': round(valor, 2),
+            'percentil': round(percentil),
+            'lectura': _lectura(percentil),
+            'muestras': referencia.muestras,
+            'p10': round(referencia.p10, 2),
+            'p25': round(referencia.p25, 2),
+            'mediana': round(referencia.p50, 2),
+            'p75': round(referencia.p75, 2),
+            'p90': round(referencia.p90, 2),
+            'actualizado': referencia.actualizado,
+        })
+
+    if not indicadores:
+        return None
+    return {'sector': proyecto.empresa.sector_productivo, 'indicadores': indicadores}
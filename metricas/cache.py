@@ -0,0 +1,93 @@
+"""
+Caché de métricas de los dashboards BI, segmentada por alcance y con invalidación por etiquetas.
+
+- Alcance: None = nacional, o el id de un Centro PEVI.
+- Etiquetas: 'nacional' y 'centro:<id>'. Cada una guarda una versión en la caché;
+  la clave de cada entrada incluye las versiones vigentes, así que invalidar una
+  etiqueta (cambiar su versión) deja huérfanas todas las entradas que la usaban.
+- Solo usa get/set/add/get_many: funciona igual con FileBasedCache o Redis. Las versiones deben
+  ser compartidas por todos los workers: LocMemCache (por proceso) solo en desarrollo (metricas.checks).
+
+Se cachea el diccionario de métricas (no el HTML): la página incluye datos de sesión
+del usuario (nombre, token CSRF) que no deben compartirse entre directivos.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIJO = 'metricas'
+TIMEOUT = getattr(settings, 'METRICAS_CACHE_TIMEOUT', 60 * 15)
+
+
+def _clave_etiqueta(etiqueta):
+    return f"{PREFIJO}:tag:{etiqueta}"
+
+
+def etiquetas_alcance(centro_id):
+    """Etiquetas de las que depende una entrada del alcance dado."""
+    if centro_id is None:
+        return ['nacional']
+    return [f"centro:{centro_id}"]
+
+
+def _versiones(etiquetas):
+    claves = [_clave_etiqueta(e) for e in etiquetas]
+    versiones = cache.get_many(claves)
+    for clave in claves:
+        if clave not in versiones:
+            # add() no pisa una versión escrita en paralelo por otro proceso
+            cache.add(clave, time.time_ns(), None)
+            versiones[clave] = cache.get(clave)
+    return [versiones[c] for c in claves]
+
+
+def _firma(vista, centro_id, filtros):
+    """Hash estable de vista + alcance + filtros + versiones vigentes de sus etiquetas."""
+    firma = json.dumps(
+        {
+            'vista': vista,
+            'alcance': centro_id,
+            'filtros': filtros,
+            'versiones': _versiones(etiquetas_alcance(centro_id)),
+        },
+        sort_keys=True, default=str
+    )
+    return hashlib.sha1(firma.encode()).hexdigest()
+
+
+def etag_metricas(vista, centro_id, filtros):
+    """
+    ETag de las respuestas JSON de métricas. Cambia exactamente cuando cambia
+    la entrada de caché, así que un 304 nunca sirve datos invalidados.
+    """
+    return _firma(vista, centro_id, filtros)
+
+
+def obtener_o_calcular(vista, centro_id, filtros, calcular):
+    """
+    Devuelve las métricas cacheadas de 'vista' para el alcance y filtros dados,
+    o las calcula con 'calcular()' y las guarda.
+    """
+    clave = f"{PREFIJO}:{vista}:{centro_id or 'nacional'}:{_firma(vista, centro_id, filtros)}"
+
+    metricas = cache.get(clave)
+    if metricas is None:
+        metricas = calcular()
+        cache.set(clave, metricas, TIMEOUT)
+    return metricas
+
+
+def invalidar(*centro_ids):
+    """Invalida las métricas de los centros indicados y el consolidado nacional."""
+    etiquetas = ['nacional'] + [f"centro:{pk}" for pk in set(centro_ids) if pk]
+
+    def cambiar_versiones():
+        nueva_version = time.time_ns()
+        cache.set_many({_clave_etiqueta(e): nueva_version for e in etiquetas}, None)
+
+    # Tras el COMMIT: así ninguna petición concurrente re-cachea datos previos al cambio
+    transaction.on_commit(cambiar_versiones)
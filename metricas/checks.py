@@ -0,0 +1,22 @@
+"""
+Checks de sistema de la app de métricas (python manage.py check).
+"""
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def cache_compartida(app_configs, **kwargs):
+    """
+    Las versiones de invalidación de metricas.cache viven en la caché 'default'. Con LocMemCache
+    cada worker tiene las suyas: invalidar en uno deja a los demás sirviendo datos y ETags viejos
+    hasta METRICAS_CACHE_TIMEOUT. Solo se admite en desarrollo (DEBUG).
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if settings.DEBUG or not backend.endswith('.LocMemCache'):
+        return []
+    return [Error(
+        "La caché 'default' es LocMemCache (por proceso) con DEBUG desactivado.",
+        hint="Use FileBasedCache (por defecto) o Redis con CACHE_BACKEND y CACHE_LOCATION en el .env.",
+        id='metricas.E001',
+    )]
@@ -0,0 +1,104 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auditorias.models import ResumenEnergetico
+from metricas.benchmark import PERCENTILES, codificar, distribuciones_por_grupo, normalizar
+from metricas.models import BenchmarkSector, PosicionSectorial
+
+
+class Command(BaseCommand):
+    """
+    Precalcula el benchmarking sectorial de IDES y costo por kWh para todo el portafolio.
+    Una sola lectura de ResumenEnergetico; el resto es vectorizado en NumPy.
+    Uso: python manage.py calcular_benchmarks [--minimo 3]
+    """
+    help = "Calcula percentiles, mediana y cuartiles de IDES y $/kWh por sector productivo."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minimo', type=int, default=3,
+            help="Mínimo de proyectos comparables para publicar un grupo de pares (por defecto 3)."
+        )
+        parser.add_argument('--lote', type=int, default=5000, help="Tamaño de lote para bulk_create.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+
+        # 1. Lectura única del portafolio (columnas planas, sin instanciar modelos)
+        filas = list(ResumenEnergetico.objects.values_list(
+            'proyecto_id', 'proyecto__empresa__sector_productivo', 'proyecto__unidad_produccion',
+            'kwh_total', 'costo_total', 'ides',
+        ).iterator(chunk_size=options['lote']))
+
+        if not filas:
+            self.stdout.write("No hay proyectos con resumen energético.")
+            return
+
+        ids = np.fromiter((f[0] for f in filas), dtype=np.int64, count=len(filas))
+        sectores = [normalizar(f[1]) for f in filas]
+        unidades = [normalizar(f[2]) for f in filas]
+        kwh = np.fromiter((f[3] or 0.0 for f in filas), dtype=np.float64, count=len(filas))
+        costo = np.fromiter((f[4] or 0.0 for f in filas), dtype=np.float64, count=len(filas))
+        ides = np.fromiter((f[5] or 0.0 for f in filas), dtype=np.float64, count=len(filas))
+
+        # 2. Indicadores y grupos de pares
+        costo_kwh = np.divide(costo, kwh, out=np.full_like(costo, np.nan), where=kwh > 0)
+        codigos_ides, grupos_ides = codificar(list(zip(sectores, unidades)))
+        codigos_costo, grupos_costo = codificar([(s, '') for s in sectores])
+
+        benchmarks = []
+        percentil_ides = np.full(ids.size, np.nan)
+        percentil_costo = np.full(ids.size, np.nan)
+
+        for indicador, valores, codigos, grupos, destino in [
+            ('IDES', ides, codigos_ides, grupos_ides, percentil_ides),
+            ('COSTO_KWH', costo_kwh, codigos_costo, grupos_costo, percentil_costo),
+        ]:
+            validos = np.isfinite(valores) & (valores > 0)
+            percentiles, presentes, muestras, cuantiles, medias = distribuciones_por_grupo(
+                codigos[validos], valores[validos]
+            )
+
+            # Grupos con pocos pares no se publican: su percentil no es informativo
+            publicables = np.zeros(len(grupos), dtype=bool)
+            publicables[presentes[muestras >= options['minimo']]] = True
+            en_grupo_publicable = publicables[codigos[validos]]
+            destino[np.flatnonzero(validos)[en_grupo_publicable]] = percentiles[en_grupo_publicable]
+
+            for codigo, n, fila_cuantiles, media in zip(presentes, muestras, cuantiles, medias):
+                if not publicables[codigo]:
+                    continue
+                sector, unidad = grupos[codigo]
+                benchmarks.append(BenchmarkSector(
+                    sector=sector[:100], unidad=unidad[:50], indicador=indicador,
+                    muestras=int(n), media=float(media),
+                    **{f"p{p}": float(valor) for p, valor in zip(PERCENTILES, fila_cuantiles)},
+                ))
+
+        # 3. Posiciones por proyecto (solo los que quedaron en algún grupo publicado)
+        con_posicion = np.flatnonzero(~np.isnan(percentil_ides) | ~np.isnan(percentil_costo))
+        posiciones = [
+            PosicionSectorial(
+                proyecto_id=int(ids[i]),
+                sector=sectores[i][:100],
+                unidad=unidades[i][:50],
+                costo_kwh=None if np.isnan(costo_kwh[i]) else float(costo_kwh[i]),
+                percentil_ides=None if np.isnan(percentil_ides[i]) else float(percentil_ides[i]),
+                percentil_costo_kwh=None if np.isnan(percentil_costo[i]) else float(percentil_costo[i]),
+            )
+            for i in con_posicion
+        ]
+
+        with transaction.atomic():
+            PosicionSectorial.objects.all().delete()
+            BenchmarkSector.objects.all().delete()
+            BenchmarkSector.objects.bulk_create(benchmarks, batch_size=options['lote'])
+            PosicionSectorial.objects.bulk_create(posiciones, batch_size=options['lote'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Benchmarks calculados: {len(benchmarks)} grupos, {len(posiciones)} de {len(filas)} proyectos "
+            f"posicionados ({time.perf_counter() - inicio:.2f} s)"
+        ))
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from auditorias.models import ProyectoAuditoria, ResumenEnergetico
+from gestion.models import CentroPevi
+from metricas.models import RollupBase, RollupCentro, RollupRegion, RollupCentroAnio
+
+
+class Command(BaseCommand):
+    """
+    Recalcula desde cero los rollups por centro, por región y por centro-año.
+    Solo es necesario tras cargas masivas que no disparan señales (bulk_create/update).
+    Uso: python manage.py reconstruir_rollups
+    """
+    help = "Reconstruye RollupCentro, RollupRegion y RollupCentroAnio con consultas agrupadas."
+
+    def handle(self, *args, **options):
+        centros = {}
+        centros_anio = {}
+
+        def acumulado(grupos, clave):
+            return grupos.setdefault(clave, dict.fromkeys(RollupBase.CAMPOS_ACUMULADOS, 0))
+
+        # 1. Conteos por estado (una consulta agrupada por centro y año)
+        conteos = ProyectoAuditoria.objects.order_by().values('centro_id', 'anio', 'estado').annotate(n=Count('pk'))
+        for fila in conteos:
+            for totales in self._destinos(acumulado, centros, centros_anio, fila['centro_id'], fila['anio']):
+                totales['proyectos_total'] += fila['n']
+                totales[RollupBase.campo_estado(fila['estado'])] += fila['n']
+
+        # 2. Energía, costo y huella desde los resúmenes materializados
+        energia = ResumenEnergetico.objects.order_by().values('proyecto__centro', 'proyecto__anio').annotate(
+            kwh=Sum('kwh_total'), costo=Sum('costo_total'), emisiones=Sum('emisiones_totales')
+        )
+        for fila in energia:
+            for totales in self._destinos(acumulado, centros, centros_anio, fila['proyecto__centro'], fila['proyecto__anio']):
+                totales['kwh_total'] += fila['kwh'] or 0.0
+                totales['costo_total'] += fila['costo'] or 0.0
+                totales['emisiones_totales'] += fila['emisiones'] or 0.0
+
+        # 3. Regiones: se consolidan en Python a partir de los centros (pocas filas)
+        regiones = {}
+        region_por_centro = dict(CentroPevi.objects.values_list('pk', 'region'))
+        for centro_id, totales in centros.items():
+            region = regiones.setdefault(region_por_centro[centro_id], dict.fromkeys(RollupBase.CAMPOS_ACUMULADOS, 0))
+            for campo, valor in totales.items():
+                region[campo] += valor
+
+        with transaction.atomic():
+            RollupCentro.objects.all().delete()
+            RollupRegion.objects.all().delete()
+            RollupCentroAnio.objects.all().delete()
+            RollupCentro.objects.bulk_create(
+                [RollupCentro(centro_id=centro_id, **totales) for centro_id, totales in centros.items()]
+            )
+            RollupRegion.objects.bulk_create(
+                [RollupRegion(region=region, **totales) for region, totales in regiones.items()]
+            )
+            RollupCentroAnio.objects.bulk_create(
+                [RollupCentroAnio(centro_id=centro_id, anio=anio, **totales)
+                 for (centro_id, anio), totales in centros_anio.items()]
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rollups reconstruidos: {len(centros)} centros, {len(regiones)} regiones, "
+            f"{len(centros_anio)} centro-año"
+        ))
+
+    @staticmethod
+    def _destinos(acumulado, centros, centros_anio, centro_id, anio):
+        """Acumuladores a los que suma una fila agrupada: su centro y, si tiene año, su centro-año."""
+        destinos = [acumulado(centros, centro_id)]
+        if anio:
+            destinos.append(acumulado(centros_anio, (centro_id, anio)))
+        return destinos
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+CAMPOS_ACUMULADOS = (
+    'proyectos_total', 'proyectos_borrador', 'proyectos_ejecucion', 'proyectos_revision',
+    'proyectos_finalizado', 'kwh_total', 'costo_total', 'emisiones_totales',
+)
+
+
+def poblar_rollups(apps, schema_editor):
+    """Siembra los rollups con los proyectos existentes."""
+    ProyectoAuditoria = apps.get_model('auditorias', 'ProyectoAuditoria')
+    ResumenEnergetico = apps.get_model('auditorias', 'ResumenEnergetico')
+    CentroPevi = apps.get_model('gestion', 'CentroPevi')
+    RollupCentro = apps.get_model('metricas', 'RollupCentro')
+    RollupRegion = apps.get_model('metricas', 'RollupRegion')
+
+    centros = {}
+    for fila in ProyectoAuditoria.objects.order_by().values('centro_id', 'estado').annotate(n=Count('pk')):
+        totales = centros.setdefault(fila['centro_id'], dict.fromkeys(CAMPOS_ACUMULADOS, 0))
+        totales['proyectos_total'] += fila['n']
+        totales[f"proyectos_{fila['estado'].lower()}"] += fila['n']
+
+    energia = ResumenEnergetico.objects.order_by().values('proyecto__centro').annotate(
+        kwh=Sum('kwh_total'), costo=Sum('costo_total'), emisiones=Sum('emisiones_totales')
+    )
+    for fila in energia:
+        totales = centros.setdefault(fila['proyecto__centro'], dict.fromkeys(CAMPOS_ACUMULADOS, 0))
+        totales['kwh_total'] += fila['kwh'] or 0.0
+        totales['costo_total'] += fila['costo'] or 0.0
+        totales['emisiones_totales'] += fila['emisiones'] or 0.0
+
+    regiones = {}
+    region_por_centro = dict(CentroPevi.objects.values_list('pk', 'region'))
+    for centro_id, totales in centros.items():
+        region = regiones.setdefault(region_por_centro[centro_id], dict.fromkeys(CAMPOS_ACUMULADOS, 0))
+        for campo, valor in totales.items():
+            region[campo] += valor
+
+    RollupCentro.objects.bulk_create([RollupCentro(centro_id=pk, **t) for pk, t in centros.items()])
+    RollupRegion.objects.bulk_create([RollupRegion(region=r, **t) for r, t in regiones.items()])
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auditorias', '0004_resumenenergetico'),
+        ('gestion', '0002_alter_usuario_cargo_alter_usuario_centro_pevi_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCentro',
+            fields=[
+                ('proyectos_total', models.IntegerField(default=0)),
+                ('proyectos_borrador', models.IntegerField(default=0)),
+                ('proyectos_ejecucion', models.IntegerField(default=0)),
+                ('proyectos_revision', models.IntegerField(default=0)),
+                ('proyectos_finalizado', models.IntegerField(default=0)),
+                ('kwh_total', models.FloatField(default=0, verbose_name='Energía Total (kWh/año)')),
+                ('costo_total', models.FloatField(default=0, verbose_name='Costo Total Anual (COP)')),
+                ('emisiones_totales', models.FloatField(default=0, verbose_name='Emisiones Totales (TonCO2/año)')),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('centro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rollup', serialize=False, to='gestion.centropevi')),
+            ],
+            options={
+                'verbose_name': 'Rollup por Centro',
+                'verbose_name_plural': 'Rollups por Centro',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupRegion',
+            fields=[
+                ('proyectos_total', models.IntegerField(default=0)),
+                ('proyectos_borrador', models.IntegerField(default=0)),
+                ('proyectos_ejecucion', models.IntegerField(default=0)),
+                ('proyectos_revision', models.IntegerField(default=0)),
+                ('proyectos_finalizado', models.IntegerField(default=0)),
+                ('kwh_total', models.FloatField(default=0, verbose_name='Energía Total (kWh/año)')),
+                ('costo_total', models.FloatField(default=0, verbose_name='Costo Total Anual (COP)')),
+                ('emisiones_totales', models.FloatField(default=0, verbose_name='Emisiones Totales (TonCO2/año)')),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('region', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Región')),
+            ],
+            options={
+                'verbose_name': 'Rollup por Región',
+                'verbose_name_plural': 'Rollups por Región',
+            },
+        ),
+        migrations.RunPython(poblar_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+CAMPOS_ACUMULADOS = (
+    'proyectos_total', 'proyectos_borrador', 'proyectos_ejecucion', 'proyectos_revision',
+    'proyectos_finalizado', 'kwh_total', 'costo_total', 'emisiones_totales',
+)
+
+
+def poblar_rollups_anuales(apps, schema_editor):
+    """Siembra los rollups centro-año con los proyectos existentes."""
+    ProyectoAuditoria = apps.get_model('auditorias', 'ProyectoAuditoria')
+    ResumenEnergetico = apps.get_model('auditorias', 'ResumenEnergetico')
+    RollupCentroAnio = apps.get_model('metricas', 'RollupCentroAnio')
+
+    grupos = {}
+    conteos = ProyectoAuditoria.objects.filter(anio__isnull=False).order_by().values(
+        'centro_id', 'anio', 'estado'
+    ).annotate(n=Count('pk'))
+    for fila in conteos:
+        totales = grupos.setdefault((fila['centro_id'], fila['anio']), dict.fromkeys(CAMPOS_ACUMULADOS, 0))
+        totales['proyectos_total'] += fila['n']
+        totales[f"proyectos_{fila['estado'].lower()}"] += fila['n']
+
+    energia = ResumenEnergetico.objects.filter(proyecto__anio__isnull=False).order_by().values(
+        'proyecto__centro', 'proyecto__anio'
+    ).annotate(kwh=Sum('kwh_total'), costo=Sum('costo_total'), emisiones=Sum('emisiones_totales'))
+    for fila in energia:
+        clave = (fila['proyecto__centro'], fila['proyecto__anio'])
+        totales = grupos.setdefault(clave, dict.fromkeys(CAMPOS_ACUMULADOS, 0))
+        totales['kwh_total'] += fila['kwh'] or 0.0
+        totales['costo_total'] += fila['costo'] or 0.0
+        totales['emisiones_totales'] += fila['emisiones'] or 0.0
+
+    RollupCentroAnio.objects.bulk_create([
+        RollupCentroAnio(centro_id=centro_id, anio=anio, **t) for (centro_id, anio), t in grupos.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0002_alter_usuario_cargo_alter_usuario_centro_pevi_and_more'),
+        ('metricas', '0001_initial'),
+        ('auditorias', '0005_proyecto_anio_fase'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCentroAnio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('proyectos_total', models.IntegerField(default=0)),
+                ('proyectos_borrador', models.IntegerField(default=0)),
+                ('proyectos_ejecucion', models.IntegerField(default=0)),
+                ('proyectos_revision', models.IntegerField(default=0)),
+                ('proyectos_finalizado', models.IntegerField(default=0)),
+                ('kwh_total', models.FloatField(default=0, verbose_name='Energía Total (kWh/año)')),
+                ('costo_total', models.FloatField(default=0, verbose_name='Costo Total Anual (COP)')),
+                ('emisiones_totales', models.FloatField(default=0, verbose_name='Emisiones Totales (TonCO2/año)')),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('anio', models.PositiveSmallIntegerField(verbose_name='Año')),
+                ('centro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups_anuales', to='gestion.centropevi')),
+            ],
+            options={
+                'verbose_name': 'Rollup por Centro y Año',
+                'verbose_name_plural': 'Rollups por Centro y Año',
+                'indexes': [models.Index(fields=['anio'], name='rollup_anio_idx')],
+                'constraints': [models.UniqueConstraint(fields=('centro', 'anio'), name='rollup_centro_anio_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_rollups_anuales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditorias', '0005_proyecto_anio_fase'),
+        ('metricas', '0002_rollupcentroanio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PosicionSectorial',
+            fields=[
+                ('proyecto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='posicion_sectorial', serialize=False, to='auditorias.proyectoauditoria')),
+                ('sector', models.CharField(max_length=100)),
+                ('unidad', models.CharField(blank=True, default='', max_length=50)),
+                ('costo_kwh', models.FloatField(blank=True, null=True, verbose_name='Costo Equivalente ($/kWh)')),
+                ('percentil_ides', models.FloatField(blank=True, null=True)),
+                ('percentil_costo_kwh', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Posición Sectorial',
+                'verbose_name_plural': 'Posiciones Sectoriales',
+            },
+        ),
+        migrations.CreateModel(
+            name='BenchmarkSector',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sector', models.CharField(max_length=100, verbose_name='Sector (normalizado)')),
+                ('unidad', models.CharField(blank=True, default='', max_length=50, verbose_name='Unidad de Producción (normalizada)')),
+                ('indicador', models.CharField(choices=[('IDES', 'IDES (kWh/Unidad)'), ('COSTO_KWH', 'Costo Equivalente ($/kWh)')], max_length=20)),
+                ('muestras', models.PositiveIntegerField(default=0)),
+                ('media', models.FloatField(default=0)),
+                ('p10', models.FloatField(default=0)),
+                ('p25', models.FloatField(default=0, verbose_name='Cuartil 1')),
+                ('p50', models.FloatField(default=0, verbose_name='Mediana')),
+                ('p75', models.FloatField(default=0, verbose_name='Cuartil 3')),
+                ('p90', models.FloatField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Benchmark Sectorial',
+                'verbose_name_plural': 'Benchmarks Sectoriales',
+                'constraints': [models.UniqueConstraint(fields=('sector', 'unidad', 'indicador'), name='benchmark_sector_unico')],
+            },
+        ),
+    ]
@@ -1,3 +1,137 @@
 from django.db import models
+from gestion.models import CentroPevi
+from auditorias.models import ProyectoAuditoria
 
-# Create your models here.
+# ==========================================
+#  ROLLUPS INCREMENTALES (RANKING NACIONAL)
+# ==========================================
+
+class RollupBase(models.Model):
+    """
+    Acumulados de un grupo de proyectos (conteo por estado, energía, costo y huella).
+    No se recalculan desde cero: metricas.signals aplica el delta de cada cambio.
+    Reconstrucción completa: python manage.py reconstruir_rollups
+    """
+    CAMPOS_ACUMULADOS = (
+        'proyectos_total', 'proyectos_borrador', 'proyectos_ejecucion', 'proyectos_revision',
+        'proyectos_finalizado', 'kwh_total', 'costo_total', 'emisiones_totales',
+    )
+
+    proyectos_total = models.IntegerField(default=0)
+    proyectos_borrador = models.IntegerField(default=0)
+    proyectos_ejecucion = models.IntegerField(default=0)
+    proyectos_revision = models.IntegerField(default=0)
+    proyectos_finalizado = models.IntegerField(default=0)
+
+    kwh_total = models.FloatField(default=0, verbose_name="Energía Total (kWh/año)")
+    costo_total = models.FloatField(default=0, verbose_name="Costo Total Anual (COP)")
+    emisiones_totales = models.FloatField(default=0, verbose_name="Emisiones Totales (TonCO2/año)")
+
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @staticmethod
+    def campo_estado(estado):
+        """Nombre del contador para un estado de ProyectoAuditoria (Ej: 'EJECUCION' -> 'proyectos_ejecucion')."""
+        return f"proyectos_{estado.lower()}"
+
+class RollupCentro(RollupBase):
+    centro = models.OneToOneField(CentroPevi, on_delete=models.CASCADE, primary_key=True, related_name="rollup")
+
+    class Meta:
+        verbose_name = "Rollup por Centro"
+        verbose_name_plural = "Rollups por Centro"
+
+    def __str__(self):
+        return f"Rollup {self.centro}"
+
+class RollupRegion(RollupBase):
+    region = models.CharField(max_length=100, primary_key=True, verbose_name="Región")
+
+    class Meta:
+        verbose_name = "Rollup por Región"
+        verbose_name_plural = "Rollups por Región"
+
+    def __str__(self):
+        return f"Rollup {self.region}"
+
+class RollupCentroAnio(RollupBase):
+    """Acumulados por centro y año de auditoría: base de los filtros por año y de las series interanuales."""
+    centro = models.ForeignKey(CentroPevi, on_delete=models.CASCADE, related_name="rollups_anuales")
+    anio = models.PositiveSmallIntegerField(verbose_name="Año")
+
+    class Meta:
+        verbose_name = "Rollup por Centro y Año"
+        verbose_name_plural = "Rollups por Centro y Año"
+        constraints = [
+            models.UniqueConstraint(fields=['centro', 'anio'], name='rollup_centro_anio_unico'),
+        ]
+        indexes = [
+            # Series nacionales agrupadas por año
+            models.Index(fields=['anio'], name='rollup_anio_idx'),
+        ]
+
+    def __str__(self):
+        return f"Rollup {self.centro} {self.anio}"
+
+
+# ==========================================
+#  BENCHMARKING SECTORIAL (PRECALCULADO)
+# ==========================================
+
+class BenchmarkSector(models.Model):
+    """
+    Distribución de un indicador entre los proyectos de un mismo sector productivo.
+    El IDES solo es comparable con la misma unidad de producción, así que se agrupa
+    por (sector, unidad); el costo por kWh se agrupa solo por sector (unidad vacía).
+    Se recalcula con: python manage.py calcular_benchmarks
+    """
+    INDICADORES = [
+        ('IDES', 'IDES (kWh/Unidad)'),
+        ('COSTO_KWH', 'Costo Equivalente ($/kWh)'),
+    ]
+
+    sector = models.CharField(max_length=100, verbose_name="Sector (normalizado)")
+    unidad = models.CharField(max_length=50, blank=True, default='', verbose_name="Unidad de Producción (normalizada)")
+    indicador = models.CharField(max_length=20, choices=INDICADORES)
+
+    muestras = models.PositiveIntegerField(default=0)
+    media = models.FloatField(default=0)
+    p10 = models.FloatField(default=0)
+    p25 = models.FloatField(default=0, verbose_name="Cuartil 1")
+    p50 = models.FloatField(default=0, verbose_name="Mediana")
+    p75 = models.FloatField(default=0, verbose_name="Cuartil 3")
+    p90 = models.FloatField(default=0)
+
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Benchmark Sectorial"
+        verbose_name_plural = "Benchmarks Sectoriales"
+        constraints = [
+            models.UniqueConstraint(fields=['sector', 'unidad', 'indicador'], name='benchmark_sector_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_indicador_display()} - {self.sector} {self.unidad}".strip()
+
+class PosicionSectorial(models.Model):
+    """Percentil de cada proyecto dentro de su grupo de pares (0 = el más eficiente)."""
+    proyecto = models.OneToOneField(
+        ProyectoAuditoria, on_delete=models.CASCADE, primary_key=True, related_name="posicion_sectorial"
+    )
+    sector = models.CharField(max_length=100)
+    unidad = models.CharField(max_length=50, blank=True, default='')
+
+    costo_kwh = models.FloatField(null=True, blank=True, verbose_name="Costo Equivalente ($/kWh)")
+    percentil_ides = models.FloatField(null=True, blank=True)
+    percentil_costo_kwh = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Posición Sectorial"
+        verbose_name_plural = "Posiciones Sectoriales"
+
+    def __str__(self):
+        return f"Posición {self.proyecto_id}"
@@ -0,0 +1,194 @@
+"""
+Señales de la app de métricas:
+1. Mantenimiento incremental de RollupCentro / RollupRegion / RollupCentroAnio.
+   Cada cambio en un proyecto o en su resumen energético se traduce en un delta
+   (F() + valor) sobre la fila de su centro, de su región y de su centro-año,
+   sin recorrer proyectos.
+2. Invalidación por etiquetas de la caché de dashboards (metricas.cache).
+"""
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from auditorias.models import ProyectoAuditoria, ResumenEnergetico
+from auditorias.energia import FUENTES
+from gestion.models import CentroPevi, Usuario
+from . import cache as cache_metricas
+from .models import RollupBase, RollupCentro, RollupRegion, RollupCentroAnio
+
+CAMPOS_ENERGIA = ('kwh_total', 'costo_total', 'emisiones_totales')
+
+
+def _sumar(modelo, deltas, **clave):
+    modelo.objects.get_or_create(**clave)
+    modelo.objects.filter(**clave).update(**{campo: F(campo) + valor for campo, valor in deltas.items()})
+
+
+def _delta_centro(centro_id, deltas):
+    _sumar(RollupCentro, deltas, centro_id=centro_id)
+    region = CentroPevi.objects.filter(pk=centro_id).values_list('region', flat=True).first()
+    if region is not None:
+        _sumar(RollupRegion, deltas, region=region)
+
+
+def _delta_anual(centro_id, anio, deltas):
+    if anio:
+        _sumar(RollupCentroAnio, deltas, centro_id=centro_id, anio=anio)
+
+
+def _sin_ceros(deltas):
+    return {campo: valor for campo, valor in deltas.items() if valor}
+
+
+def aplicar_delta(centro_id, anio=None, **deltas):
+    """Suma 'deltas' a los rollups del centro, de su región y de su año (creándolos si no existen)."""
+    deltas = _sin_ceros(deltas)
+    if not centro_id or not deltas:
+        return
+
+    _delta_centro(centro_id, deltas)
+    _delta_anual(centro_id, anio, deltas)
+
+
+def _valores_energia(proyecto_id):
+    fila = ResumenEnergetico.objects.filter(proyecto_id=proyecto_id).values(*CAMPOS_ENERGIA).first()
+    return fila or dict.fromkeys(CAMPOS_ENERGIA, 0.0)
+
+
+def _contadores(estado, signo):
+    return {'proyectos_total': signo, RollupBase.campo_estado(estado): signo}
+
+
+# --- PROYECTOS: conteos por estado y traslados entre centros o años ---
+
+@receiver(pre_save, sender=ProyectoAuditoria)
+def guardar_estado_anterior(sender, instance, raw=False, **kwargs):
+    instance._rollup_anterior = None
+    if instance.pk and not raw:
+        instance._rollup_anterior = (
+            ProyectoAuditoria.objects.filter(pk=instance.pk).values('centro_id', 'estado', 'anio').first()
+        )
+
+@receiver(post_save, sender=ProyectoAuditoria)
+def actualizar_rollup_proyecto(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, '_rollup_anterior', None)
+
+    if created or anterior is None:
+        aplicar_delta(instance.centro_id, instance.anio, **_contadores(instance.estado, 1))
+        return
+
+    cambio_estado = {
+        RollupBase.campo_estado(anterior['estado']): -1,
+        RollupBase.campo_estado(instance.estado): 1,
+    } if anterior['estado'] != instance.estado else {}
+
+    if anterior['centro_id'] != instance.centro_id or anterior['anio'] != instance.anio:
+        # Traslado: el proyecto (conteo + energía) sale del grupo anterior y entra al nuevo.
+        # El resumen aún tiene los valores previos; su propio delta se aplica después.
+        energia = _valores_energia(instance.pk)
+        salida = _sin_ceros({
+            **_contadores(anterior['estado'], -1),
+            **{campo: -valor for campo, valor in energia.items()}
+        })
+        entrada = _sin_ceros({**_contadores(instance.estado, 1), **energia})
+
+        if anterior['centro_id'] != instance.centro_id:
+            aplicar_delta(anterior['centro_id'], anterior['anio'], **salida)
+            aplicar_delta(instance.centro_id, instance.anio, **entrada)
+        else:
+            # Mismo centro, otro año: centro y región solo ven el posible cambio de estado
+            _delta_anual(instance.centro_id, anterior['anio'], salida)
+            _delta_anual(instance.centro_id, instance.anio, entrada)
+            if cambio_estado:
+                _delta_centro(instance.centro_id, cambio_estado)
+    elif cambio_estado:
+        aplicar_delta(instance.centro_id, instance.anio, **cambio_estado)
+
+@receiver(pre_delete, sender=ProyectoAuditoria)
+def guardar_energia_eliminada(sender, instance, **kwargs):
+    # El resumen se elimina en cascada antes que el proyecto: se leen sus valores aquí
+    instance._rollup_energia = _valores_energia(instance.pk)
+
+@receiver(post_delete, sender=ProyectoAuditoria)
+def descontar_proyecto_eliminado(sender, instance, **kwargs):
+    energia = getattr(instance, '_rollup_energia', dict.fromkeys(CAMPOS_ENERGIA, 0.0))
+    aplicar_delta(
+        instance.centro_id,
+        instance.anio,
+        **_contadores(instance.estado, -1),
+        **{campo: -valor for campo, valor in energia.items()}
+    )
+
+
+# --- RESUMEN ENERGÉTICO: delta de energía, costo y huella ---
+
+@receiver(pre_save, sender=ResumenEnergetico)
+def guardar_resumen_anterior(sender, instance, raw=False, **kwargs):
+    instance._rollup_anterior = None if raw else _valores_energia(instance.proyecto_id)
+
+@receiver(post_save, sender=ResumenEnergetico)
+def actualizar_rollup_energia(sender, instance, raw=False, **kwargs):
+    anterior = getattr(instance, '_rollup_anterior', None)
+    if raw or anterior is None:
+        return
+    centro_id, anio = (
+        ProyectoAuditoria.objects.filter(pk=instance.proyecto_id).values_list('centro_id', 'anio').first()
+        or (None, None)
+    )
+    aplicar_delta(centro_id, anio, **{
+        campo: getattr(instance, campo) - anterior[campo] for campo in CAMPOS_ENERGIA
+    })
+
+
+# --- CENTROS: cambio de región ---
+
+@receiver(pre_save, sender=CentroPevi)
+def guardar_region_anterior(sender, instance, raw=False, **kwargs):
+    instance._rollup_region = None
+    if instance.pk and not raw:
+        instance._rollup_region = CentroPevi.objects.filter(pk=instance.pk).values_list('region', flat=True).first()
+
+@receiver(post_save, sender=CentroPevi)
+def trasladar_region(sender, instance, raw=False, **kwargs):
+    region_anterior = getattr(instance, '_rollup_region', None)
+    if raw or region_anterior is None or region_anterior == instance.region:
+        return
+    rollup = RollupCentro.objects.filter(centro=instance).values(*RollupBase.CAMPOS_ACUMULADOS).first()
+    if rollup:
+        _sumar(RollupRegion, {campo: -valor for campo, valor in rollup.items() if valor}, region=region_anterior)
+        _sumar(RollupRegion, {campo: valor for campo, valor in rollup.items() if valor}, region=instance.region)
+
+
+# ==========================================
+#  INVALIDACIÓN DE LA CACHÉ DE DASHBOARDS
+# ==========================================
+
+@receiver(post_save, sender=ProyectoAuditoria)
+@receiver(post_delete, sender=ProyectoAuditoria)
+def invalidar_por_proyecto(sender, instance, **kwargs):
+    anterior = getattr(instance, '_rollup_anterior', None) or {}
+    cache_metricas.invalidar(instance.centro_id, anterior.get('centro_id'))
+
+def invalidar_por_fuente(sender, instance, **kwargs):
+    centro_id = ProyectoAuditoria.objects.filter(pk=instance.proyecto_id).values_list('centro_id', flat=True).first()
+    cache_metricas.invalidar(centro_id)
+
+for _fuente in FUENTES:
+    post_save.connect(invalidar_por_fuente, sender=_fuente.modelo, dispatch_uid=f"metricas_cache_{_fuente.modelo.__name__}_save")
+    post_delete.connect(invalidar_por_fuente, sender=_fuente.modelo, dispatch_uid=f"metricas_cache_{_fuente.modelo.__name__}_delete")
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_por_usuario(sender, instance, update_fields=None, **kwargs):
+    # El login solo toca 'last_login': no afecta a ningún dashboard
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    # Nombres de líderes y listas de filtros dependen de los usuarios del centro
+    cache_metricas.invalidar(instance.centro_pevi_id)
+
+@receiver(post_save, sender=CentroPevi)
+@receiver(post_delete, sender=CentroPevi)
+def invalidar_por_centro(sender, instance, **kwargs):
+    cache_metricas.invalidar(instance.pk)
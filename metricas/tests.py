@@ -1,3 +1,272 @@
-from django.test import TestCase
+from datetime import date
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from auditorias.models import Electricidad, Empresa, GasNatural, ProyectoAuditoria, ResumenEnergetico
+from gestion.models import CentroPevi, Usuario
+from . import cache as cache_metricas
+from .benchmark import benchmark_proyecto
+from .checks import cache_compartida
+from .models import BenchmarkSector, PosicionSectorial, RollupBase, RollupCentro, RollupCentroAnio, RollupRegion
+
+
+def crear_empresa(nombre='Empresa Pruebas', **campos):
+    datos = {
+        'razon_social': nombre, 'nit': nombre.upper().replace(' ', '-'), 'sector_productivo': 'Alimentos',
+        'direccion': '-', 'ciudad': 'Bucaramanga', 'contacto_nombre': '-', 'contacto_email': 'pruebas@pevi.co',
+        'contacto_telefono': '-',
+    }
+    datos.update(campos)
+    return Empresa.objects.create(**datos)
+
+
+def crear_proyecto(centro, empresa, anio=2024, **campos):
+    datos = {
+        'centro': centro, 'empresa': empresa, 'nombre_proyecto': f'Auditoría {anio}',
+        'fecha_inicio': date(anio, 1, 1), 'anio': anio, 'produccion_total': 1000, 'unidad_produccion': 'Ton',
+    }
+    datos.update(campos)
+    return ProyectoAuditoria.objects.create(**datos)
+
+
+def crear_electricidad(proyecto, kwh_anual=120000, factor_emision=0.2):
+    registro = Electricidad(
+        proyecto=proyecto, consumo_mensual=kwh_anual / 12, consumo_anual=kwh_anual, costo_unitario=500,
+        costo_mensual_promedio=500 * kwh_anual / 12, costo_total_anual=500 * kwh_anual,
+        factor_emision=factor_emision, emisiones_totales=0,
+    )
+    registro.save()
+    return registro
+
+
+def crear_gas(proyecto, m3_anual=12000, poder_calorifico=37000, factor_emision=0.2):
+    registro = GasNatural(
+        proyecto=proyecto, consumo_mensual_orig=m3_anual / 12, consumo_anual_orig=m3_anual,
+        poder_calorifico=poder_calorifico, costo_unitario=1000, costo_mensual_promedio=1000 * m3_anual / 12,
+        costo_total_anual=1000 * m3_anual, factor_emision=factor_emision, emisiones_totales=0,
+        consumo_mensual_kwh=0, consumo_anual_kwh=0, costo_kwh_equivalente=0,
+    )
+    registro.save()
+    return registro
+
+
+def rollups():
+    """
+    Contenido de los tres rollups sin las filas en cero (la reconstrucción no las crea) y
+    redondeado (los deltas en coma flotante acumulan error de redondeo).
+    """
+    def filas(modelo, clave):
+        return {
+            tuple(fila.pop(c) for c in clave): {campo: round(valor, 4) for campo, valor in fila.items()}
+            for fila in modelo.objects.values(*clave, *RollupBase.CAMPOS_ACUMULADOS)
+            if any(fila[campo] for campo in RollupBase.CAMPOS_ACUMULADOS)
+        }
+
+    return {
+        'centro': filas(RollupCentro, ['centro_id']),
+        'region': filas(RollupRegion, ['region']),
+        'centro_anio': filas(RollupCentroAnio, ['centro_id', 'anio']),
+    }
+
+
+class RollupsIncrementalesTests(TestCase):
+    """Los deltas de metricas.signals dejan los rollups igual que reconstruir_rollups desde cero."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.norte = CentroPevi.objects.create(nombre='Centro Norte', codigo_interno='T-NORTE', region='Caribe')
+        cls.sur = CentroPevi.objects.create(nombre='Centro Sur', codigo_interno='T-SUR', region='Andina')
+        empresa = crear_empresa()
+        cls.proyecto = crear_proyecto(cls.norte, empresa, 2023, estado='EJECUCION')
+        cls.electricidad = crear_electricidad(cls.proyecto)
+        cls.gas = crear_gas(cls.proyecto)
+        cls.otro = crear_proyecto(cls.norte, empresa, 2024, estado='FINALIZADO')
+        crear_electricidad(cls.otro, kwh_anual=50000)
+        crear_proyecto(cls.sur, empresa, 2024)
+
+    def assertRollupsReconstruidos(self):
+        incrementales = rollups()
+        call_command('reconstruir_rollups', stdout=StringIO())
+        self.assertEqual(incrementales, rollups())
+
+    def test_alta_de_proyectos_y_registros(self):
+        self.assertEqual(RollupCentro.objects.get(centro=self.norte).proyectos_total, 2)
+        self.assertRollupsReconstruidos()
+
+    def test_edicion_de_registro_de_combustible(self):
+        self.gas.consumo_anual_orig = 30000
+        self.gas.save()
+        self.electricidad.factor_emision = 0.5
+        self.electricidad.save()
+        self.assertRollupsReconstruidos()
+
+    def test_cambio_de_estado(self):
+        self.proyecto.estado = 'REVISION'
+        self.proyecto.save()
+        self.assertRollupsReconstruidos()
+
+    def test_traslado_entre_centros(self):
+        self.proyecto.centro = self.sur
+        self.proyecto.estado = 'FINALIZADO'
+        self.proyecto.save()
+        self.assertRollupsReconstruidos()
+
+    def test_cambio_de_anio(self):
+        self.proyecto.anio = 2024
+        self.proyecto.save()
+        self.assertRollupsReconstruidos()
+
+    def test_cambio_de_region_del_centro(self):
+        self.norte.region = 'Andina'
+        self.norte.save()
+        self.assertRollupsReconstruidos()
+
+    def test_eliminacion_de_registros(self):
+        self.gas.delete()
+        Electricidad.objects.filter(proyecto=self.otro).delete()
+        self.assertRollupsReconstruidos()
+
+    def test_eliminacion_de_proyecto(self):
+        self.proyecto.delete()
+        self.assertRollupsReconstruidos()
+        self.assertEqual(RollupCentro.objects.get(centro=self.norte).proyectos_total, 1)
+
+
+class InvalidacionCacheTests(TestCase):
+    """Guardar un registro de energía cambia las versiones de la caché y, con ellas, el ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.centro = CentroPevi.objects.create(nombre='Centro Caché', codigo_interno='T-CACHE', region='Caribe')
+        cls.gas = crear_gas(crear_proyecto(cls.centro, crear_empresa()))
+        cls.nacional = Usuario.objects.create_user('nacional', password='-', rol='DIRECTOR_NACIONAL')
+
+    def guardar_gas(self):
+        # invalidar() cambia las versiones tras el COMMIT
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gas.consumo_anual_orig *= 2
+            self.gas.save()
+
+    def test_guardar_combustible_cambia_las_versiones(self):
+        etiquetas = cache_metricas.etiquetas_alcance(None) + cache_metricas.etiquetas_alcance(self.centro.pk)
+        antes = cache_metricas._versiones(etiquetas)
+        self.guardar_gas()
+        despues = cache_metricas._versiones(etiquetas)
+        for etiqueta, anterior, nueva in zip(etiquetas, antes, despues):
+            with self.subTest(etiqueta=etiqueta):
+                self.assertNotEqual(anterior, nueva)
+
+    def test_etag_anterior_al_cambio_recibe_200(self):
+        self.client.force_login(self.nacional)
+        url = reverse('api_estrategico')
+        primera = self.client.get(url)
+        etag = primera['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.guardar_gas()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertGreater(respuesta.json()['kpis']['kpi_energia'], primera.json()['kpis']['kpi_energia'])
+
+
+class CacheCompartidaCheckTests(SimpleTestCase):
+    LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    @override_settings(DEBUG=False, CACHES=LOCMEM)
+    def test_locmem_sin_debug_es_un_error(self):
+        self.assertEqual([error.id for error in cache_compartida(None)], ['metricas.E001'])
+
+    @override_settings(DEBUG=True, CACHES=LOCMEM)
+    def test_locmem_con_debug_se_admite(self):
+        self.assertEqual(cache_compartida(None), [])
+
+    def test_cache_por_defecto_compartida(self):
+        self.assertEqual(cache_compartida(None), [])
+
+
+class CalcularBenchmarksTests(TestCase):
+    """
+    calcular_benchmarks frente a percentiles calculados a mano (interpolación lineal, como
+    np.percentile) y posiciones por rango medio, sobre resúmenes fijados directamente.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        centro = CentroPevi.objects.create(nombre='Centro Benchmark', codigo_interno='T-BENCH', region='Caribe')
+        alimentos = crear_empresa('Alimentos SA', sector_productivo='Alimentos')
+        # Mismo sector escrito distinto: se agrupa igual
+        alimentos_bis = crear_empresa('Alimentos Bis', sector_productivo='  ALIMENTOS ')
+        textil = crear_empresa('Textil SA', sector_productivo='Textil')
+
+        # (empresa, unidad, IDES, $/kWh); kWh = 10 en todos salvo el último (sin energía)
+        fixture = {
+            'a': (alimentos, 'Ton', 10, 100),
+            'b': (alimentos, 'Ton', 20, 200),
+            'c': (alimentos_bis, 'TON', 20, 300),
+            'd': (alimentos, 'Ton', 40, 400),
+            'e': (alimentos, 'Kg', 5, 500),
+            't1': (textil, 'Ton', 10, 100),
+            't2': (textil, 'Ton', 30, 300),
+            'cero': (alimentos, 'Ton', 0, 0),
+        }
+        cls.proyectos = {}
+        for nombre, (empresa, unidad, ides, costo_kwh) in fixture.items():
+            proyecto = crear_proyecto(centro, empresa, nombre_proyecto=nombre, unidad_produccion=unidad)
+            kwh = 10 if ides else 0
+            ResumenEnergetico.objects.filter(proyecto=proyecto).update(
+                kwh_total=kwh, costo_total=kwh * costo_kwh, ides=ides
+            )
+            cls.proyectos[nombre] = proyecto
+        call_command('calcular_benchmarks', stdout=StringIO())
+
+    def assertCuantiles(self, benchmark, esperados):
+        obtenidos = [benchmark.p10, benchmark.p25, benchmark.p50, benchmark.p75, benchmark.p90]
+        for percentil, obtenido, esperado in zip((10, 25, 50, 75, 90), obtenidos, esperados):
+            with self.subTest(indicador=benchmark.indicador, percentil=percentil):
+                self.assertAlmostEqual(obtenido, esperado)
+
+    def test_grupos_publicados(self):
+        # Textil (2 proyectos) y alimentos/kg (1) no llegan al mínimo de 3
+        self.assertEqual(
+            sorted(BenchmarkSector.objects.values_list('sector', 'unidad', 'indicador', 'muestras')),
+            [('alimentos', '', 'COSTO_KWH', 5), ('alimentos', 'ton', 'IDES', 4)],
+        )
+
+    def test_percentiles_del_sector(self):
+        # IDES alimentos/ton: [10, 20, 20, 40]; posición = q * 3
+        ides = BenchmarkSector.objects.get(indicador='IDES')
+        self.assertCuantiles(ides, [13, 17.5, 20, 25, 34])
+        self.assertAlmostEqual(ides.media, 22.5)
+
+        # $/kWh alimentos: [100, 200, 300, 400, 500]; posición = q * 4
+        costo = BenchmarkSector.objects.get(indicador='COSTO_KWH')
+        self.assertCuantiles(costo, [140, 200, 300, 400, 460])
+        self.assertAlmostEqual(costo.media, 300)
+
+    def test_posiciones_por_rango_medio(self):
+        # (menores + mitad de los iguales) / muestras * 100; los empates comparten percentil
+        esperadas = {
+            'a': (12.5, 10), 'b': (50, 30), 'c': (50, 50), 'd': (87.5, 70), 'e': (None, 90),
+        }
+        posiciones = {
+            p.proyecto.nombre_proyecto: (p.percentil_ides, p.percentil_costo_kwh)
+            for p in PosicionSectorial.objects.select_related('proyecto')
+        }
+        self.assertEqual(posiciones, esperadas)
+        self.assertEqual(PosicionSectorial.objects.get(proyecto=self.proyectos['c']).unidad, 'ton')
+        self.assertAlmostEqual(PosicionSectorial.objects.get(proyecto=self.proyectos['d']).costo_kwh, 400)
+
+    def test_lectura_para_el_informe(self):
+        resultado = benchmark_proyecto(self.proyectos['b'])
+        ides, costo = resultado['indicadores']
+        self.assertEqual((ides['nombre'], ides['percentil'], ides['mediana'], ides['muestras']), ('IDES', 50, 20, 4))
+        self.assertEqual(ides['lectura'], 'Mejor que la mediana del sector')
+        self.assertEqual((costo['nombre'], costo['percentil'], costo['p90']), ('Costo por kWh', 30, 460))
+
+        lecturas = [i['lectura'] for i in benchmark_proyecto(self.proyectos['d'])['indicadores']]
+        self.assertEqual(lecturas, ['Cuartil menos eficiente del sector', 'Por encima de la mediana del sector'])
+        self.assertIsNone(benchmark_proyecto(self.proyectos['t1']))
@@ -1,7 +1,13 @@
 from django.urls import path
-from .views import dashboard_estrategico, dashboard_nacional
+from .views import dashboard_estrategico, dashboard_nacional, api_estrategico, api_nacional, api_mensual, api_proyectos
 
 urlpatterns = [
     path('estrategico/', dashboard_estrategico, name='dashboard_estrategico'),
     path('nacional/', dashboard_nacional, name='dashboard_nacional'),
-]
\ No newline at end of file
+
+    # API JSON (KPIs y gráficas asíncronas)
+    path('api/estrategico/', api_estrategico, name='api_estrategico'),
+    path('api/nacional/', api_nacional, name='api_nacional'),
+    path('api/mensual/', api_mensual, name='api_mensual'),
+    path('api/proyectos/', api_proyectos, name='api_proyectos'),
+]
@@ -1,192 +1,414 @@
-import json
 from django.shortcuts import render
+from django.http import JsonResponse
+from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.exceptions import PermissionDenied
 
 # Modelos
 from auditorias.models import ProyectoAuditoria
+from auditorias.busqueda import buscar_proyectos
+from auditorias.energia import desglose_por_fuente, indicadores, serie_mensual
 from gestion.models import CentroPevi, Usuario
 from gestion.decorators import solo_directivos
+from .models import RollupRegion, RollupCentroAnio
+from .cache import obtener_o_calcular, etag_metricas
 
-@login_required
-@solo_directivos
-def dashboard_estrategico(request):
+# ==============================================================================
+#  KPIs Y GRÁFICAS (AGREGACIÓN COMPARTIDA EN auditorias.energia)
+# ==============================================================================
+
+def _calcular_kpis_bi(qs):
     """
-    Dashboard de Inteligencia de Negocio (BI).
-    Calcula métricas globales, desglose técnico y permite filtrado dinámico.
+    KPIs globales y series de gráficas para el queryset ya filtrado.
+    Solo consultas agregadas: no recorre proyectos.
+    """
+    # Desglose por fuente (una consulta agregada por tabla de energía) e indicadores derivados
+    totales = indicadores(desglose_por_fuente(qs))
+
+    return {
+        'kpis': {
+            'kpi_proyectos': qs.count(),
+            'kpi_energia': round(totales['kwh_total']),
+            'kpi_costo': round(totales['costo_total']),
+            'kpi_emisiones': round(totales['emisiones_totales'], 2),
+            'kpi_elec_kwh': round(totales['kwh_electrico']),
+            'kpi_term_mbtu': round(totales['mbtu_termico'], 2),
+        },
+        'charts': totales['series'],
+    }
+
+# ==============================================================================
+#  TABLA DE PROYECTOS (PAGINADA Y ORDENADA EN BASE DE DATOS)
+# ==============================================================================
+
+# Columna visible -> anotación de ProyectoAuditoria.objects.con_totales_energia()
+ORDEN_TABLA = {
+    'energia': 'total_kwh',
+    'costo': 'total_costo',
+    'emisiones': 'total_emisiones',
+    'ides': 'total_ides',
+}
+ORDEN_DEFECTO = '-energia'
+TAMANO_PAGINA = 25
+TAMANO_PAGINA_MAX = 100
+
+def _parametros_tabla(request):
+    """Lee orden, página y tamaño de página del GET, normalizados y acotados."""
+    orden = request.GET.get('orden') or ORDEN_DEFECTO
+    if orden.lstrip('-') not in ORDEN_TABLA:
+        orden = ORDEN_DEFECTO
+
+    try:
+        pagina = max(int(request.GET.get('pagina', 1)), 1)
+    except ValueError:
+        pagina = 1
+
+    try:
+        por_pagina = int(request.GET.get('por_pagina', TAMANO_PAGINA))
+    except ValueError:
+        por_pagina = TAMANO_PAGINA
+    por_pagina = max(1, min(por_pagina, TAMANO_PAGINA_MAX))
+
+    return {'orden': orden, 'pagina': pagina, 'por_pagina': por_pagina}
+
+def _columnas_orden(orden_actual):
+    """Para cada columna ordenable: el orden que aplica su enlace y el ícono del estado actual."""
+    columnas = {}
+    for columna in ORDEN_TABLA:
+        if orden_actual == f'-{columna}':
+            columnas[columna] = {'siguiente': columna, 'icono': 'bi-sort-down'}
+        elif orden_actual == columna:
+            columnas[columna] = {'siguiente': f'-{columna}', 'icono': 'bi-sort-up'}
+        else:
+            columnas[columna] = {'siguiente': f'-{columna}', 'icono': ''}
+    return columnas
+
+def _calcular_tabla_bi(qs, orden, pagina, por_pagina):
+    """
+    Una página de la tabla de detalle. El orden y el corte se hacen en SQL, así que
+    solo se construyen las filas visibles; los totales llegan ya anotados.
+    Las filas son diccionarios planos (sin instancias del modelo) para cachearlas.
+    """
+    campo = ORDEN_TABLA[orden.lstrip('-')]
+    signo = '-' if orden.startswith('-') else ''
+    qs = qs.con_totales_energia().order_by(f'{signo}{campo}', f'{signo}pk')
+
+    pagina_obj = Paginator(qs, por_pagina).get_page(pagina)
+    filas = []
+
+    for p in pagina_obj:
+        filas.append({
+            'id': p.id,
+            'nombre': p.nombre_proyecto,
+            'empresa': p.empresa.razon_social,
+            'lider': p.lider_proyecto.get_full_name() if p.lider_proyecto else "Sin asignar",
+            'produccion': round(p.produccion_total or 0),
+            'unidad_prod': p.unidad_produccion,
+            'energia_total': round(p.total_kwh),
+            'energia_elec': round(p.total_kwh_elec),
+            'energia_term': round(p.total_kwh_term),
+            'costo': round(p.total_costo),
+            'emisiones': round(p.total_emisiones, 2),
+            # IDES del proyecto individual (materializado en el resumen)
+            'ides': round(p.total_ides, 2),
+        })
+
+    return {
+        'filas': filas,
+        'paginacion': {
+            'numero': pagina_obj.number,
+            'num_paginas': pagina_obj.paginator.num_pages,
+            'total': pagina_obj.paginator.count,
+            'inicio': pagina_obj.start_index(),
+            'fin': pagina_obj.end_index(),
+            'anterior': pagina_obj.previous_page_number() if pagina_obj.has_previous() else None,
+            'siguiente': pagina_obj.next_page_number() if pagina_obj.has_next() else None,
+        },
+    }
+
+def _contexto_tabla(tabla, parametros):
+    return {
+        'tabla_proyectos': tabla['filas'],
+        'paginacion': tabla['paginacion'],
+        'orden_actual': parametros['orden'],
+        'columnas_orden': _columnas_orden(parametros['orden']),
+    }
+
+# ==============================================================================
+#  DIMENSIÓN TEMPORAL (SERIES INTERANUALES)
+# ==============================================================================
+
+def _serie_anual(filas):
+    """
+    Serie año a año a partir de filas agrupadas {'anio', 'proyectos', 'kwh', 'emisiones'}.
+    Incluye la variación porcentual de energía frente al año anterior con datos.
+    """
+    labels, energia, emisiones, proyectos, variacion = [], [], [], [], []
+    kwh_anterior = None
+
+    for fila in sorted(filas, key=lambda f: f['anio']):
+        kwh = fila['kwh'] or 0.0
+        labels.append(fila['anio'])
+        energia.append(round(kwh))
+        emisiones.append(round(fila['emisiones'] or 0.0, 2))
+        proyectos.append(fila['proyectos'] or 0)
+        variacion.append(round((kwh - kwh_anterior) / kwh_anterior * 100, 1) if kwh_anterior else None)
+        kwh_anterior = kwh
+
+    return {
+        'labels': labels,
+        'energia': energia,
+        'emisiones': emisiones,
+        'proyectos': proyectos,
+        'variacion': variacion,
+    }
+
+def _filas_anuales_rollup(centro_id=None):
+    """Totales por año leídos de RollupCentroAnio (pocas filas: centros x años)."""
+    rollups = RollupCentroAnio.objects.all()
+    if centro_id:
+        rollups = rollups.filter(centro_id=centro_id)
+    return rollups.order_by().values('anio').annotate(
+        proyectos=Sum('proyectos_total'), kwh=Sum('kwh_total'), emisiones=Sum('emisiones_totales')
+    )
+
+def _filas_anuales_proyectos(qs):
+    """Totales por año agrupando proyectos (cuando hay filtros que los rollups no cubren)."""
+    return qs.filter(anio__isnull=False).order_by().values('anio').annotate(
+        proyectos=Count('pk'),
+        kwh=Sum('resumen__kwh_total'),
+        emisiones=Sum('resumen__emisiones_totales'),
+    )
+
+def _opciones_anios(centro_id=None):
+    rollups = RollupCentroAnio.objects.filter(proyectos_total__gt=0)
+    if centro_id:
+        rollups = rollups.filter(centro_id=centro_id)
+    return list(rollups.order_by('-anio').values_list('anio', flat=True).distinct())
+
+def _entero_o_none(valor):
+    try:
+        return int(valor) if valor else None
+    except (TypeError, ValueError):
+        return None
+
+def _calcular_ranking_nacional(centros, anio=None):
+    """
+    Ranking de centros, consolidado regional y series del Modo B del Tablero Nacional.
+    Con 'anio' se lee de los rollups centro-año en lugar de los acumulados totales.
+    """
+    data_centros = []
+    nac_proyectos = 0
+    nac_energia = 0
+    nac_emisiones = 0
+
+    # Lectura ordenada de los rollups incrementales (una fila por centro)
+    if anio:
+        del_anio = Q(rollups_anuales__anio=anio)
+        centros_ranking = centros.annotate(
+            r_proyectos=Coalesce(Sum('rollups_anuales__proyectos_total', filter=del_anio), Value(0)),
+            r_energia=Coalesce(Sum('rollups_anuales__kwh_total', filter=del_anio), Value(0.0)),
+            r_emisiones=Coalesce(Sum('rollups_anuales__emisiones_totales', filter=del_anio), Value(0.0)),
+        )
+    else:
+        centros_ranking = centros.annotate(
+            r_proyectos=Coalesce('rollup__proyectos_total', Value(0)),
+            r_energia=Coalesce('rollup__kwh_total', Value(0.0)),
+            r_emisiones=Coalesce('rollup__emisiones_totales', Value(0.0)),
+        )
+    centros_ranking = centros_ranking.order_by('-r_energia', 'nombre')
+
+    for c in centros_ranking:
+        c_qty = c.r_proyectos
+        c_energia = c.r_energia
+        c_emisiones = c.r_emisiones
+
+        nac_proyectos += c_qty
+        nac_energia += c_energia
+        nac_emisiones += c_emisiones
+
+        data_centros.append({
+            'nombre': c.nombre,
+            'region': c.region,
+            'proyectos': c_qty,
+            'energia': round(c_energia),
+            'emisiones': round(c_emisiones, 2),
+            'promedio_kwh': round(c_energia / c_qty) if c_qty > 0 else 0
+        })
+
+    # Consolidado por región (rollup incremental; por año se agrupan las filas centro-año)
+    if anio:
+        regiones = RollupCentroAnio.objects.filter(anio=anio).order_by().values(region=F('centro__region')).annotate(
+            proyectos_total=Sum('proyectos_total'),
+            proyectos_finalizado=Sum('proyectos_finalizado'),
+            kwh_total=Sum('kwh_total'),
+            emisiones_totales=Sum('emisiones_totales'),
+        ).filter(proyectos_total__gt=0).order_by('-kwh_total')
+    else:
+        regiones = RollupRegion.objects.filter(proyectos_total__gt=0).order_by('-kwh_total').values(
+            'region', 'proyectos_total', 'proyectos_finalizado', 'kwh_total', 'emisiones_totales'
+        )
+
+    tabla_regiones = [
+        {
+            'region': r['region'],
+            'proyectos': r['proyectos_total'],
+            'finalizados': r['proyectos_finalizado'],
+            'energia': round(r['kwh_total']),
+            'emisiones': round(r['emisiones_totales'], 2),
+        }
+        for r in regiones
+    ]
+
+    return {
+        'tabla_centros': data_centros,
+        'tabla_regiones': tabla_regiones,
+        'kpis': {
+            'kpi_centros': len(data_centros),
+            'kpi_proyectos': nac_proyectos,
+            'kpi_energia': round(nac_energia),
+            'kpi_emisiones': round(nac_emisiones, 2),
+        },
+        # Datos Comparativos (ya vienen ordenados por energía)
+        'charts': {
+            'labels': [d['nombre'] for d in data_centros],
+            'energia': [d['energia'] for d in data_centros],
+            'proyectos': [d['proyectos'] for d in data_centros],
+        },
+    }
+
+# ==============================================================================
+#  ALCANCE Y FILTROS (COMPARTIDOS ENTRE HTML Y API)
+# ==============================================================================
+
+# Opciones del selector de proyecto por página o búsqueda (el alcance nacional tiene miles)
+LIMITE_OPCIONES_PROYECTO = 20
+
+def _alcance_estrategico(user):
+    """
+    Scope de seguridad del Dashboard BI.
+    Devuelve (queryset base, título, id del centro o None si es nacional).
     """
-    user = request.user
-    
-    # ---------------------------------------------------------
-    # 1. DEFINICIÓN DEL ALCANCE (SCOPE DE SEGURIDAD)
-    # ---------------------------------------------------------
     if user.is_superuser or user.rol == 'DIRECTOR_NACIONAL':
         # Ve todos los proyectos a nivel nacional
         qs = ProyectoAuditoria.objects.select_related('empresa', 'lider_proyecto', 'centro').all()
-        titulo_scope = "Consolidado Nacional"
-    elif user.rol == 'DIRECTOR_CENTRO':
+        return qs, "Consolidado Nacional", None
+    if user.rol == 'DIRECTOR_CENTRO':
         # Ve solo los proyectos de su centro
         qs = ProyectoAuditoria.objects.filter(centro=user.centro_pevi).select_related('empresa', 'lider_proyecto')
-        titulo_scope = f"Centro: {user.centro_pevi.nombre}"
-    else:
-        raise PermissionDenied("Acceso restringido a directivos.")
+        return qs, f"Centro: {user.centro_pevi.nombre}", user.centro_pevi_id
+    raise PermissionDenied("Acceso restringido a directivos.")
+
+def _filtros_estrategico(request):
+    return {
+        'proyecto': request.GET.get('proyecto') or None,
+        'lider': request.GET.get('lider') or None,
+        'anio': _entero_o_none(request.GET.get('anio')),
+    }
 
-    # ---------------------------------------------------------
-    # 2. APLICACIÓN DE FILTROS ACTIVOS (QUERYSET PRINCIPAL)
-    # ---------------------------------------------------------
-    filtro_proyecto = request.GET.get('proyecto')
-    filtro_lider = request.GET.get('lider')
-    # filtro_anio = request.GET.get('anio') # Disponible para futuro
+def _aplicar_filtros(qs, filtros):
+    if filtros['proyecto']:
+        qs = qs.filter(id=filtros['proyecto'])
+    if filtros['lider']:
+        qs = qs.filter(lider_proyecto_id=filtros['lider'])
+    if filtros.get('anio'):
+        qs = qs.filter(anio=filtros['anio'])
+    return qs
 
-    if filtro_proyecto:
-        qs = qs.filter(id=filtro_proyecto)
-    
-    if filtro_lider:
-        qs = qs.filter(lider_proyecto_id=filtro_lider)
+def _opciones_proyectos(qs_alcance, filtros, consulta=''):
+    """
+    Opciones del selector de proyecto: el alcance reducido por líder y año, buscado por 'consulta'
+    (auditorias.busqueda) y acotado a LIMITE_OPCIONES_PROYECTO; sin consulta, los más recientes.
+    """
+    qs = _aplicar_filtros(qs_alcance, {**filtros, 'proyecto': None}).select_related(None).select_related('empresa')
+    qs = buscar_proyectos(qs, consulta).order_by('-relevancia', '-id')
+    return list(qs[:LIMITE_OPCIONES_PROYECTO])
 
-    # ---------------------------------------------------------
-    # 3. MOTOR DE AGREGACIÓN (CÁLCULOS MATEMÁTICOS)
-    # ---------------------------------------------------------
-    
-    # Acumuladores Globales
-    global_kwh_electrico = 0.0
-    global_kwh_termico = 0.0
-    global_costo_total = 0.0
-    global_emisiones_total = 0.0
-
-    # Diccionario para acumular por Fuente (Para Gráficas)
-    sources_agg = {
-        'Electricidad':   {'kwh': 0, 'costo': 0, 'color': '#ffc107'}, # Amarillo
-        'Gas Natural':    {'kwh': 0, 'costo': 0, 'color': '#0d6efd'}, # Azul
-        'Carbón Mineral': {'kwh': 0, 'costo': 0, 'color': '#212529'}, # Negro
-        'Fuel Oil':       {'kwh': 0, 'costo': 0, 'color': '#dc3545'}, # Rojo
-        'Biomasa':        {'kwh': 0, 'costo': 0, 'color': '#198754'}, # Verde
-        'GLP':            {'kwh': 0, 'costo': 0, 'color': '#0dcaf0'}, # Cyan
-    }
+def _verificar_nacional(user):
+    if not (user.is_superuser or user.rol == 'DIRECTOR_NACIONAL'):
+        raise PermissionDenied("Acceso exclusivo a Dirección Nacional.")
 
-    # Lista para la Tabla Detallada
-    tabla_proyectos = []
+def _etag_estrategico(request):
+    user = request.user
+    if user.is_superuser or user.rol == 'DIRECTOR_NACIONAL':
+        alcance = None
+    elif user.rol == 'DIRECTOR_CENTRO':
+        alcance = user.centro_pevi_id
+    else:
+        return None # La vista responde 403
+    return etag_metricas('estrategico-kpis', alcance, _filtros_estrategico(request))
 
-    # Optimización de Base de Datos (Traer todo en una sola consulta grande)
-    proyectos_data = qs.prefetch_related(
-        'electricidad_related', 'gasnatural_related', 'carbonmineral_related',
-        'fueloil_related', 'biomasa_related', 'gaspropano_related'
-    )
+def _etag_nacional(request):
+    user = request.user
+    if not (user.is_superuser or user.rol == 'DIRECTOR_NACIONAL'):
+        return None # La vista responde 403 (sin revelar el ETag)
+    centro_id = request.GET.get('centro') or None
+    return etag_metricas('nacional-kpis', centro_id, {'anio': _entero_o_none(request.GET.get('anio'))})
 
-    for p in proyectos_data:
-        # Variables locales del proyecto
-        p_kwh_elec = 0
-        p_kwh_term = 0
-        p_costo = 0
-        p_emis = 0
-        
-        # Mapeo de todas las fuentes posibles
-        mapa_fuentes = [
-            ('Electricidad', p.electricidad_related.first()),
-            ('Gas Natural', p.gasnatural_related.first()),
-            ('Carbón Mineral', p.carbonmineral_related.first()),
-            ('Fuel Oil', p.fueloil_related.first()),
-            ('Biomasa', p.biomasa_related.first()),
-            ('GLP', p.gaspropano_related.first()),
-        ]
-
-        for nombre, obj in mapa_fuentes:
-            if obj:
-                # A. Normalizar Energía a kWh
-                energia = 0
-                if hasattr(obj, 'consumo_anual_kwh'): energia = obj.consumo_anual_kwh
-                elif hasattr(obj, 'consumo_anual'): energia = obj.consumo_anual
-                
-                # B. Clasificar (Eléctrico vs Térmico)
-                if nombre == 'Electricidad': 
-                    p_kwh_elec += energia
-                else: 
-                    p_kwh_term += energia
-                
-                # C. Sumar Costos y Emisiones
-                p_costo += obj.costo_total_anual
-                p_emis += obj.emisiones_totales
-
-                # D. Sumar al Agregado por Fuente
-                sources_agg[nombre]['kwh'] += energia
-                sources_agg[nombre]['costo'] += obj.costo_total_anual
-
-        # Sumar a los Acumuladores Globales del Dashboard
-        global_kwh_electrico += p_kwh_elec
-        global_kwh_termico += p_kwh_term
-        global_costo_total += p_costo
-        global_emisiones_total += p_emis
-        
-        # Calcular IDES del proyecto individual
-        p_energia_total = p_kwh_elec + p_kwh_term
-        p_ides = 0
-        if p.produccion_total > 0:
-            # Redondeo aquí para enviar dato limpio al template
-            p_ides = round(p_energia_total / p.produccion_total, 2)
-
-        # Agregar fila a la tabla de detalle
-        tabla_proyectos.append({
-            'objeto': p, # Objeto completo (para ID y Nombre)
-            'empresa': p.empresa.razon_social,
-            'lider': p.lider_proyecto.get_full_name() if p.lider_proyecto else "Sin asignar",
-            'produccion': round(p.produccion_total),
-            'unidad_prod': p.unidad_produccion,
-            'energia_total': round(p_energia_total),
-            'energia_elec': round(p_kwh_elec),
-            'energia_term': round(p_kwh_term),
-            'costo': round(p_costo),
-            'emisiones': round(p_emis, 2),
-            'ides': p_ides
-        })
+def _centro_mensual(request):
+    """Alcance de las curvas mensuales: el centro propio, o ?centro= (o la red) para Dirección Nacional."""
+    user = request.user
+    if user.is_superuser or user.rol == 'DIRECTOR_NACIONAL':
+        return _entero_o_none(request.GET.get('centro'))
+    if user.rol == 'DIRECTOR_CENTRO':
+        return user.centro_pevi_id
+    raise PermissionDenied("Acceso restringido a directivos.")
 
-    # ---------------------------------------------------------
-    # 4. PREPARACIÓN DE DATOS VISUALES (GRÁFICAS)
-    # ---------------------------------------------------------
-    
-    # A. Datos para Chart.js (Dona y Barras de Costos)
-    chart_labels = []
-    data_kwh = []
-    data_costo = []
-    colors = []
-
-    for key, val in sources_agg.items():
-        if val['kwh'] > 0: # Solo incluimos fuentes que tengan consumo
-            chart_labels.append(key)
-            data_kwh.append(round(val['kwh']))
-            data_costo.append(round(val['costo']))
-            colors.append(val['color'])
-
-    # B. Datos para Balance MBTU (Eléctrico vs Térmico)
-    FACTOR_MBTU = 0.00341214
-    mbtu_elec = global_kwh_electrico * FACTOR_MBTU
-    mbtu_term = global_kwh_termico * FACTOR_MBTU
-    
-    # Array simple [Elec, Term]
-    data_mbtu = [round(mbtu_elec, 2), round(mbtu_term, 2)]
+def _etag_mensual(request):
+    try:
+        centro_id = _centro_mensual(request)
+    except PermissionDenied:
+        return None # La vista responde 403
+    return etag_metricas('mensual', centro_id, {'anio': _entero_o_none(request.GET.get('anio'))})
+
+# ==============================================================================
+#  VISTAS HTML (Shell: tablas en servidor, KPIs y gráficas vía API)
+# ==============================================================================
 
-    # ---------------------------------------------------------
-    # 5. LISTAS PARA FILTROS (LÓGICA EN CASCADA)
-    # ---------------------------------------------------------
+@login_required
+@solo_directivos
+def dashboard_estrategico(request):
+    """
+    Dashboard de Inteligencia de Negocio (BI).
+    Renderiza filtros y tabla de detalle; los KPIs y gráficas se cargan
+    de forma asíncrona desde api_estrategico.
+    """
+    user = request.user
     
-    # A. Definir Scope Base según Rol
+    # 1. DEFINICIÓN DEL ALCANCE (SCOPE DE SEGURIDAD)
+    qs_alcance, titulo_scope, alcance = _alcance_estrategico(user)
+
+    # 2. APLICACIÓN DE FILTROS ACTIVOS (QUERYSET PRINCIPAL)
+    filtros = _filtros_estrategico(request)
+    qs = _aplicar_filtros(qs_alcance, filtros)
+
+    # 3. TABLA DETALLADA: UNA PÁGINA, CACHEADA POR ALCANCE, FILTROS Y ORDEN
+    # (Los KPIs de api_estrategico siguen cubriendo todo el alcance)
+    parametros = _parametros_tabla(request)
+    tabla = obtener_o_calcular(
+        'estrategico-tabla', alcance, {**filtros, **parametros},
+        lambda: _calcular_tabla_bi(qs, **parametros)
+    )
+
+    # 4. LISTAS PARA FILTROS (LÓGICA EN CASCADA)
     if user.rol == 'DIRECTOR_CENTRO':
         # Base: Solo su centro
-        lista_proyectos_dropdown = ProyectoAuditoria.objects.filter(centro=user.centro_pevi)
         lista_lideres_dropdown = Usuario.objects.filter(centro_pevi=user.centro_pevi, rol__in=['PROFESOR', 'DIRECTOR_CENTRO'])
     else:
         # Base: Todo el país
-        lista_proyectos_dropdown = ProyectoAuditoria.objects.all()
         lista_lideres_dropdown = Usuario.objects.filter(rol__in=['PROFESOR', 'DIRECTOR_CENTRO', 'DIRECTOR_NACIONAL'])
 
-    # B. FILTRO EN CASCADA (Dependent Dropdown Logic)
-    # Si hay un líder seleccionado, la lista de proyectos se reduce SOLO a los de ese líder
-    if filtro_lider:
-        lista_proyectos_dropdown = lista_proyectos_dropdown.filter(lider_proyecto_id=filtro_lider)
+    # Proyectos: solo los más recientes del alcance (reducido por líder y año); el resto se
+    # encuentra con el buscador del selector (api_proyectos). El seleccionado siempre aparece.
+    lista_proyectos_dropdown = _opciones_proyectos(qs_alcance, filtros)
+    if filtros['proyecto'] and all(str(p.id) != filtros['proyecto'] for p in lista_proyectos_dropdown):
+        lista_proyectos_dropdown = list(qs.select_related('empresa')[:1]) + lista_proyectos_dropdown
 
-    # ---------------------------------------------------------
-    # 6. CONTEXTO FINAL (RETURN)
-    # ---------------------------------------------------------
+    # 5. CONTEXTO FINAL
     context = {
         'page_title': "Dashboard de Ingeniería",
         'page_subtitle': titulo_scope,
@@ -194,29 +416,13 @@ def dashboard_estrategico(request):
         # Filtros y Listas
         'opciones_proyectos': lista_proyectos_dropdown, # Lista inteligente filtrada
         'opciones_lideres': lista_lideres_dropdown,
-        'filtro_actual_proyecto': int(filtro_proyecto) if filtro_proyecto else '',
-        'filtro_actual_lider': int(filtro_lider) if filtro_lider else '',
-
-        # KPIs Globales (Tarjetas Superiores)
-        'kpi_proyectos': len(tabla_proyectos),
-        'kpi_energia_total': round(global_kwh_electrico + global_kwh_termico),
-        'kpi_costo_total': round(global_costo_total),
-        'kpi_emisiones': round(global_emisiones_total, 2),
-        
-        # Desglose Técnico (Tarjeta Balance)
-        'kpi_elec_kwh': round(global_kwh_electrico),
-        'kpi_term_mbtu': round(mbtu_term, 2),
-
-        # Tabla Detallada
-        'tabla_proyectos': tabla_proyectos,
-
-        # JSON Charts (Serializados para JavaScript)
-        'chart_labels': json.dumps(chart_labels),
-        'chart_data_energia': json.dumps(data_kwh),
-        'chart_data_costos': json.dumps(data_costo),
-        'chart_colors': json.dumps(colors),
-        'chart_data_mbtu': json.dumps(data_mbtu),
+        'filtro_actual_proyecto': int(filtros['proyecto']) if filtros['proyecto'] else '',
+        'filtro_actual_lider': int(filtros['lider']) if filtros['lider'] else '',
+        'opciones_anios': _opciones_anios(alcance),
+        'filtro_actual_anio': filtros['anio'] or '',
     }
+    # Tabla Detallada (página actual + controles de orden)
+    context.update(_contexto_tabla(tabla, parametros))
 
     return render(request, 'metricas/dashboard_estrategico.html', context)
 
@@ -229,22 +435,23 @@ def dashboard_nacional(request):
     Tablero de Mando Nacional con capacidad Drill-Down.
     Modo 1: Visión País (Ranking de Centros).
     Modo 2: Visión Centro (Detalle de Ingeniería específico).
+    KPIs y gráficas se cargan de forma asíncrona desde api_nacional.
     """
-    user = request.user
-    
     # 1. SEGURIDAD ESTRICTA
-    if not (user.is_superuser or user.rol == 'DIRECTOR_NACIONAL'):
-        raise PermissionDenied("Acceso exclusivo a Dirección Nacional.")
+    _verificar_nacional(request.user)
 
     # 2. SELECTOR DE CENTROS
     centros = CentroPevi.objects.filter(activo=True).order_by('nombre')
     filtro_centro_id = request.GET.get('centro')
+    filtro_anio = _entero_o_none(request.GET.get('anio'))
     
     # Contexto base
     context = {
         'page_title': "Tablero Nacional",
         'opciones_centros': centros,
         'filtro_actual_centro': int(filtro_centro_id) if filtro_centro_id else '',
+        'opciones_anios': _opciones_anios(filtro_centro_id),
+        'filtro_actual_anio': filtro_anio or '',
     }
 
     # =========================================================
@@ -257,108 +464,13 @@ def dashboard_nacional(request):
 
         # Obtenemos proyectos SOLO de este centro
         qs = ProyectoAuditoria.objects.filter(centro=centro_seleccionado).select_related('empresa', 'lider_proyecto')
-        
-        # --- (Aquí reutilizamos la lógica de agregación del BI) ---
-        global_kwh_electrico = 0.0
-        global_kwh_termico = 0.0
-        global_costo_total = 0.0
-        global_emisiones_total = 0.0
-
-        sources_agg = {
-            'Electricidad':   {'kwh': 0, 'costo': 0, 'color': '#ffc107'},
-            'Gas Natural':    {'kwh': 0, 'costo': 0, 'color': '#0d6efd'},
-            'Carbón Mineral': {'kwh': 0, 'costo': 0, 'color': '#212529'},
-            'Fuel Oil':       {'kwh': 0, 'costo': 0, 'color': '#dc3545'},
-            'Biomasa':        {'kwh': 0, 'costo': 0, 'color': '#198754'},
-            'GLP':            {'kwh': 0, 'costo': 0, 'color': '#0dcaf0'},
-        }
-
-        tabla_proyectos = []
-        proyectos_data = qs.prefetch_related(
-            'electricidad_related', 'gasnatural_related', 'carbonmineral_related',
-            'fueloil_related', 'biomasa_related', 'gaspropano_related'
+        qs = _aplicar_filtros(qs, {'proyecto': None, 'lider': None, 'anio': filtro_anio})
+        parametros = _parametros_tabla(request)
+        tabla = obtener_o_calcular(
+            'nacional-tabla', centro_seleccionado.id, {'anio': filtro_anio, **parametros},
+            lambda: _calcular_tabla_bi(qs, **parametros)
         )
-
-        for p in proyectos_data:
-            p_kwh_elec = 0
-            p_kwh_term = 0
-            p_costo = 0
-            p_emis = 0
-            
-            mapa = [
-                ('Electricidad', p.electricidad_related.first()),
-                ('Gas Natural', p.gasnatural_related.first()),
-                ('Carbón Mineral', p.carbonmineral_related.first()),
-                ('Fuel Oil', p.fueloil_related.first()),
-                ('Biomasa', p.biomasa_related.first()),
-                ('GLP', p.gaspropano_related.first()),
-            ]
-
-            for nombre, obj in mapa:
-                if obj:
-                    eng = 0
-                    if hasattr(obj, 'consumo_anual_kwh'): eng = obj.consumo_anual_kwh
-                    elif hasattr(obj, 'consumo_anual'): eng = obj.consumo_anual
-                    
-                    if nombre == 'Electricidad': p_kwh_elec += eng
-                    else: p_kwh_term += eng
-                    
-                    p_costo += obj.costo_total_anual
-                    p_emis += obj.emisiones_totales
-                    sources_agg[nombre]['kwh'] += eng
-                    sources_agg[nombre]['costo'] += obj.costo_total_anual
-
-            global_kwh_electrico += p_kwh_elec
-            global_kwh_termico += p_kwh_term
-            global_costo_total += p_costo
-            global_emisiones_total += p_emis
-            
-            p_ides = 0
-            if p.produccion_total > 0:
-                p_ides = round((p_kwh_elec + p_kwh_term) / p.produccion_total, 2)
-
-            tabla_proyectos.append({
-                'objeto': p,
-                'empresa': p.empresa.razon_social,
-                'lider': p.lider_proyecto.get_full_name() if p.lider_proyecto else "-",
-                'produccion': round(p.produccion_total),
-                'unidad_prod': p.unidad_produccion,
-                'energia_total': round(p_kwh_elec + p_kwh_term),
-                'costo': round(p_costo),
-                'emisiones': round(p_emis, 2),
-                'ides': p_ides
-            })
-
-        # Preparar Gráficas de Detalle
-        chart_labels = []
-        data_kwh = []
-        data_costo = []
-        colors = []
-        for key, val in sources_agg.items():
-            if val['kwh'] > 0:
-                chart_labels.append(key)
-                data_kwh.append(round(val['kwh']))
-                data_costo.append(round(val['costo']))
-                colors.append(val['color'])
-
-        FACTOR_MBTU = 0.00341214
-        data_mbtu = [round(global_kwh_electrico * FACTOR_MBTU, 2), round(global_kwh_termico * FACTOR_MBTU, 2)]
-
-        # Actualizar Contexto con Datos de Detalle
-        context.update({
-            'kpi_proyectos': len(tabla_proyectos),
-            'kpi_energia': round(global_kwh_electrico + global_kwh_termico),
-            'kpi_costo': round(global_costo_total),
-            'kpi_emisiones': round(global_emisiones_total, 2),
-            'kpi_elec_kwh': round(global_kwh_electrico),
-            'kpi_term_mbtu': round(global_kwh_termico * FACTOR_MBTU, 2),
-            'tabla_proyectos': tabla_proyectos,
-            'chart_labels': json.dumps(chart_labels),
-            'chart_data_energia': json.dumps(data_kwh),
-            'chart_data_costos': json.dumps(data_costo),
-            'chart_colors': json.dumps(colors),
-            'chart_data_mbtu': json.dumps(data_mbtu),
-        })
+        context.update(_contexto_tabla(tabla, parametros))
 
     # =========================================================
     # MODO B: VISTA COMPARATIVA NACIONAL (DEFAULT)
@@ -367,45 +479,102 @@ def dashboard_nacional(request):
         context['page_subtitle'] = "Visión consolidada de la red PEVI"
         context['vista_detalle'] = False # Bandera
         
-        data_centros = []
-        nac_proyectos = 0
-        nac_energia = 0
-        nac_emisiones = 0
-
-        for c in centros:
-            proyectos = ProyectoAuditoria.objects.filter(centro=c)
-            c_qty = proyectos.count()
-            c_energia = sum(p.get_total_kwh() for p in proyectos)
-            c_emisiones = sum(p.get_total_emisiones() for p in proyectos)
-            
-            nac_proyectos += c_qty
-            nac_energia += c_energia
-            nac_emisiones += c_emisiones
-            
-            data_centros.append({
-                'nombre': c.nombre,
-                'region': c.region,
-                'proyectos': c_qty,
-                'energia': round(c_energia),
-                'emisiones': round(c_emisiones, 2),
-                'promedio_kwh': round(c_energia / c_qty) if c_qty > 0 else 0
-            })
-
-        # Datos Comparativos
-        data_centros.sort(key=lambda x: x['energia'], reverse=True)
-        chart_labels = [d['nombre'] for d in data_centros]
-        chart_data_energia = [d['energia'] for d in data_centros]
-        chart_data_proyectos = [d['proyectos'] for d in data_centros]
-
-        context.update({
-            'kpi_centros': centros.count(),
-            'kpi_proyectos': nac_proyectos,
-            'kpi_energia': round(nac_energia),
-            'kpi_emisiones': round(nac_emisiones, 2),
-            'tabla_centros': data_centros,
-            'chart_labels': json.dumps(chart_labels),
-            'chart_data_energia': json.dumps(chart_data_energia),
-            'chart_data_proyectos': json.dumps(chart_data_proyectos),
-        })
+        ranking = obtener_o_calcular(
+            'nacional-ranking', None, {'anio': filtro_anio}, lambda: _calcular_ranking_nacional(centros, filtro_anio)
+        )
+        context['tabla_centros'] = ranking['tabla_centros']
+        context['tabla_regiones'] = ranking['tabla_regiones']
     
-    return render(request, 'metricas/dashboard_nacional.html', context)
\ No newline at end of file
+    return render(request, 'metricas/dashboard_nacional.html', context)
+
+# ==============================================================================
+#  API JSON (KPIs + GRÁFICAS) CON ETAG
+#  El ETag sale de las versiones de caché del alcance: una visita repetida sin
+#  cambios en los datos se responde con 304 sin tocar la base de datos.
+# ==============================================================================
+
+@login_required
+@solo_directivos
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_estrategico)
+def api_estrategico(request):
+    qs_alcance, _titulo, alcance = _alcance_estrategico(request.user)
+    filtros = _filtros_estrategico(request)
+    qs = _aplicar_filtros(qs_alcance, filtros)
+
+    def calcular():
+        datos = _calcular_kpis_bi(qs)
+        # Serie interanual: ignora el filtro de año para poder comparar contra los demás
+        if filtros['proyecto'] or filtros['lider']:
+            filas = _filas_anuales_proyectos(_aplicar_filtros(qs_alcance, {**filtros, 'anio': None}))
+        else:
+            filas = _filas_anuales_rollup(alcance)
+        datos['charts']['anual'] = _serie_anual(filas)
+        return datos
+
+    datos = obtener_o_calcular('estrategico-kpis', alcance, filtros, calcular)
+    return JsonResponse(datos)
+
+@login_required
+@solo_directivos
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_nacional)
+def api_nacional(request):
+    _verificar_nacional(request.user)
+    filtro_centro_id = request.GET.get('centro') or None
+    filtro_anio = _entero_o_none(request.GET.get('anio'))
+
+    def calcular():
+        if filtro_centro_id:
+            qs = _aplicar_filtros(
+                ProyectoAuditoria.objects.filter(centro_id=filtro_centro_id),
+                {'proyecto': None, 'lider': None, 'anio': filtro_anio}
+            )
+            datos = _calcular_kpis_bi(qs)
+        else:
+            centros = CentroPevi.objects.filter(activo=True).order_by('nombre')
+            ranking = obtener_o_calcular(
+                'nacional-ranking', None, {'anio': filtro_anio},
+                lambda: _calcular_ranking_nacional(centros, filtro_anio)
+            )
+            datos = {'kpis': ranking['kpis'], 'charts': dict(ranking['charts'])}
+        datos['charts']['anual'] = _serie_anual(_filas_anuales_rollup(filtro_centro_id))
+        return datos
+
+    datos = obtener_o_calcular('nacional-kpis', filtro_centro_id, {'anio': filtro_anio}, calcular)
+    return JsonResponse(datos)
+
+@login_required
+@solo_directivos
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_mensual)
+def api_mensual(request):
+    """
+    Curvas mensuales (kWh por fuente, kWh y costo totales) de un centro o de toda la red,
+    agregadas en la base de datos sobre ConsumoMensual (auditorias.energia.serie_mensual).
+    """
+    centro_id = _centro_mensual(request)
+    filtro_anio = _entero_o_none(request.GET.get('anio'))
+
+    def calcular():
+        proyectos = ProyectoAuditoria.objects.all()
+        if centro_id:
+            proyectos = proyectos.filter(centro_id=centro_id)
+        return serie_mensual(proyectos, anio=filtro_anio)
+
+    datos = obtener_o_calcular('mensual', centro_id, {'anio': filtro_anio}, calcular)
+    return JsonResponse(datos)
+
+@login_required
+@solo_directivos
+@require_GET
+def api_proyectos(request):
+    """Buscador del selector de proyecto del dashboard BI: ?q=... dentro del alcance, líder y año."""
+    qs_alcance, _titulo, _alcance = _alcance_estrategico(request.user)
+    opciones = _opciones_proyectos(qs_alcance, _filtros_estrategico(request), request.GET.get('q', ''))
+    return JsonResponse({'resultados': [
+        {'id': p.id, 'texto': f"{p.nombre_proyecto} ({p.empresa.razon_social})"} for p in opciones
+    ]})
@@ -2,7 +2,8 @@ from django.shortcuts import render
 from auditorias.models import ProyectoAuditoria
 from gestion.models import CentroPevi
 from .models import Noticia
-from django.db.models import Count, Sum
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 
 def home(request):
     """Página de inicio (Landing Page)."""
@@ -32,11 +33,10 @@ def centros(request):
     """
     Directorio público de universidades con métricas calculadas.
     """
-    # Agrupamos por Centro y contamos sus proyectos finalizados
+    # Conteos leídos del rollup incremental por centro (metricas.RollupCentro)
     lista_centros = CentroPevi.objects.filter(activo=True).annotate(
-        total_proyectos=Count('proyectoauditoria'),
-        # Si tienes un campo de energía en el proyecto, podrías sumarlo así:
-        # total_energia=Sum('proyectoauditoria__consumo_total_kwh') 
+        total_proyectos=Coalesce('rollup__proyectos_total', Value(0)),
+        total_energia=Coalesce('rollup__kwh_total', Value(0.0)),
     ).order_by('-total_proyectos') # Los que más auditan salen primero
     
     regiones = CentroPevi.objects.filter(activo=True).values_list('region', flat=True).distinct()